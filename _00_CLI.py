@@ -0,0 +1,350 @@
+from time import perf_counter,\
+    sleep
+# measured before the heavy imports below, so the startup time includes them
+_process_start = perf_counter()
+
+import sys
+from os import environ
+from argparse import ArgumentParser
+from signal import signal,\
+    SIGINT,\
+    SIGTERM
+from logging import getLogger
+from traceback import format_exc
+from json import dump
+
+from _00_base import configure_logger
+from _00_back_end import LEAF_back_end,\
+    check_modes,\
+    read_plot_directories
+from _00_storage import storage_backends
+from _00_scheduler import scheduling_modes
+from _00_report import sort_fields
+from _00_pipeline import verification_pool_kinds,\
+    default_verification_pool_kind
+from _00_watcher import watch_modes
+from _00_plot_keys import default_forks,\
+    parse_fork
+from _00_histograms import histogram_views,\
+    default_histogram_views
+from _00_farm import default_farm_port
+from _00_analytics import default_expected_ratio,\
+    default_alpha
+
+class LEAF_CLI():
+    """Headless front end for LEAF_back_end, for cron/ systemd runs on harvesters without a display"""
+
+    def __init__(self,
+                 args):
+        self._log = getLogger()
+
+        self.args = args
+        self.stop_flag = False
+        self.first_challenge_logged = False
+
+        self.back_end = LEAF_back_end(storage_backend=self.args.storage,
+                                      forks=self.forks())
+
+    def forks(self):
+        # None keeps the default forks
+        if not getattr(self.args, 'fork', None):
+            return None
+        return [parse_fork(fork) for fork in self.args.fork]
+
+    def input_paths(self):
+        input_paths = list(self.args.paths)
+        for config_filepath in self.args.chia_config:
+            input_paths += read_plot_directories(config_filepath)
+        if self.args.input_file:
+            with open(self.args.input_file, 'r') as input_handle:
+                input_paths += [line.strip() for line in input_handle if line.strip()]
+        if not input_paths:
+            raise Exception('No plot paths provided. Use positional paths, --input-file, --chia-config or a --config file.')
+        return input_paths
+
+    def progress_callback(self,
+                          **kwargs):
+        if kwargs.get('subprogress') and kwargs['subprogress']['value'] and not self.first_challenge_logged:
+            self.first_challenge_logged = True
+            self._log.info(f'Startup to first challenge: { perf_counter() - _process_start:.3f} s')
+        if kwargs.get('progress') and kwargs['progress']['value']:
+            self._log.info(f"Overall progress: { kwargs['progress']['text'] }")
+
+    def set_stop_flag(self,
+                      *args):
+        self._log.warning('Stop signal received, finishing the current challenges ...')
+        self.stop_flag = True
+
+    def stop_flag_check(self):
+        return self.stop_flag
+
+    def check_options(self):
+        # shared by check and watch
+        signal(SIGINT, self.set_stop_flag)
+        signal(SIGTERM, self.set_stop_flag)
+
+        if self.args.metrics_port is not None:
+            self.back_end.serve_metrics(port=self.args.metrics_port,
+                                        address=self.args.metrics_address)
+        if self.args.coordinator:
+            self.back_end.join_farm(self.args.coordinator,
+                                    worker_name=self.args.worker_name,
+                                    token=self.args.farm_token)
+        return {'nr_challenges': self.args.challenges,
+                'delay_between_checks': self.args.delay,
+                'progress_callback': self.progress_callback,
+                'stop_flag_check': self.stop_flag_check,
+                'workers_per_disk': self.args.workers,
+                'check_mode': self.args.check_mode,
+                'verification_sample_rate': self.args.sample_rate,
+                'target_p95_lookup_ms': self.args.target_p95_ms,
+                'metrics_textfile': self.args.metrics_textfile,
+                'early_stopping': self.args.early_stopping,
+                'bad_proofs_ratio': self.args.bad_ratio,
+                'scheduling': self.args.scheduling,
+                'verification_workers': self.args.verification_workers,
+                'verification_pool_kind': self.args.verification_pool}
+
+    def check(self):
+        check_options = self.check_options()
+        self.back_end.parse_input_and_get_paths(self.input_paths(),
+                                                recursive=self.args.recursive)
+        return self.back_end.check_plots(specific_challenge=self.args.specific_challenge,
+                                         time_budget_sec=self.args.time_budget_hours * 3600 if self.args.time_budget_hours else None,
+                                         **check_options)
+
+    def watch(self):
+        return self.back_end.watch_plots(self.input_paths(),
+                                         recursive=self.args.recursive,
+                                         poll_interval_sec=self.args.poll_interval,
+                                         settle_sec=self.args.settle_sec,
+                                         watch_mode=self.args.watch_mode,
+                                         check_existing=not self.args.only_new,
+                                         **self.check_options())
+
+    def keys(self):
+        self.back_end.parse_input_and_get_paths(self.input_paths(),
+                                                recursive=self.args.recursive)
+        output_handle = open(self.args.output, 'w', newline='') if self.args.output else sys.stdout
+        try:
+            derived_plots = self.back_end.generate_plot_keys(output_handle=output_handle,
+                                                             output_format=self.args.format,
+                                                             workers=self.args.workers)
+        finally:
+            if self.args.output:
+                output_handle.close()
+        self._log.info(f'Derived the missing plot public keys of { derived_plots } plots, the others came from the cache.')
+
+    def stored_results_source(self):
+        # the local results of the provided plots, or the results of the whole farm
+        if self.args.coordinator:
+            self.back_end.coordinator_url = self.args.coordinator
+            self.back_end.coordinator_token = self.args.farm_token
+        else:
+            self.back_end.parse_input_and_get_paths(self.input_paths(),
+                                                    recursive=self.args.recursive)
+
+    def report(self):
+        self.stored_results_source()
+        report_options = {'descending': self.args.descending,
+                          'min_ratio': self.args.min_ratio,
+                          'max_ratio': self.args.max_ratio,
+                          'plot_types': self.args.plot_type}
+
+        if self.args.format == 'table':
+            return self.back_end.print_stored_results(self.args.sort_by,
+                                                      page=self.args.page,
+                                                      page_size=self.args.top if self.args.top else 50,
+                                                      **report_options)
+
+        output_handle = open(self.args.output, 'w', newline='') if self.args.output else sys.stdout
+        try:
+            statistics = self.back_end.export_stored_results(output_handle,
+                                                             output_format=self.args.format,
+                                                             sort_by=self.args.sort_by,
+                                                             limit=self.args.top,
+                                                             offset=self.args.page * self.args.top if self.args.top else 0,
+                                                             **report_options)
+        finally:
+            if self.args.output:
+                output_handle.close()
+        self._log.info(f'Report statistics: { statistics }')
+
+    def histogram(self):
+        self.stored_results_source()
+        return self.back_end.trigger_histogram_build(output_filepath=self.args.output,
+                                                     views=self.args.view)
+
+    def analyze(self):
+        self.stored_results_source()
+        analytics = self.back_end.analyze_stored_results(expected_ratio=self.args.expected_ratio,
+                                                         alpha=self.args.alpha)
+        if self.args.format == 'table':
+            return self.back_end.print_analytics(analytics,
+                                                 top=self.args.top)
+
+        output_handle = open(self.args.output, 'w') if self.args.output else sys.stdout
+        try:
+            dump(analytics, output_handle, indent=2)
+            output_handle.write('\n')
+        finally:
+            if self.args.output:
+                output_handle.close()
+        self._log.info(f"Analytics summary: { analytics['summary'] }")
+
+    def coordinator(self):
+        signal(SIGINT, self.set_stop_flag)
+        signal(SIGTERM, self.set_stop_flag)
+
+        coordinator = self.back_end.serve_farm(port=self.args.port,
+                                               address=self.args.address,
+                                               token=self.args.farm_token)
+        try:
+            while not self.stop_flag:
+                sleep(1)
+        finally:
+            coordinator.stop_serving()
+
+def build_parser() -> ArgumentParser:
+    parser = ArgumentParser(prog='_00_CLI.py',
+                            description='LEAF-chia-plot-check-organiser, headless.')
+    parser.add_argument('--config', help='YAML file with any of the options below (e.g. paths, challenges, workers);'
+                                         ' the command line options take precedence.')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                        help='DEBUG also logs every single challenge; INFO logs periodic summaries, with a negligible overhead.')
+
+    common = ArgumentParser(add_help=False)
+    common.add_argument('paths', nargs='*', default=[], help='Plot filepaths or folder paths containing plots.')
+    common.add_argument('--input-file', help='Text file with plot filepaths or folder paths, 1 entry per line.')
+    common.add_argument('--chia-config', action='append', default=[], help='Import the plot directories from a chia (fork) config.yaml; can be repeated.')
+    common.add_argument('--recursive', action='store_true', help='Also look for plots in the subfolders of the provided folders.')
+    common.add_argument('--storage', choices=list(storage_backends.keys()), default='json', help='Results storage backend.')
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    check_options = ArgumentParser(add_help=False)
+    check_options.add_argument('--challenges', type=int, default=100, help='Nr of challenges to check for each plot.')
+    check_options.add_argument('--delay', type=float, default=0, help='Delay [s] between challenge checks.')
+    check_options.add_argument('--workers', type=int, default=1, help='Workers per disk.')
+    check_options.add_argument('--check-mode', choices=check_modes, default='full')
+    check_options.add_argument('--sample-rate', type=int, default=20, help='Verify the full proofs of 1 in N challenges, for --check-mode sampled.')
+    check_options.add_argument('--target-p95-ms', type=float, default=None, help='Keep the p95 latency of the disk lookups (qualities, full proofs) of each disk under this target, instead of --delay.')
+    check_options.add_argument('--early-stopping', action='store_true', help='Stop checking a plot once it is confidently healthy or damaged (sequential test),'
+                                                                              ' --challenges becomes the upper limit.')
+    check_options.add_argument('--bad-ratio', type=float, default=0.7, help='Proofs ratio of a damaged plot, for --early-stopping.')
+    check_options.add_argument('--scheduling', choices=scheduling_modes, default='discovery', help='priority: check the never checked,'
+                                                                                                   ' then the suspicious/ least sampled plots first.')
+    check_options.add_argument('--verification-workers', type=int, default=0, help='Verify the full proofs in a pool of this many workers,'
+                                                                                    ' while the disks go on reading; 0 verifies inline.')
+    check_options.add_argument('--verification-pool', choices=verification_pool_kinds, default=default_verification_pool_kind,
+                               help='process: the verifications never compete with the disk reads for the GIL, at the cost of starting the processes.')
+    check_options.add_argument('--metrics-textfile', default=None, help='Write the latency metrics, in the Prometheus text format, to this file'
+                                                                        ' (e.g. the node_exporter textfile collector folder/leaf.prom).')
+    check_options.add_argument('--metrics-port', type=int, default=None, help='Serve the latency metrics on http://<metrics-address>:<port>/metrics while checking.')
+    check_options.add_argument('--metrics-address', default='127.0.0.1', help='Address of the metrics endpoint, local only by default.')
+
+    fork_options = ArgumentParser(add_help=False)
+    fork_options.add_argument('--fork', action='append', default=None, help='Fork whose plot public keys are derived, as NAME:PORT (e.g. chia-XCH:8444)'
+                                                                              ' or the path of its config.yaml; can be repeated.'
+                                                                              f' Default: { " ".join(f"{ name }:{ port }" for name, port in default_forks) }.')
+
+    farm_options = ArgumentParser(add_help=False)
+    farm_options.add_argument('--coordinator', default=None, help='URL of the farm coordinator (e.g. http://192.168.1.10:8450):'
+                                                                  ' the results are also streamed to it, or the report/ histograms cover the whole farm.')
+    farm_options.add_argument('--farm-token', default=environ.get('LEAF_FARM_TOKEN'), help='Shared token of the farm, as set on the coordinator;'
+                                                                                          ' LEAF_FARM_TOKEN by default.')
+
+    worker_options = ArgumentParser(add_help=False)
+    worker_options.add_argument('--worker-name', default=None, help='Name of this worker for the coordinator; the hostname by default.')
+
+    check_parser = subparsers.add_parser('check', parents=[common, check_options, fork_options, farm_options, worker_options], help='Check the plots.')
+    check_parser.add_argument('--specific-challenge', default=None, help='Check ONLY this challenge (hex).')
+    check_parser.add_argument('--time-budget-hours', type=float, default=None, help='Stop the check after this many hours; the next run resumes it.')
+
+    watch_parser = subparsers.add_parser('watch', parents=[common, check_options, fork_options, farm_options, worker_options],
+                                         help='Daemon mode: check the plots, then keep checking the plots added/ changed in their folders.')
+    watch_parser.add_argument('--poll-interval', type=float, default=60, help='Seconds between two looks for new plots.')
+    watch_parser.add_argument('--settle-sec', type=float, default=60, help='A new plot is only checked once its size and mtime'
+                                                                           ' did not change for this long (e.g. still being copied).')
+    watch_parser.add_argument('--watch-mode', choices=watch_modes, default='auto', help='inotify needs watchdog (pip install watchdog);'
+                                                                                        ' polling only lists the folders with a new mtime.')
+    watch_parser.add_argument('--only-new', action='store_true', help='Skip the plots found at startup, only check the ones added later on.')
+
+    keys_parser = subparsers.add_parser('keys', parents=[common, fork_options], help='Derive the plot public keys of every plot and fork, in bulk.')
+    keys_parser.add_argument('--workers', type=int, default=None, help='Processes deriving the keys; all the CPUs by default.')
+    keys_parser.add_argument('--format', choices=['json', 'csv'], default='csv')
+    keys_parser.add_argument('--output', help='Write the keys to this file instead of stdout.')
+
+    report_parser = subparsers.add_parser('report', parents=[common, farm_options], help='Report the stored results.')
+    report_parser.add_argument('--sort-by', choices=sort_fields, default='proofs_found', help='proofs_found sorts by the proofs ratio.')
+    report_parser.add_argument('--descending', action='store_true', help='Best/ most checked/ latest checked plots first.')
+    report_parser.add_argument('--top', type=int, default=None, help='Only the first N plots of the sort order (per page); e.g. the worst 20 plots: --top 20.')
+    report_parser.add_argument('--page', type=int, default=0, help='Page of --top plots to report, starting from 0.')
+    report_parser.add_argument('--min-ratio', type=float, default=None, help='Only the checked plots with at least this proofs ratio.')
+    report_parser.add_argument('--max-ratio', type=float, default=None, help='Only the checked plots with at most this proofs ratio.')
+    report_parser.add_argument('--plot-type', action='append', choices=['OG', 'NFT'], default=None, help='Only these plot types; can be repeated.')
+    report_parser.add_argument('--format', choices=['table', 'json', 'csv'], default='table')
+    report_parser.add_argument('--output', help='Write the json/ csv report to this file instead of stdout.')
+
+    histogram_parser = subparsers.add_parser('histogram', parents=[common, farm_options], help='Build the histograms.')
+    histogram_parser.add_argument('--output', help='Save the histograms to this html file, or to a static image by its extension'
+                                                   ' (.png, .svg, .pdf ...; needs kaleido), instead of opening a browser.')
+    histogram_parser.add_argument('--view', action='append', choices=histogram_views, default=None,
+                                  help=f'Histograms to build, can be repeated; default: { " ".join(default_histogram_views) }.')
+
+    analyze_parser = subparsers.add_parser('analyze', parents=[common, farm_options], help='Flag the plots finding significantly fewer proofs'
+                                                                                           ' than a healthy plot, with the per disk/ size/ plot type aggregates.')
+    analyze_parser.add_argument('--expected-ratio', type=float, default=default_expected_ratio, help='Proofs ratio of a healthy plot.')
+    analyze_parser.add_argument('--alpha', type=float, default=default_alpha, help='False discovery rate of the flagged plots (Benjamini-Hochberg).')
+    analyze_parser.add_argument('--top', type=int, default=50, help='Rows of each table, for --format table.')
+    analyze_parser.add_argument('--format', choices=['table', 'json'], default='table')
+    analyze_parser.add_argument('--output', help='Write the json analytics to this file instead of stdout.')
+
+    coordinator_parser = subparsers.add_parser('coordinator', help='Gather the results streamed by the workers (check/ watch --coordinator)'
+                                                                   ' into a single storage, and serve the farm-wide report/ histograms.')
+    coordinator_parser.add_argument('--port', type=int, default=default_farm_port)
+    coordinator_parser.add_argument('--address', default='127.0.0.1', help='Address to listen on, local only by default;'
+                                                                           ' e.g. 0.0.0.0 for the harvesters of a trusted local network, with a --farm-token.')
+    coordinator_parser.add_argument('--farm-token', default=environ.get('LEAF_FARM_TOKEN'), help='Shared token the workers/ reports must send;'
+                                                                                                ' required beyond 127.0.0.1. LEAF_FARM_TOKEN by default.')
+    coordinator_parser.add_argument('--storage', choices=list(storage_backends.keys()), default='json', help='Results storage backend.')
+
+    return parser
+
+def parse_args(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.config:
+        from yaml import safe_load
+        # the config file only fills in the options left to their defaults on the command line
+        with open(args.config, 'r') as input_handle:
+            config = safe_load(input_handle) or {}
+        defaults = vars(parser.parse_args([args.command]))
+        for key, value in config.items():
+            key = key.replace('-', '_')
+            if key in ('paths', 'chia_config'):
+                setattr(args, key, list(getattr(args, key)) + list(value))
+            elif hasattr(args, key) and getattr(args, key) == defaults.get(key):
+                setattr(args, key, value)
+
+    return args
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    # stdout is kept clean for the machine readable reports
+    configure_logger(console_stream=sys.stderr,
+                     level=args.log_level)
+    _log = getLogger()
+
+    try:
+        cli = LEAF_CLI(args)
+        # the commands return False when they failed, after logging why
+        return 1 if getattr(cli, args.command)() is False else 0
+    except:
+        _log.error(f'Oh snap ! An error has occurred while running { args.command }:\n{format_exc(chain=False)}')
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
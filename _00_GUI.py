@@ -1,6 +1,8 @@
 import tkinter as tk
 from time import sleep
-from queue import Empty
+from queue import Queue,\
+    Empty
+from collections import deque
 from os import path
 import webbrowser
 import sys
@@ -8,15 +10,21 @@ from PIL import Image
 from signal import signal,\
     SIGINT
 from threading import Thread
-from logging import getLogger
+from logging import getLogger,\
+    getLevelName,\
+    INFO
 from tkinter.scrolledtext import Text, Scrollbar, ScrolledText
 from tkinter import tix, simpledialog, Entry
 from tkinter import ttk, N, S, E, W, END, Label, NONE
-from yaml import safe_load
 from traceback import format_exc
 
 from _00_base import configure_logger_and_queue
-from _00_back_end import LEAF_back_end
+from _00_back_end import LEAF_back_end,\
+    check_modes,\
+    read_plot_directories
+from _00_storage import storage_backends
+from _00_scheduler import scheduling_modes
+from _00_plot_keys import read_fork
 
 class buttons_label_state_change():
     button_display_stored_results_by_proof_ratio: ttk.Button
@@ -92,13 +100,22 @@ class sponsor_reminder():
             sleep(self.sleep_between_frames)
 
 class ConsoleUi(configure_logger_and_queue):
-    """Poll messages from a logging queue and display them in a scrolled text widget"""
+    """Poll messages from a logging queue and display them in a scrolled text widget
+    The widget keeps at most max_lines lines (oldest dropped first) and each poll renders all its records in a single insert,
+    so its memory and the cost of a poll stay flat no matter how long a check runs."""
 
-    def __init__(self, frame):
+    console_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
+
+    def __init__(self,
+                 frame,
+                 max_lines: int = 5000,
+                 poll_interval_ms: int = 100):
 
         super(ConsoleUi, self).__init__()
 
         self.frame = frame
+        self.max_lines = max_lines
+        self.poll_interval_ms = poll_interval_ms
 
         # add a button to clear the text
         self.button_clear_console = ttk.Button(self.frame, text='CLEAR CONSOLE', command=self.clear_console)
@@ -106,6 +123,15 @@ class ConsoleUi(configure_logger_and_queue):
         self.tip_clear_console = tix.Balloon(self.frame)
         self.tip_clear_console.bind_widget(self.button_clear_console,balloonmsg="Will clear the text from the console frame.")
 
+        # the level filter sits on the queue handler, so the filtered records are never queued nor formatted
+        self.combobox_console_level = ttk.Combobox(self.frame, values=self.console_levels, state='readonly', width=10)
+        self.combobox_console_level.set('INFO')
+        self.combobox_console_level.bind('<<ComboboxSelected>>', self.console_level_selected)
+        self.combobox_console_level.grid(column=0, row=0, sticky=E)
+        self.tip_console_level = tix.Balloon(self.frame)
+        self.tip_console_level.bind_widget(self.combobox_console_level, balloonmsg="Minimum level of the messages displayed in the console; runtime_log.log always gets all of them.")
+        self.queue_handler.setLevel(self.combobox_console_level.get())
+
         # Create a ScrolledText wdiget
         self.h_scroll = Scrollbar(self.frame, orient='horizontal')
         self.h_scroll.grid(row=2, column=0, sticky=(W, E))
@@ -125,27 +151,50 @@ class ConsoleUi(configure_logger_and_queue):
         self.v_scroll.config(command=self.scrolled_text.yview)
 
         # Start polling messages from the queue
-        self.frame.after(100, self.poll_log_queue)
+        self.frame.after(self.poll_interval_ms, self.poll_log_queue)
+
+    def console_level_selected(self,
+                               event=None):
+        self.queue_handler.setLevel(self.combobox_console_level.get())
+        # the per challenge DEBUG records are only created while DEBUG is selected, they are not free
+        self._log.setLevel(min(INFO, getLevelName(self.combobox_console_level.get())))
+
+    def display(self, records):
+        # consecutive lines of the same level are joined, so the whole batch is a single insert call
+        chunks = []
+        for record in records:
+            msg = self.queue_handler.format(record) + '\n'
+            if chunks and chunks[-1][1] == record.levelname:
+                chunks[-1][0].append(msg)
+            else:
+                chunks.append(([msg], record.levelname))
+        insert_args = []
+        for messages, levelname in chunks:
+            insert_args += [''.join(messages), levelname]
 
-    def display(self, record):
-        msg = self.queue_handler.format(record)
         self.scrolled_text.configure(state='normal')
-        self.scrolled_text.insert(tk.END, msg + '\n', record.levelname)
+        self.scrolled_text.insert(tk.END, *insert_args)
+        # trim the oldest lines; the widget always ends with an empty line after the last newline
+        extra_lines = int(self.scrolled_text.index('end-1c').split('.')[0]) - 1 - self.max_lines
+        if extra_lines > 0:
+            self.scrolled_text.delete('1.0', f'{ extra_lines + 1 }.0')
         self.scrolled_text.configure(state='disabled')
 
         # Autoscroll to the bottom
         self.scrolled_text.yview(tk.END)
 
     def poll_log_queue(self):
-        # Check every 100ms if there is a new message in the queue to display
+        # Check every poll_interval_ms if there are new messages in the queue to display
+        # only the last max_lines records can end up in the widget, the older ones are dropped before being formatted
+        records = deque(maxlen=self.max_lines)
         while True:
             try:
-                record = self.log_queue.get(block=False)
+                records.append(self.log_queue.get(block=False))
             except Empty:
                 break
-            else:
-                self.display(record)
-        self.frame.after(100, self.poll_log_queue)
+        if records:
+            self.display(records)
+        self.frame.after(self.poll_interval_ms, self.poll_log_queue)
 
     def clear_console(self):
         self.scrolled_text.configure(state='normal')
@@ -189,11 +238,84 @@ class FormControls(buttons_label_state_change,
         self.label_delay_between_check.grid(column=0, row=5)
         self.entry_delay_between_check.grid(column=0, row=6)
 
+        self.label_workers_per_disk = Label(self.frame, text='Workers per disk')
+        self.entry_workers_per_disk = Entry(self.frame)
+        self.entry_workers_per_disk.insert(END, '1')
+        self.label_workers_per_disk.grid(column=1, row=1)
+        self.entry_workers_per_disk.grid(column=1, row=2)
+        self.tip_workers_per_disk = tix.Balloon(self.frame)
+        self.tip_workers_per_disk.bind_widget(self.entry_workers_per_disk, balloonmsg="Plots are grouped by their disk; each disk is checked in parallel by this many workers.")
+
+        self.label_storage_backend = Label(self.frame, text='Results storage')
+        self.combobox_storage_backend = ttk.Combobox(self.frame, values=list(storage_backends.keys()), state='readonly', width=17)
+        self.combobox_storage_backend.set(self.storage_backend)
+        self.combobox_storage_backend.bind('<<ComboboxSelected>>', self.storage_backend_selected)
+        self.label_storage_backend.grid(column=1, row=3)
+        self.combobox_storage_backend.grid(column=1, row=4)
+        self.tip_storage_backend = tix.Balloon(self.frame)
+        self.tip_storage_backend.bind_widget(self.combobox_storage_backend, balloonmsg="json: one file per plot in the output folder; sqlite: a single database, faster for large farms."
+                                                                                       " Run _00_storage.py once to import the existing json results into sqlite.")
+
+        self.label_check_mode = Label(self.frame, text='Check mode')
+        self.combobox_check_mode = ttk.Combobox(self.frame, values=check_modes, state='readonly', width=17)
+        self.combobox_check_mode.set('full')
+        self.label_check_mode.grid(column=1, row=5)
+        self.combobox_check_mode.grid(column=1, row=6)
+        self.tip_check_mode = tix.Balloon(self.frame)
+        self.tip_check_mode.bind_widget(self.combobox_check_mode, balloonmsg="full: every proof is fetched and verified;"
+                                                                             " sampled: only 1 in N challenges gets its proofs verified, the rest only count the qualities;"
+                                                                             " first_hit: the proofs are verified only until the first verified proof of each plot.")
+
+        self.label_verification_sample_rate = Label(self.frame, text='Verify 1 in N challenges')
+        self.entry_verification_sample_rate = Entry(self.frame)
+        self.entry_verification_sample_rate.insert(END, '20')
+        self.label_verification_sample_rate.grid(column=2, row=5)
+        self.entry_verification_sample_rate.grid(column=2, row=6)
+
+        self.label_target_p95_lookup = Label(self.frame, text='Target p95 lookup [ms]')
+        self.entry_target_p95_lookup = Entry(self.frame)
+        self.entry_target_p95_lookup.insert(END, '')
+        self.label_target_p95_lookup.grid(column=2, row=1)
+        self.entry_target_p95_lookup.grid(column=2, row=2)
+        self.tip_target_p95_lookup = tix.Balloon(self.frame)
+        self.tip_target_p95_lookup.bind_widget(self.entry_target_p95_lookup, balloonmsg="Keeps the p95 lookup latency of each disk under this target, slowing down busy disks and speeding up idle ones."
+                                                                                       " When provided, it replaces the fixed delay between challenge checks.")
+
+        self.recursive_discovery = tk.BooleanVar(value=False)
+        self.checkbutton_recursive_discovery = ttk.Checkbutton(self.frame, text='Look in subfolders too', variable=self.recursive_discovery)
+        self.checkbutton_recursive_discovery.grid(column=2, row=4)
+        self.tip_recursive_discovery = tix.Balloon(self.frame)
+        self.tip_recursive_discovery.bind_widget(self.checkbutton_recursive_discovery, balloonmsg="Will also look for plots in all the subfolders of the provided folder paths.")
+
+        self.early_stopping = tk.BooleanVar(value=False)
+        self.checkbutton_early_stopping = ttk.Checkbutton(self.frame, text='Early stopping', variable=self.early_stopping)
+        self.checkbutton_early_stopping.grid(column=2, row=3)
+        self.tip_early_stopping = tix.Balloon(self.frame)
+        self.tip_early_stopping.bind_widget(self.checkbutton_early_stopping, balloonmsg="Stops checking a plot once it is confidently healthy or damaged;"
+                                                                                         " the nr of challenges becomes an upper limit, only the borderline plots reach it.")
+
         self.label_backend_status_notify = Label(self.frame, text='Back-end status:')
         self.label_backend_status_notify.grid(column=4, row=1)
         self.label_backend_status = Label(self.frame, text="Doing nothing ...", fg='#33cc33')
         self.label_backend_status.grid(column=4, row=2)
 
+        self.label_scheduling = Label(self.frame, text='Scheduling')
+        self.combobox_scheduling = ttk.Combobox(self.frame, values=scheduling_modes, state='readonly', width=17)
+        self.combobox_scheduling.set('discovery')
+        self.label_scheduling.grid(column=4, row=3)
+        self.combobox_scheduling.grid(column=4, row=4)
+        self.tip_scheduling = tix.Balloon(self.frame)
+        self.tip_scheduling.bind_widget(self.combobox_scheduling, balloonmsg="discovery: the plots are checked in the order they are found;"
+                                                                             " priority: the never checked plots first, then the suspicious/ least sampled ones, then the healthy ones.")
+
+        self.label_time_budget = Label(self.frame, text='Time budget [h]')
+        self.entry_time_budget = Entry(self.frame)
+        self.entry_time_budget.insert(END, '')
+        self.label_time_budget.grid(column=4, row=5)
+        self.entry_time_budget.grid(column=4, row=6)
+        self.tip_time_budget = tix.Balloon(self.frame)
+        self.tip_time_budget.bind_widget(self.entry_time_budget, balloonmsg="Stops the check after this many hours, leave empty for no limit. The next check resumes where it left off.")
+
         self.separator_filtering_v = ttk.Separator(self.frame, orient='vertical')
         self.separator_filtering_v.grid(column=3, row=0, rowspan=15, sticky=(N, S))
 
@@ -246,6 +368,34 @@ class FormControls(buttons_label_state_change,
             success = False
             message += f"{ self.entry_delay_between_check.get() } is not really a number is it ? Correct that and try again !"
 
+        try:
+            if int(self.entry_workers_per_disk.get()) < 1:
+                raise ValueError
+        except:
+            success = False
+            message += f"{ self.entry_workers_per_disk.get() } is not a valid number of workers per disk ! Correct that and try again !"
+
+        try:
+            if self.entry_target_p95_lookup.get().strip() and float(self.entry_target_p95_lookup.get()) <= 0:
+                raise ValueError
+        except:
+            success = False
+            message += f"{ self.entry_target_p95_lookup.get() } is not a valid latency target ! Correct that and try again !"
+
+        try:
+            if int(self.entry_verification_sample_rate.get()) < 1:
+                raise ValueError
+        except:
+            success = False
+            message += f"{ self.entry_verification_sample_rate.get() } is not a valid verification sample rate ! Correct that and try again !"
+
+        try:
+            if self.entry_time_budget.get().strip() and float(self.entry_time_budget.get()) <= 0:
+                raise ValueError
+        except:
+            success = False
+            message += f"{ self.entry_time_budget.get() } is not a valid time budget ! Correct that and try again !"
+
         return {'success': success,
                 'message': message}
 
@@ -253,7 +403,8 @@ class FormControls(buttons_label_state_change,
         def action():
             self.disable_all_buttons()
             self.backend_label_busy(text='Busy with computing the histograms !')
-            self.parse_input_and_get_paths(self.input_frame.return_input())
+            self.parse_input_and_get_paths(self.input_frame.return_input(),
+                                           recursive=self.recursive_discovery.get())
             self.trigger_histogram_build()
             self.enable_all_buttons()
             self.backend_label_free()
@@ -264,7 +415,8 @@ class FormControls(buttons_label_state_change,
         def action():
             self.disable_all_buttons()
             self.backend_label_busy(text='Busy with displaying stored results !')
-            self.parse_input_and_get_paths(self.input_frame.return_input())
+            self.parse_input_and_get_paths(self.input_frame.return_input(),
+                                           recursive=self.recursive_discovery.get())
             self.print_stored_results(filter_by)
             self.enable_all_buttons()
             self.backend_label_free()
@@ -275,12 +427,23 @@ class FormControls(buttons_label_state_change,
             self.backend_label_busy(text='Busy with checking plots !')
             self._log.info('Checking the plots.')
             self.disable_all_buttons()
-            self.parse_input_and_get_paths(self.input_frame.return_input())
+            self.parse_input_and_get_paths(self.input_frame.return_input(),
+                                           recursive=self.recursive_discovery.get())
+            # the plot public keys are derived for the forks of the imported configs, if any
+            if self.input_frame.imported_forks:
+                self.forks = self.input_frame.imported_forks
             self.check_plots(nr_challenges=int(self.entry_challenges_to_check.get()),
                              specific_challenge=self.entry_specific_challenge_to_check.get(),
                              delay_between_checks=float(self.entry_delay_between_check.get()),
                              progress_callback=self.progress_frame.update_progress_callback,
-                             stop_flag_check=self.stop_flag_check)
+                             stop_flag_check=self.stop_flag_check,
+                             workers_per_disk=int(self.entry_workers_per_disk.get()),
+                             check_mode=self.combobox_check_mode.get(),
+                             verification_sample_rate=int(self.entry_verification_sample_rate.get()),
+                             target_p95_lookup_ms=float(self.entry_target_p95_lookup.get()) if self.entry_target_p95_lookup.get().strip() else None,
+                             early_stopping=self.early_stopping.get(),
+                             scheduling=self.combobox_scheduling.get(),
+                             time_budget_sec=float(self.entry_time_budget.get()) * 3600 if self.entry_time_budget.get().strip() else None)
             self._log.info('Plots check completed. Hit that "Display plots check" button to see the results.')
             self.enable_all_buttons()
             self.stop_flag = False
@@ -292,6 +455,11 @@ class FormControls(buttons_label_state_change,
         else:
             self._log.error(f"'Sanity check Failed:\n{ sanity_check['message'] }'")
 
+    def storage_backend_selected(self,
+                                 *args):
+        self.set_storage_backend(self.combobox_storage_backend.get())
+        self._log.info(f'The results will now be stored using the { self.storage_backend } backend.')
+
     def set_stop_flag(self):
         self.stop_flag = True
 
@@ -310,6 +478,7 @@ class FormInput():
 
         self.import_paths = [path.join(path.expanduser("~"),'.chia', 'mainnet', 'config', 'config.yaml'),
                         path.join(path.expanduser("~"),'.chives', 'mainnet', 'config', 'config.yaml')]
+        self.imported_forks = []
         self.label_import_paths = Label(self.frame, text=';\n'.join(self.import_paths))
         self.label_import_paths.grid(column=0, row=1, rowspan=2)
 
@@ -321,15 +490,14 @@ class FormInput():
 
     def import_paths(self):
         all_plot_paths = []
+        self.imported_forks = []
         for import_path in self.import_paths:
             try:
                 self._log.info(f'Importing paths from { import_path } ...')
                 self.button_import_paths.configure(state='disabled')
-                with open(import_path, 'r') as input_yaml_config:
-                    yaml_config = safe_load(input_yaml_config)
-                plots_paths = yaml_config['harvester']['plot_directories']
-                all_plot_paths += plots_paths
-                self._log.info('Paths imported successfully !')
+                all_plot_paths += read_plot_directories(import_path)
+                self.imported_forks.append(read_fork(import_path))
+                self._log.info(f'Paths imported successfully ! Fork { self.imported_forks[-1][0] } on port { self.imported_forks[-1][1] }.')
             except:
                 self._log.error(f'Failed to import the paths from { import_path }\n{ format_exc(chain=False) }')
 
@@ -343,11 +511,18 @@ class FormInput():
 
 class ProgressBar():
 
-    def __init__(self, frame):
+    def __init__(self,
+                 frame,
+                 poll_interval_ms: int = 100):
         self.frame = frame
+        self.poll_interval_ms = poll_interval_ms
 
         self._log = getLogger()
 
+        # filled by the check workers, drained by the tkinter main loop: the widgets are not thread safe
+        self.progress_queue = Queue()
+        self.parallel_plots = 1
+
         self.label_subprogress = Label(self.frame, text='Current task progress: 0 / 0')
         self.label_subprogress.grid(column=0, row=0)
         self.subprogress = ttk.Progressbar(self.frame, orient = "horizontal", length = 1310, mode = "determinate", style = "colour.Horizontal.TProgressbar")
@@ -358,12 +533,40 @@ class ProgressBar():
         self.progress = ttk.Progressbar(self.frame, orient = "horizontal", length = 1310, mode = "determinate", style = "colour.Horizontal.TProgressbar")
         self.progress.grid(column=0, row=3)
 
+        self.frame.after(self.poll_interval_ms, self.poll_progress_queue)
+
     def update_progress_callback(self,
                                 **kwargs):
+        # called from the check worker threads
+        self.progress_queue.put(kwargs)
+
+    def poll_progress_queue(self):
+        # only the latest progress of each bar is displayed, the updates in between are skipped
+        latest = {}
+        while True:
+            try:
+                latest.update(self.progress_queue.get(block=False))
+            except Empty:
+                break
+        if latest:
+            self.display(**latest)
+        self.frame.after(self.poll_interval_ms, self.poll_progress_queue)
+
+    def display(self,
+                **kwargs):
+        if kwargs.get('parallel_plots'):
+            self.parallel_plots = kwargs.get('parallel_plots')
+
         if kwargs.get('subprogress'):
-            self.subprogress['maximum'] = kwargs.get('subprogress')['maximum']
-            self.subprogress['value'] = kwargs.get('subprogress')['value']
-            self.label_subprogress.configure(text=f"Current task progress: { kwargs.get('subprogress')['text'] }")
+            if self.parallel_plots > 1:
+                # the plots of several disks are checked at once, a single sub-progress would jump between them
+                self.subprogress['maximum'] = 0
+                self.subprogress['value'] = 0
+                self.label_subprogress.configure(text=f"Current task progress: { self.parallel_plots } plots checked at once, see the overall progress")
+            else:
+                self.subprogress['maximum'] = kwargs.get('subprogress')['maximum']
+                self.subprogress['value'] = kwargs.get('subprogress')['value']
+                self.label_subprogress.configure(text=f"Current task progress: { kwargs.get('subprogress')['text'] }")
 
         if kwargs.get('progress'):
             self.progress['maximum'] = kwargs.get('progress')['maximum']
@@ -0,0 +1,242 @@
+from __future__ import annotations
+from math import lgamma,\
+    erfc,\
+    sqrt
+from typing import List,\
+    Dict,\
+    Iterable,\
+    Tuple,\
+    TYPE_CHECKING
+
+from _00_result_codec import not_checked
+from _00_histograms import plot_size_from_name
+
+# numpy is only imported by the functions, see _00_back_end
+if TYPE_CHECKING:
+    import numpy as np
+
+# the aggregates of the farm: per disk, per k size (from the plot name) and per plot type
+aggregate_fields = ['disk', 'size', 'plot_type']
+
+# a healthy plot finds 1 proof per challenge on average, its proofs over n challenges are Poisson(n)
+default_expected_ratio = 1.0
+# the false discovery rate of the flagged plots, over all the plots tested at once
+default_alpha = 0.01
+
+# above this many proofs, the incomplete gamma iterations get long and the Wilson-Hilferty approximation is accurate
+_exact_tail_limit = 5000
+_tail_iterations = 2000
+_tail_epsilon = 1e-13
+_tiny = 1e-300
+
+def load_proof_counts(proof_counts: Iterable) -> Tuple[List, List, Dict]:
+    """The iter_proof_counts of a storage backend reduced row by row, as they stream in: names, plot types and
+    per plot arrays of the challenges checked, the proofs found and the challenges without any proof.
+    Only these counts are kept, the memory follows the nr of plots, not plots x challenges"""
+    import numpy as np
+
+    names, plot_types, challenges, proofs, zero_challenges = [], [], [], [], []
+    proofs_per_value = np.arange(not_checked, dtype=np.int64)
+    for plot_name, plot_type, row in proof_counts:
+        # how many challenges found 0, 1, 2 ... proofs, not_checked last
+        value_counts = np.bincount(np.frombuffer(row, dtype=np.uint8), minlength=not_checked + 1)
+        names.append(plot_name)
+        plot_types.append(plot_type if plot_type else 'unknown')
+        challenges.append(len(row) - int(value_counts[not_checked]))
+        proofs.append(int(value_counts[:not_checked] @ proofs_per_value))
+        zero_challenges.append(int(value_counts[0]))
+    return names, plot_types, {'challenges': np.array(challenges, dtype=np.int64),
+                               'proofs': np.array(proofs, dtype=np.int64),
+                               'zero_challenges': np.array(zero_challenges, dtype=np.int64)}
+
+def _exact_upper_gamma(a, x):
+    # Q(a, x) by its series (x < a + 1) or its continued fraction (Numerical Recipes' gammq), all the elements at once;
+    # the converged elements leave the active set, so the cost follows the slowest ones only
+    import numpy as np
+
+    log_prefix = a * np.log(x) - x - np.vectorize(lgamma, otypes=[np.float64])(a)
+    q = np.empty(len(a))
+
+    series = x < a + 1
+    index = np.flatnonzero(series)
+    sa, sx = a[index], x[index]
+    term = 1 / sa
+    total = term.copy()
+    for iteration in range(1, _tail_iterations + 1):
+        if not len(index):
+            break
+        term = term * sx / (sa + iteration)
+        total += term
+        converged = np.abs(term) < np.abs(total) * _tail_epsilon
+        if converged.any():
+            q[index[converged]] = 1 - np.exp(np.log(total[converged]) + log_prefix[index[converged]])
+            keep = ~converged
+            index, sa, sx, term, total = index[keep], sa[keep], sx[keep], term[keep], total[keep]
+    q[index] = 1 - np.exp(np.log(total) + log_prefix[index])
+
+    index = np.flatnonzero(~series)
+    ca, cx = a[index], x[index]
+    b = cx + 1 - ca
+    c = np.full(len(index), 1 / _tiny)
+    d = 1 / b
+    h = d.copy()
+    for iteration in range(1, _tail_iterations + 1):
+        if not len(index):
+            break
+        an = -iteration * (iteration - ca)
+        b = b + 2
+        d = an * d + b
+        d[np.abs(d) < _tiny] = _tiny
+        c = b + an / c
+        c[np.abs(c) < _tiny] = _tiny
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        converged = np.abs(delta - 1) < _tail_epsilon
+        if converged.any():
+            q[index[converged]] = np.exp(np.log(h[converged]) + log_prefix[index[converged]])
+            keep = ~converged
+            index, ca, cx, b, c, d, h = index[keep], ca[keep], cx[keep], b[keep], c[keep], d[keep], h[keep]
+    q[index] = np.exp(np.log(h) + log_prefix[index])
+    return np.clip(q, 0, 1)
+
+def poisson_lower_tail(observed,
+                       expected) -> np.ndarray:
+    """P(X <= observed) for X ~ Poisson(expected), element-wise: the vectorised poisson_cdf of _00_early_stop.
+    It is the regularized upper incomplete gamma Q(observed + 1, expected), exact up to _exact_tail_limit proofs,
+    from the Wilson-Hilferty approximation of the equivalent chi-square tail above it"""
+    import numpy as np
+
+    observed = np.asarray(observed, dtype=np.float64).ravel()
+    expected = np.asarray(expected, dtype=np.float64).ravel()
+    tail = np.ones(len(observed))
+
+    exact = (expected > 0) & (observed < _exact_tail_limit)
+    if exact.any():
+        tail[exact] = _exact_upper_gamma(observed[exact] + 1, expected[exact])
+
+    # P(X <= k) = P(chi-square with 2(k + 1) degrees of freedom > 2 * expected)
+    approximated = (expected > 0) & ~exact
+    if approximated.any():
+        degrees = 2 * (observed[approximated] + 1)
+        z = ((2 * expected[approximated] / degrees) ** (1 / 3) - (1 - 2 / (9 * degrees))) / np.sqrt(2 / (9 * degrees))
+        tail[approximated] = 0.5 * np.vectorize(erfc, otypes=[np.float64])(z / sqrt(2))
+    return tail
+
+def benjamini_hochberg(p_values) -> np.ndarray:
+    """The q-values (false discovery rate adjusted p-values) of a family of tests"""
+    import numpy as np
+
+    p_values = np.asarray(p_values, dtype=np.float64)
+    if not len(p_values):
+        return p_values
+    order = np.argsort(p_values, kind='stable')
+    ranked = p_values[order] * len(p_values) / np.arange(1, len(p_values) + 1)
+    q_values = np.empty(len(p_values))
+    q_values[order] = np.minimum(1, np.minimum.accumulate(ranked[::-1])[::-1])
+    return q_values
+
+def plot_statistics(counts: Dict,
+                    expected_ratio: float = default_expected_ratio) -> Dict:
+    """Per plot arrays, from the counts of load_proof_counts: the challenges and proofs, the challenges
+    without any proof, the z-score and the p-value of the proofs found against a healthy plot (lower tail)"""
+    import numpy as np
+
+    challenges = counts['challenges']
+    proofs = counts['proofs']
+    expected_proofs = challenges * expected_ratio
+    with np.errstate(divide='ignore', invalid='ignore'):
+        proofs_ratio = np.where(challenges > 0, proofs / challenges, np.nan)
+        z_score = np.where(challenges > 0, (proofs - expected_proofs) / np.sqrt(expected_proofs), np.nan)
+    return {'challenges': challenges,
+            'proofs': proofs,
+            'expected_proofs': expected_proofs,
+            'proofs_ratio': proofs_ratio,
+            # a healthy plot misses e^-expected_ratio of its challenges (37 %), a damaged table shows up as many more
+            'zero_challenges': counts['zero_challenges'],
+            'z_score': z_score,
+            'p_value': poisson_lower_tail(proofs, expected_proofs)}
+
+def _rounded(value):
+    # json friendly and readable: numpy scalars as python ones, NaN as None
+    value = value.item() if hasattr(value, 'item') else value
+    if isinstance(value, float):
+        return None if value != value else float(f'{ value:.6g}')
+    return value
+
+def aggregate(labels: List,
+              statistics: Dict,
+              flagged,
+              expected_ratio: float = default_expected_ratio) -> List:
+    """The totals of each group of plots (e.g. per disk), with the p-value of the group as a whole, worst ratio first"""
+    import numpy as np
+
+    group_labels, codes = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+    challenges = np.bincount(codes, weights=statistics['challenges'], minlength=len(group_labels))
+    proofs = np.bincount(codes, weights=statistics['proofs'], minlength=len(group_labels))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        proofs_ratio = np.where(challenges > 0, proofs / challenges, np.nan)
+    p_value = poisson_lower_tail(proofs, challenges * expected_ratio)
+    columns = {'plots': np.bincount(codes, minlength=len(group_labels)),
+               'checked_plots': np.bincount(codes, weights=statistics['challenges'] > 0, minlength=len(group_labels)).astype(np.int64),
+               'challenges': challenges.astype(np.int64),
+               'proofs': proofs.astype(np.int64),
+               'proofs_ratio': proofs_ratio,
+               'flagged_plots': np.bincount(codes, weights=flagged, minlength=len(group_labels)).astype(np.int64),
+               'p_value': p_value}
+    order = np.lexsort((group_labels, np.nan_to_num(proofs_ratio, nan=np.inf)))
+    return [{'name': str(group_labels[group_index]),
+             **{column: _rounded(values[group_index]) for column, values in columns.items()}}
+            for group_index in order]
+
+def analyze_proof_counts(proof_counts: Iterable,
+                         disk_by_name: Dict = None,
+                         expected_ratio: float = default_expected_ratio,
+                         alpha: float = default_alpha) -> Dict:
+    """The farm analytics: every plot tested at once for underperforming (proofs found vs Poisson(challenges x expected_ratio)),
+    the plots significant at a false discovery rate of alpha flagged, and the aggregates per disk, size and plot type.
+    Returns {'parameters', 'summary', 'underperformers': [plot rows, lowest p-value first], 'aggregates': {field: [group rows]}}"""
+    import numpy as np
+
+    if not 0 < alpha < 1:
+        raise Exception(f'The false discovery rate { alpha } must be between 0 and 1 !')
+    if expected_ratio <= 0:
+        raise Exception(f'The expected proofs ratio { expected_ratio } must be positive !')
+    disk_by_name = disk_by_name if disk_by_name else {}
+
+    names, plot_types, counts = load_proof_counts(proof_counts)
+    statistics = plot_statistics(counts,
+                                 expected_ratio=expected_ratio)
+    tested = statistics['challenges'] > 0
+    q_value = np.full(len(names), np.nan)
+    q_value[tested] = benjamini_hochberg(statistics['p_value'][tested])
+    flagged = tested & (q_value <= alpha)
+
+    labels = {'disk': [disk_by_name.get(plot_name, 'unknown') for plot_name in names],
+              'size': [plot_size_from_name(plot_name) for plot_name in names],
+              'plot_type': plot_types}
+    columns = ['challenges', 'proofs', 'expected_proofs', 'proofs_ratio', 'zero_challenges', 'z_score', 'p_value']
+    underperformers = [{'name': names[plot_index],
+                        'disk': labels['disk'][plot_index],
+                        'size': labels['size'][plot_index],
+                        'plot_type': plot_types[plot_index],
+                        **{column: _rounded(statistics[column][plot_index]) for column in columns},
+                        'q_value': _rounded(q_value[plot_index])}
+                       for plot_index in np.flatnonzero(flagged)[np.argsort(statistics['p_value'][flagged], kind='stable')]]
+
+    total_challenges = int(statistics['challenges'].sum())
+    total_proofs = int(statistics['proofs'].sum())
+    return {'parameters': {'expected_ratio': expected_ratio,
+                           'alpha': alpha},
+            'summary': {'plots': len(names),
+                        'checked_plots': int(tested.sum()),
+                        'challenges': total_challenges,
+                        'proofs': total_proofs,
+                        'proofs_ratio': _rounded(total_proofs / total_challenges) if total_challenges else None,
+                        'flagged_plots': len(underperformers)},
+            'underperformers': underperformers,
+            'aggregates': {field: aggregate(labels[field],
+                                            statistics,
+                                            flagged,
+                                            expected_ratio=expected_ratio)
+                           for field in aggregate_fields}}
@@ -1,22 +1,73 @@
+from __future__ import annotations
 from os import path,\
-    listdir,\
-    mkdir
-from logging import getLogger
-from json import load,\
-    dump
-from tabulate import tabulate
+    mkdir,\
+    replace,\
+    stat,\
+    stat_result
+from logging import getLogger,\
+    DEBUG
 from traceback import format_exc
-import chiapos
-from blspy import G1Element, PrivateKey, AugSchemeMPL
-import blspy
-from time import sleep
-from plotly.subplots import make_subplots
-import plotly.graph_objects as go
+from time import sleep,\
+    time,\
+    perf_counter
+from threading import Lock
+from collections import deque
+from queue import Queue,\
+    Empty
+from concurrent.futures import ThreadPoolExecutor,\
+    ProcessPoolExecutor
+from random import randrange
 from typing import List,\
     AnyStr,\
-    Dict
+    Dict,\
+    Tuple
+
+from _00_storage import storage_backends
+from _00_throttle import adaptive_throttle
+from _00_plot_cache import plot_metadata_cache
+from _00_discovery import discover_plots,\
+    find_duplicates
+from _00_metrics import phase_metrics,\
+    plot_latency_histograms,\
+    phases
+from _00_early_stop import sequential_test,\
+    decision_undecided
+from _00_scheduler import scheduling_modes,\
+    prioritize_plots
+from _00_pipeline import chiapos_verifier,\
+    validate_proofs,\
+    verification_pool,\
+    verification_pool_kinds,\
+    default_verification_pool_kind,\
+    completed
+from _00_watcher import plot_watcher
+from _00_plot_keys import default_forks,\
+    std_hash,\
+    plot_key_name,\
+    derive_plot_public_keys,\
+    write_plot_keys
+from _00_histograms import bin_summaries,\
+    render_histograms
+from _00_farm import farm_worker_storage,\
+    farm_coordinator,\
+    fetch_farm_report,\
+    fetch_farm_histograms,\
+    fetch_farm_analytics,\
+    default_farm_port
+from _00_analytics import analyze_proof_counts,\
+    aggregate_fields,\
+    default_expected_ratio,\
+    default_alpha
+from _00_report import build_report,\
+    report_filter,\
+    write_csv,\
+    write_json
+
+# plotly, numpy, tabulate, chiapos and blspy are heavy to import, so they are only imported
+# by the functions that need them; a report or a cached run never pays for them
 
 def parse_plot_info(memo: bytes):
+    from blspy import G1Element, PrivateKey
     # Parses the plot info bytes into keys
     if len(memo) == (48 + 48 + 32):
         # This is a public key memo
@@ -35,111 +86,260 @@ def parse_plot_info(memo: bytes):
     else:
         raise ValueError(f"Invalid number of bytes {len(memo)}")
 
-def _derive_path(sk: PrivateKey, path) -> PrivateKey:
-    for index in path:
-        sk = AugSchemeMPL.derive_child_sk(sk, index)
-    return sk
-
-def master_sk_to_local_sk(master: PrivateKey,
-                          port: int) -> PrivateKey:
-    return _derive_path(master, [12381, port, 3, 0])
-
-def std_hash(b) -> bytes:
-    """
-    The standard hash used in many places.
-    """
-    return bytes(blspy.Util.hash256(bytes(b)))
-
-def generate_taproot_sk(local_pk: G1Element, farmer_pk: G1Element) -> PrivateKey:
-        taproot_message: bytes = bytes(local_pk + farmer_pk) + bytes(local_pk) + bytes(farmer_pk)
-        taproot_hash: bytes = std_hash(taproot_message)
-        return AugSchemeMPL.key_gen(taproot_hash)
-
-def generate_plot_public_key(local_pk: G1Element, farmer_pk: G1Element, include_taproot: bool = False) -> G1Element:
-    if include_taproot:
-        taproot_sk: PrivateKey = generate_taproot_sk(local_pk, farmer_pk)
-        return local_pk + farmer_pk + taproot_sk.get_g1()
-    else:
-        return local_pk + farmer_pk
-    
-class output_manager():
+class challenge_set():
+    """The challenges 0 .. nr_challenges-1, hashed once per run into one contiguous buffer.
+    The buffer is memoised on disk, keyed by the challenge set definition, and only ever extended.
+    The cache file ends with the std_hash of the challenges, a truncated or corrupted cache is rebuilt."""
+
+    definition = 'std_hash_v1'
+    challenge_length = 32
+
+    def __init__(self,
+                 nr_challenges: int,
+                 cache_folder: str = 'cache'):
+        self._log = getLogger()
+
+        self.nr_challenges = nr_challenges
+        self.cache_folder = cache_folder
+        self.cache_filepath = path.join(self.cache_folder, f'challenges_{ self.definition }.bin')
+
+        self.buffer = self._load_or_build()
+
+    def _load_cache(self) -> bytes:
+        if not path.isfile(self.cache_filepath):
+            return b''
+        try:
+            with open(self.cache_filepath, 'rb') as input_handle:
+                cached = input_handle.read()
+        except:
+            self._log.warning(f'Failed to read the challenges cache { self.cache_filepath }, it will be rebuilt.')
+            return b''
+        cached, digest = cached[:-self.challenge_length], cached[-self.challenge_length:]
+        if len(cached) % self.challenge_length or std_hash(cached) != digest:
+            self._log.warning(f'The challenges cache { self.cache_filepath } is truncated or corrupted, it will be rebuilt.')
+            return b''
+        return cached
+
+    def _load_or_build(self) -> bytes:
+        cached = self._load_cache()
+
+        cached_challenges = len(cached) // self.challenge_length
+        if cached_challenges >= self.nr_challenges:
+            return cached[:self.nr_challenges * self.challenge_length]
+
+        self._log.info(f'Preparing challenges { cached_challenges } .. { self.nr_challenges - 1 } ...')
+        buffer = bytearray(cached)
+        for challenge_index in range(cached_challenges, self.nr_challenges):
+            buffer += std_hash(challenge_index.to_bytes(32, "big"))
+        buffer = bytes(buffer)
+
+        try:
+            if not path.isdir(self.cache_folder):
+                mkdir(self.cache_folder)
+            with open(self.cache_filepath+'.tmp', 'wb') as output_handle:
+                output_handle.write(buffer)
+                output_handle.write(std_hash(buffer))
+            replace(self.cache_filepath+'.tmp', self.cache_filepath)
+        except:
+            self._log.warning(f'Failed to store the challenges cache { self.cache_filepath }\n{format_exc(chain=False)}')
+
+        return buffer
+
+    def __len__(self) -> int:
+        return self.nr_challenges
+
+    def __getitem__(self,
+                    challenge_index: int) -> bytes:
+        if not 0 <= challenge_index < self.nr_challenges:
+            raise IndexError(f'Challenge index { challenge_index } is outside of this challenge set.')
+        return self.buffer[challenge_index * self.challenge_length:(challenge_index + 1) * self.challenge_length]
+
+def read_plot_directories(config_filepath: str) -> List:
+    # the plot directories of a chia (or chia fork) harvester, from its config.yaml
+    from yaml import safe_load
+    with open(config_filepath, 'r') as input_yaml_config:
+        yaml_config = safe_load(input_yaml_config)
+    return yaml_config['harvester']['plot_directories']
+
+def get_disk_key(plot_path,
+                 plot_stat: stat_result = None) -> str:
+    # plots living on the same block device/ mount point share the same st_dev
+    try:
+        return str((plot_stat if plot_stat else stat(plot_path)).st_dev)
+    except:
+        return path.dirname(path.abspath(plot_path))
+
+class throughput_meter():
     def __init__(self):
+        self._lock = Lock()
+        self.start_time = time()
+        self.plots_done = 0
+        self.challenges_done = 0
+
+    def add_plot(self) -> int:
+        with self._lock:
+            self.plots_done += 1
+            return self.plots_done
+
+    def add_challenge(self) -> int:
+        with self._lock:
+            self.challenges_done += 1
+            return self.challenges_done
+
+    def plots_per_hour(self) -> float:
+        elapsed = max(time() - self.start_time, 1e-9)
+        return self.plots_done * 3600 / elapsed
+
+    def challenges_per_sec(self) -> float:
+        elapsed = max(time() - self.start_time, 1e-9)
+        return self.challenges_done / elapsed
+
+    def summary(self) -> str:
+        return f'{ self.plots_per_hour():.2f} plots/h, { self.challenges_per_sec():.2f} challenges/s'
+
+class output_manager():
+    def __init__(self,
+                 storage_backend: str = 'json',
+                 catalog_path: str = 'LEAF_catalog.json'):
         self._log = getLogger()
 
-        if not path.isdir('output'):
-            mkdir('output')
+        self.catalog_path = catalog_path
+        self.set_storage_backend(storage_backend)
+
+    def set_storage_backend(self,
+                            storage_backend: str):
+        if storage_backend not in storage_backends:
+            raise Exception(f'Unknown storage backend { storage_backend }, valid options: { list(storage_backends.keys()) }')
+        if getattr(self, 'storage', None):
+            self.storage.close()
+        self.storage_backend = storage_backend
+        # the json backend keeps its per-plot summary index in the catalog file
+        backend_options = {'json': {'summary_index_path': self.catalog_path}}
+        self.storage = storage_backends[storage_backend](**backend_options.get(storage_backend, {}))
 
     def load_data(self,
                   plot_name):
-        if not path.isfile(path.join('output', plot_name+'.json')):
-            return None
-        else:
-            try:
-                with open(path.join('output', plot_name+'.json'), 'r') as input_handle:
-                    return load(input_handle)
-            except:
-                return None
+        return self.storage.load_data(plot_name)
 
     def save_data(self,
                   plot_name,
                   content):
-        max_retry = 5
-        current_try = -1
-        while True:
-            current_try += 1
-            if current_try == max_retry:
-                self._log.error(f"Max retries reached while trying to load the json for { plot_name }.")
-                raise Exception
-            try:
-                with open(path.join('output', plot_name+'.json'), 'w') as output_handle:
-                    dump(content, output_handle, indent=2)
-                break
-            except:
-                current_try += 1
-                self._log.warning(f"Error found while trying to load the json for { plot_name }."
-                                  f" Will retry in 5 sec. Retry { current_try } / { max_retry }\n{format_exc(chain=False)}")
-                sleep(5)
+        self.storage.save_data(plot_name,
+                               content)
+
+    def append_challenge_result(self,
+                                plot_name,
+                                challenge_index: int,
+                                result: Dict):
+        self.storage.append_challenge_result(plot_name,
+                                             challenge_index,
+                                             result)
+
+    def flush_journal(self,
+                      plot_name):
+        self.storage.flush_journal(plot_name)
+
+    def compact_data(self,
+                     plot_name,
+                     content):
+        self.storage.compact_data(plot_name,
+                                  content)
+
+    def drop_data(self,
+                  plot_name):
+        # all the stored results of the plot, e.g. for a plot file replaced since it was checked
+        self.storage.drop_data(plot_name)
+
+    def flush_summary_index(self):
+        self.storage.flush_summary_index()
 
     def get_entries(self):
-        return listdir('output')
+        return self.storage.get_entries()
 
     def parse_and_return_relevant_data(self,
                                        list_of_plots):
-        to_return = []
-        for plot_name in list_of_plots:
-            stored_data = self.load_data(plot_name)
-            if stored_data:
-                to_return.append({'name': plot_name,
-                                  'challenges_tried': (max(int(_) for _ in stored_data['challenges'].keys())+1)
-                                                        if (stored_data['challenges'].keys())
-                                                        else 0,
-                                  'proofs_found': sum([_['proofs'] for _ in stored_data['challenges'].values()])})
-            else:
-                to_return.append({'name': plot_name,
-                                  'challenges_tried': None,
-                                  'proofs_found': None})
-        return to_return
+        return self.storage.parse_and_return_relevant_data(list_of_plots)
+
+    def iter_relevant_data(self,
+                           list_of_plots):
+        return self.storage.iter_relevant_data(list_of_plots)
+
+    def iter_proof_counts(self,
+                          list_of_plots):
+        return self.storage.iter_proof_counts(list_of_plots)
+
+    def build_stored_report(self,
+                            list_of_plots,
+                            **report_options) -> Dict:
+        # a backend sorting in its queries (sqlite) returns the page of rows itself, see build_report
+        sorted_report_rows = getattr(self.storage, 'sorted_report_rows', None)
+        return build_report(self.iter_relevant_data(list_of_plots),
+                            sorted_rows=(lambda **sort_options: sorted_report_rows(list_of_plots,
+                                                                                   **sort_options))
+                                        if sorted_report_rows else None,
+                            **report_options)
 
 class Plot:
+    # picklable, so the verification pool processes can build their own verifier
+    verifier_factory = staticmethod(chiapos_verifier)
+
     def __init__(self,
-                 plot_filepath):
+                 plot_filepath,
+                 metadata_cache: plot_metadata_cache = None,
+                 forks: List = None):
         self._log = getLogger()
 
         self.plot_filepath = plot_filepath
+        self.metadata_cache = metadata_cache
+        # [[fork name, port], ...], the forks whose plot public keys are derived, on request only
+        self.forks = forks if forks is not None else default_forks
+        self._prover = None
+        self._verifier = None
 
         self.initialize()
 
+    @property
+    def prover(self):
+        # opened lazily: with a cached header, the plot file is only opened for the actual lookups
+        if self._prover is None:
+            import chiapos
+            self._prover = chiapos.DiskProver(self.plot_filepath)
+            self._log.info(f"Loaded {self.plot_filepath}")
+        return self._prover
+
+    @property
+    def verifier(self):
+        if self._verifier is None:
+            self._verifier = self.verifier_factory()
+        return self._verifier
+
     def initialize(self):
-        self.prover = chiapos.DiskProver(self.plot_filepath)
-        self.verifier = chiapos.Verifier()
-        self._log.info(f"Loaded {self.plot_filepath}")
+        cached_metadata = self.metadata_cache.get(self.plot_filepath) if self.metadata_cache else None
+        if cached_metadata:
+            self._log.info(f'Using the cached header metadata of {self.plot_filepath}')
+            self.size = cached_metadata['size']
+            self.id = bytes.fromhex(cached_metadata['id'])
+            self.farmer_public_key = cached_metadata['farmer_public_key']
+            self.local_master_sk = cached_metadata['local_master_sk']
+            self.pool_public_key_or_puzzle_hash = cached_metadata['pool_public_key_or_puzzle_hash']
+            self.plot_type = cached_metadata['plot_type']
+            self._plot_public_keys = dict(cached_metadata['plot_public_keys'])
+        else:
+            self.read_header()
+            if self.metadata_cache:
+                self.metadata_cache.set(self.plot_filepath,
+                                        self.metadata())
 
-        self.size = self.prover.get_size()
         self._log.info(f'This plot has a size of {self.size}')
         # sanity check - check if the parsed plot size is the same as in the plot filename
         if self.size != int(self.plot_filepath.split('-k')[1].split('-')[0]):
             raise Exception(f"Mismatch in the size from the plot contents and the plot filename!\n{self.plot_filepath}")
 
+    def read_header(self):
+        from blspy import G1Element
+
+        self.size = self.prover.get_size()
+
         self.id = self.prover.get_id()
         self._log.info(f'Plot ID: { self.id.hex() }')
 
@@ -166,18 +366,34 @@ class Plot:
             self._log.info(f'NFT plot detected with pool contract ph: { pool_contract_puzzle_hash.hex() }')
             self.plot_type = 'NFT'
 
-        self.plot_public_keys = {}
-        for port in [['chia-XCH', 8444],
-                     ['chives-XCC', 9699]]:
-            local_sk = master_sk_to_local_sk(master=self.local_master_sk,
-                                             port=port[1])
-            self._log.info(f'Local sk: { local_sk }')
-
-            plot_public_key: G1Element = generate_plot_public_key(
-                                    local_sk.get_g1(), self.farmer_public_key, pool_contract_puzzle_hash is not None
-                                )
-            self.plot_public_keys[f'plot_public_key_{port[1]}'] = str(plot_public_key)
-            self._log.info(f'Plot public key for port { port[0] } -> { port[1] }: { plot_public_key }\n\n')
+        # derived by plot_public_keys, when requested
+        self._plot_public_keys = {}
+
+    @property
+    def plot_public_keys(self) -> Dict:
+        # the keys of the forks never derived for this plot are derived now and cached with its header metadata
+        missing_forks = [fork for fork in self.forks if plot_key_name(fork[1]) not in self._plot_public_keys]
+        if missing_forks:
+            self._plot_public_keys.update(derive_plot_public_keys(str(self.local_master_sk),
+                                                                  str(self.farmer_public_key),
+                                                                  self.plot_type == 'NFT',
+                                                                  [port for _, port in missing_forks]))
+            for fork_name, port in missing_forks:
+                self._log.info(f'Plot public key for port { fork_name } -> { port }: { self._plot_public_keys[plot_key_name(port)] }')
+            if self.metadata_cache:
+                self.metadata_cache.set(self.plot_filepath,
+                                        self.metadata())
+        return {plot_key_name(port): self._plot_public_keys[plot_key_name(port)] for _, port in self.forks}
+
+    def metadata(self) -> Dict:
+        # the json serializable form of the header metadata, as stored with the results and in the cache
+        return {'size': self.size,
+                'id': self.id.hex(),
+                'farmer_public_key': str(self.farmer_public_key),
+                'local_master_sk': str(self.local_master_sk),
+                'pool_public_key_or_puzzle_hash': str(self.pool_public_key_or_puzzle_hash),
+                'plot_type': self.plot_type,
+                'plot_public_keys': self._plot_public_keys}
 
     def plot_data(self) -> Dict:
         return {'size': self.size,
@@ -188,68 +404,114 @@ class Plot:
                 'plot_type': self.plot_type,
                 'plot_public_keys': self.plot_public_keys}
 
-    def test_challenge(self,
-                       challenge: AnyStr) -> int:
-        proofs = 0
+    def fetch_proofs(self,
+                     challenge: AnyStr,
+                     verify_proofs: bool = True) -> Tuple[List, List]:
+        # the disk reads of a challenge: its qualities and, when verifying, their full proofs
+        # the time of every disk lookup (qualities, then each full proof), used by the adaptive throttle
+        self.last_lookup_latencies = []
+        # (phase, seconds) of every step of this challenge, for the latency metrics
+        self.last_phase_timings = []
 
+        lookup_start = perf_counter()
         qualities_for_challenge = self.prover.get_qualities_for_challenge(challenge)
+        lookup_latency = perf_counter() - lookup_start
+        self.last_lookup_latencies.append(lookup_latency)
+        self.last_phase_timings.append(('qualities', lookup_latency))
 
-        # verify the proof
-        for quality_index, quality_str in enumerate(qualities_for_challenge):
+        # fast scan: only count the qualities, skipping the full proof fetch (64 reads across all tables)
+        if not verify_proofs:
+            return qualities_for_challenge, []
 
-            proof = self.prover.get_full_proof(challenge, quality_index)
-            ver_quality_str = self.verifier.validate_proof(self.id, self.size, challenge, proof)
-            assert quality_str == ver_quality_str
-            proofs += 1
+        proofs = []
+        for quality_index in range(len(qualities_for_challenge)):
+            lookup_start = perf_counter()
+            proofs.append(self.prover.get_full_proof(challenge, quality_index))
+            lookup_latency = perf_counter() - lookup_start
+            self.last_lookup_latencies.append(lookup_latency)
+            self.last_phase_timings.append(('full_proof', lookup_latency))
 
-        self._log.info(f'Found { proofs } proofs for the challenge { challenge.hex() }.')
+        return qualities_for_challenge, proofs
+
+    def test_challenge(self,
+                       challenge: AnyStr,
+                       verify_proofs: bool = True) -> int:
+        qualities_for_challenge, proofs = self.fetch_proofs(challenge,
+                                                            verify_proofs=verify_proofs)
+
+        if not verify_proofs:
+            if self._log.isEnabledFor(DEBUG):
+                self._log.debug(f'Found { len(qualities_for_challenge) } qualities (not verified) for the challenge { challenge.hex() }.')
+            return len(qualities_for_challenge)
+
+        # verify the proof
+        proofs, validate_timings = validate_proofs(self.verifier, self.id, self.size, challenge,
+                                                   qualities_for_challenge, proofs, self.plot_filepath)
+        self.last_phase_timings += validate_timings
+
+        # the per challenge details are only built when DEBUG is enabled, the checks log periodic summaries instead
+        if self._log.isEnabledFor(DEBUG):
+            self._log.debug(f'Found { proofs } proofs for the challenge { challenge.hex() }.')
 
         return proofs
 
 
+# full: every quality is verified with its full proof
+# sampled: only 1 in verification_sample_rate challenges gets its full proofs verified
+# first_hit: full proofs are verified only until the first verified proof of each plot
+# a plot checked in several modes across the runs is stored with the check mode 'mixed'
+check_modes = ['full', 'sampled', 'first_hit']
+
 class LEAF_back_end(output_manager):
 
     _log: getLogger
+    # the class used to open the plots; the benchmarks swap it for one backed by a synthetic prover
+    plot_class = Plot
+    # how often the progress of a plot is logged at INFO, the single challenges are logged at DEBUG only
+    log_summary_every_sec = 10
+    # [[fork name, port], ...], the forks whose plot public keys are stored with the results
+    forks = default_forks
+    # a worker of a farm also streams its results to the coordinator, see join_farm
+    farm_worker = None
+    # the reports and histograms of the whole farm are fetched from this coordinator instead of the local storage
+    coordinator_url = None
+    # the shared token of the farm, sent with every request to the coordinator
+    coordinator_token = None
 
     def __init__(self,
                  wd_root='',
-                 wf_name='LEAF_catalog.json'):
+                 wf_name='LEAF_catalog.json',
+                 storage_backend: str = 'json',
+                 forks: List = None):
 
-        super(LEAF_back_end, self).__init__()
+        super(LEAF_back_end, self).__init__(storage_backend=storage_backend,
+                                            catalog_path=path.join(wd_root, wf_name))
 
         self.wd_root = wd_root
         self.wf_name = wf_name
+        if forks is not None:
+            self.forks = forks
 
-    def build_distribution_graph(self,
-                                 proofs_found_list: List,
-                                 proofs_checked_list: List):
-
-        fig = make_subplots(rows=2, cols=1)
+        self.plot_metadata_cache = plot_metadata_cache()
+        # kept for the lifetime of the back end, so the exported counters keep growing across the checks
+        self.metrics = phase_metrics()
 
-        # add the proofs_found histogram
-        fig.add_trace(go.Histogram(x=proofs_found_list,
-                                   name='proofs_found',
-                                   marker=dict(color='green')),
-                      row=1,col=1)
-
-        # add the proofs_found histogram
-        fig.add_trace(go.Histogram(x=proofs_checked_list,
-                                   name='proofs_checked',
-                                   marker=dict(color='blue')),
-                      row=2, col=1)
-        fig.show()
+    def build_distribution_graph(self,
+                                 binned: Dict,
+                                 output_filepath: str = None):
+        # the bins are computed by bin_summaries, plotly only gets their counts
+        render_histograms(binned,
+                          output_filepath=output_filepath)
+        if output_filepath:
+            self._log.info(f'The histograms were saved to { output_filepath }')
 
     def parse_input_and_get_paths(self,
-                                  input_data: list):
+                                  input_data: list,
+                                  recursive: bool = False):
         self._log.info('Looking for plots in the input data ...')
-        self.all_plots_paths = []
-        for entry in input_data:
-            if path.isfile(entry):
-                self.all_plots_paths.append(entry)
-            elif path.isdir(entry):
-                self.all_plots_paths += list(filter(lambda x:x.endswith('.plot'), [path.join(entry, filename) for filename in listdir(entry)]))
-            else:
-                self._log.warning(f"{ entry } is neither a valid file nor a valid path !")
+        # the stat results gathered by the discovery are reused by the disk grouping and the metadata cache
+        self.all_plots_paths, self.plots_stats = discover_plots(input_data,
+                                                                recursive=recursive)
         self._log.info(f'Discovered { len(self.all_plots_paths) } plots in the provided filepaths & folder paths.')
 
         if self._precheck_duplicates():
@@ -260,167 +522,756 @@ class LEAF_back_end(output_manager):
 
     def _precheck_duplicates(self):
 
-        precheck_duplicates_helper = [path.basename(entry) for entry in self.all_plots_paths]
         duplicates_found = False
-        for index, entry in enumerate(precheck_duplicates_helper):
-            if precheck_duplicates_helper.count(entry) > 1:
-                self._log.warning(f'Found duplicate plot: { self.all_plots_paths[index] }')
+        for plot_name, plot_paths in find_duplicates(self.all_plots_paths).items():
+            self._log.warning(f'Found duplicate plot { plot_name }: { plot_paths }')
+            duplicates_found = True
+
+        # the same plot copied under another name can only be told by its id, which is known for the cached headers
+        plots_by_id = {}
+        for entry in self.all_plots_paths:
+            cached_metadata = self.plot_metadata_cache.get(entry,
+                                                           identity=plot_metadata_cache.identity_from_stat(self.plots_stats[entry]))
+            if cached_metadata:
+                plots_by_id.setdefault(cached_metadata['id'], []).append(entry)
+        for plot_id, entries in plots_by_id.items():
+            # the very same path listed twice was already reported above
+            if len(set(path.abspath(entry) for entry in entries)) > 1:
+                self._log.warning(f'Found plots with the same plot id { plot_id }: { entries }')
                 duplicates_found = True
 
         return duplicates_found
 
-    def trigger_histogram_build(self) -> None:
+    def trigger_histogram_build(self,
+                                output_filepath: str = None,
+                                views: List = None) -> bool:
+        # False when the histograms could not be built, e.g. for the exit code of the CLI
         try:
 
-            list_with_all_plots = self.parse_and_return_relevant_data([path.basename(_) for _ in self.all_plots_paths])
-
-            # filter plots with no past checks
-            checked_plots = list(filter(lambda x:x['challenges_tried'], list_with_all_plots))
-
-            if len(checked_plots)>0:
-                self.build_distribution_graph(proofs_found_list=[x['proofs_found'] / x['challenges_tried'] for x in checked_plots],
-                                              proofs_checked_list=[x['challenges_tried'] for x in checked_plots])
+            if self.coordinator_url:
+                # binned by the coordinator, only the counts travel
+                binned = fetch_farm_histograms(self.coordinator_url,
+                                               views=views,
+                                               token=self.coordinator_token)
+            else:
+                # streamed from the storage backend; the plots with no past checks are left out by the binning
+                plot_names = [path.basename(_) for _ in self.all_plots_paths]
+                disk_by_name = {path.basename(plot_path): get_disk_key(plot_path,
+                                                                       getattr(self, 'plots_stats', {}).get(plot_path))
+                                for plot_path in self.all_plots_paths} if views and 'ratio_by_disk' in views else None
+                binned = bin_summaries(self.iter_relevant_data(plot_names),
+                                       disk_by_name=disk_by_name,
+                                       views=views)
+
+            if binned and sum(sum(sum(counts) for counts in binned[view]['series'].values()) for view in binned) > 0:
+                self.build_distribution_graph(binned,
+                                              output_filepath=output_filepath)
+            else:
+                self._log.warning('None of the plots has been checked yet, there is nothing to display.')
+            return True
         except:
-            self._log.error('Oh snap ! An error has occurred while printing the stored results:\n{}'.format(format_exc(chain=False)))
+            self._log.error('Oh snap ! An error has occurred while building the histograms:\n{}'.format(format_exc(chain=False)))
+            return False
+
+    def stored_results_report(self,
+                              sort_by: str = 'proofs_found',
+                              descending: bool = False,
+                              limit: int = None,
+                              offset: int = 0,
+                              min_ratio: float = None,
+                              max_ratio: float = None,
+                              plot_types: List = None) -> Dict:
+        if self.coordinator_url:
+            return fetch_farm_report(self.coordinator_url,
+                                     token=self.coordinator_token,
+                                     sort_by=sort_by,
+                                     descending=descending,
+                                     limit=limit,
+                                     offset=offset,
+                                     min_ratio=min_ratio,
+                                     max_ratio=max_ratio,
+                                     plot_types=plot_types)
+        # streamed from the storage backend, only the requested page of rows is kept in memory when a limit is set
+        return self.build_stored_report([path.basename(_) for _ in self.all_plots_paths],
+                                        sort_by=sort_by,
+                                        descending=descending,
+                                        limit=limit,
+                                        offset=offset,
+                                        row_filter=report_filter(min_ratio=min_ratio,
+                                                                 max_ratio=max_ratio,
+                                                                 plot_types=plot_types))
+
+    def export_stored_results(self,
+                              output_handle,
+                              output_format: str = 'csv',
+                              **report_options) -> Dict:
+        report = self.stored_results_report(**report_options)
+        if output_format == 'json':
+            write_json(report['rows'], output_handle)
+        else:
+            write_csv(report['rows'], output_handle)
+        return report['statistics']
 
     def print_stored_results(self,
-                             filter_by):
+                             filter_by,
+                             page: int = 0,
+                             page_size: int = 50,
+                             **report_options) -> bool:
+        from tabulate import tabulate
         try:
 
-            list_with_all_plots = self.parse_and_return_relevant_data([path.basename(_) for _ in self.all_plots_paths])
-
-            # filter plots with no past checks
-            not_checked_plots = list(filter(lambda x:not x['challenges_tried'], list_with_all_plots))
-            checked_plots = list(filter(lambda x:x['challenges_tried'], list_with_all_plots))
-
-            # sort the results
-            sorted_checked_plots = sorted(checked_plots,
-                                 key=lambda x: ((x['proofs_found'] / x['challenges_tried']) if filter_by == 'proofs_found'
-                                                else x['challenges_tried'] if filter_by == 'challenges_tried'
-                                                else x['proofs_found']))
+            # only a page of the sorted plots is rendered, the plots with no past checks are placed at the end
+            report = self.stored_results_report(sort_by=filter_by,
+                                                limit=page_size,
+                                                offset=page * page_size,
+                                                **report_options)
+            statistics = report['statistics']
 
             # reporting phase
-            headers = ['Plot name', 'Challenges', 'Proofs Ratio']
+            # fast scan results (qualities counted without full proof verification) are flagged per challenge
+            headers = ['Plot name', 'Challenges', 'Proofs Ratio', 'Verified challenges']
             table_rows = []
 
-            for result in sorted_checked_plots+not_checked_plots:
-                ratio = (result['proofs_found'] / result['challenges_tried'])\
-                    if result['challenges_tried'] else 0
+            for result in report['rows']:
                 row = [result['name'],
                        result['challenges_tried'],
-                       ratio]
+                       result['proofs_ratio'] or 0,
+                       result['verified_challenges']]
 
                 table_rows.append(row)
 
-            self._log.info('\n' + tabulate(table_rows, headers=headers, tablefmt="grid"))
+            first_row = page * page_size + 1 if table_rows else 0
+            self._log.info('\n' + tabulate(table_rows, headers=headers, tablefmt="grid")
+                           + f"\nShowing plots { first_row }-{ page * page_size + len(table_rows) } of { statistics['matching_plots'] };"
+                             f" use the CLI report with --format csv/ json for the full list.")
+            self._log.info(f"{ statistics['checked_plots'] } checked/ { statistics['not_checked_plots'] } not checked plots,"
+                           f" { statistics['challenges_tried'] } challenges, overall ratio { statistics['overall_ratio'] },"
+                           f" ratio range [{ statistics['min_ratio'] }, { statistics['max_ratio'] }],"
+                           f" { statistics['plots_below_0.8_ratio'] } plots below a ratio of 0.8, plot types { statistics['plot_types'] }")
+            return True
         except:
             self._log.error('Oh snap ! An error has occurred while printing the stored results:\n{}'.format(format_exc(chain=False)))
+            return False
+
+    def analyze_stored_results(self,
+                               expected_ratio: float = default_expected_ratio,
+                               alpha: float = default_alpha) -> Dict:
+        # the per challenge proofs of every plot, tested in a single vectorised pass, see _00_analytics
+        if self.coordinator_url:
+            return fetch_farm_analytics(self.coordinator_url,
+                                        expected_ratio=expected_ratio,
+                                        alpha=alpha,
+                                        token=self.coordinator_token)
+        return analyze_proof_counts(self.iter_proof_counts([path.basename(_) for _ in self.all_plots_paths]),
+                                    disk_by_name={path.basename(plot_path): get_disk_key(plot_path,
+                                                                                         getattr(self, 'plots_stats', {}).get(plot_path))
+                                                  for plot_path in self.all_plots_paths},
+                                    expected_ratio=expected_ratio,
+                                    alpha=alpha)
+
+    def print_analytics(self,
+                        analytics: Dict,
+                        top: int = 50) -> bool:
+        from tabulate import tabulate
+        try:
+
+            summary = analytics['summary']
+            headers = ['Plot name', 'Disk', 'Challenges', 'Proofs', 'Proofs Ratio', 'Zero proof challenges', 'p-value', 'q-value']
+            table_rows = [[row['name'], row['disk'], row['challenges'], row['proofs'], row['proofs_ratio'],
+                           row['zero_challenges'], row['p_value'], row['q_value']]
+                          for row in analytics['underperformers'][:top]]
+            self._log.info(f"{ summary['flagged_plots'] } of { summary['checked_plots'] } checked plots find significantly fewer proofs"
+                           f" than a healthy plot (proofs ratio { analytics['parameters']['expected_ratio'] },"
+                           f" false discovery rate { analytics['parameters']['alpha'] }):"
+                           + ('\n' + tabulate(table_rows, headers=headers, tablefmt="grid") if table_rows else ' none.')
+                           + (f'\nShowing the { top } most significant ones; use --format json for the full list.'
+                              if summary['flagged_plots'] > top else ''))
+            for field in aggregate_fields:
+                self._log.info(f'Per { field }, worst proofs ratio first:\n'
+                               + tabulate([[group['name'], group['plots'], group['checked_plots'], group['challenges'],
+                                            group['proofs_ratio'], group['flagged_plots'], group['p_value']]
+                                           for group in analytics['aggregates'][field][:top]],
+                                          headers=[field, 'Plots', 'Checked plots', 'Challenges', 'Proofs Ratio', 'Flagged plots', 'p-value'],
+                                          tablefmt="grid"))
+            self._log.info(f"{ summary['plots'] } plots, { summary['challenges'] } challenges, overall ratio { summary['proofs_ratio'] }")
+            return True
+        except:
+            self._log.error('Oh snap ! An error has occurred while printing the analytics:\n{}'.format(format_exc(chain=False)))
+            return False
+
+    def group_plots_by_disk(self,
+                            plots_paths: List = None) -> Dict:
+        # the plots of each disk keep the order of plots_paths (all_plots_paths by default)
+        plots_by_disk = {}
+        for plot_index, plot_path in enumerate(plots_paths if plots_paths is not None else self.all_plots_paths, 1):
+            plots_by_disk.setdefault(get_disk_key(plot_path,
+                                                  getattr(self, 'plots_stats', {}).get(plot_path)),
+                                     []).append((plot_index, plot_path))
+        return plots_by_disk
+
+    def join_farm(self,
+                  coordinator_url: str,
+                  worker_name: str = None,
+                  token: str = None):
+        """Makes this back end a worker of a farm: the results are still stored locally and also streamed to the coordinator"""
+        self.storage = farm_worker_storage(self.storage,
+                                           coordinator_url,
+                                           worker_name=worker_name,
+                                           token=token)
+        self.farm_worker = self.storage
+
+    def register_with_farm(self):
+        # the coordinator learns the plots of this worker (the never checked ones included) and asks for the results it misses
+        if self.farm_worker:
+            self.farm_worker.register_plots([{'name': path.basename(plot_path),
+                                              'path': plot_path,
+                                              'disk': get_disk_key(plot_path,
+                                                                   getattr(self, 'plots_stats', {}).get(plot_path))}
+                                             for plot_path in self.all_plots_paths])
+
+    def serve_farm(self,
+                   port: int = default_farm_port,
+                   address: str = '127.0.0.1',
+                   token: str = None) -> farm_coordinator:
+        """Makes this back end the coordinator of a farm: the results of the workers are merged into its storage"""
+        coordinator = farm_coordinator(self,
+                                       registry_path=path.join(self.wd_root, 'LEAF_farm.json'),
+                                       token=token)
+        coordinator.serve(port=port,
+                          address=address)
+        return coordinator
 
     def check_plots(self,
                     nr_challenges: int,
                     delay_between_checks: float,
                     progress_callback,
                     stop_flag_check,
-                    specific_challenge: AnyStr = None):
+                    specific_challenge: AnyStr = None,
+                    workers_per_disk: int = 1,
+                    check_mode: str = 'full',
+                    verification_sample_rate: int = 20,
+                    target_p95_lookup_ms: float = None,
+                    metrics_textfile: str = None,
+                    early_stopping: bool = False,
+                    bad_proofs_ratio: float = 0.7,
+                    scheduling: str = 'discovery',
+                    time_budget_sec: float = None,
+                    verification_workers: int = 0,
+                    verification_pool_kind: str = default_verification_pool_kind,
+                    plots_paths: List = None) -> bool:
+        # plots_paths: the plots to check, all the discovered plots by default
+        # returns False when the check failed or any plot could not be checked, e.g. for the exit code of the CLI
+        self.plots_to_check = plots_paths if plots_paths is not None else self.all_plots_paths
+        self.verification_pool = None
         try:
 
-            # reset the progress bar
+            if check_mode not in check_modes:
+                raise Exception(f'Unknown check mode { check_mode }, valid options: { check_modes }')
+            if verification_pool_kind not in verification_pool_kinds:
+                raise Exception(f'Unknown verification pool { verification_pool_kind }, valid options: { verification_pool_kinds }')
+            if scheduling not in scheduling_modes:
+                raise Exception(f'Unknown scheduling { scheduling }, valid options: { scheduling_modes }')
+            if early_stopping:
+                # fails early on invalid parameters, before any plot is opened
+                sequential_test(bad_ratio=bad_proofs_ratio)
+                self._log.info(f'Early stopping enabled: each plot is checked until it is confidently healthy (proofs ratio 1.0)'
+                               f' or damaged (proofs ratio { bad_proofs_ratio }), up to { nr_challenges } challenges.')
+
+            self.register_with_farm()
+
+            self.throughput = throughput_meter()
+            # when a latency target is provided, it replaces the fixed delay between the checks
+            self.throttle = adaptive_throttle(target_p95_lookup_ms) if target_p95_lookup_ms else None
+            if self.throttle:
+                self._log.info(f'Adaptive throttling enabled: keeping the p95 lookup latency of each disk under { target_p95_lookup_ms } ms.')
+            # a time budget ends the check just like a STOP, the progress is saved and resumed on the next run
+            deadline = time() + time_budget_sec if time_budget_sec else None
+            user_stop_flag_check = stop_flag_check
+            stop_flag_check = lambda: user_stop_flag_check() or (deadline is not None and time() > deadline)
+            if deadline:
+                self._log.info(f'Time budget: the check will stop after { time_budget_sec / 3600:.2f} hours.')
+
+            challenges = challenge_set(nr_challenges) if not specific_challenge else None
+            self.metrics.set_checking(True)
+            if scheduling == 'priority':
+                plots_paths = prioritize_plots(self.plots_to_check,
+                                               self.parse_and_return_relevant_data([path.basename(_) for _ in self.plots_to_check]))
+                self._log.info('Priority scheduling: the never checked plots go first, then the suspicious/ least sampled ones,'
+                               ' then the healthy ones checked the longest ago.')
+            else:
+                plots_paths = self.plots_to_check
+            plots_by_disk = self.group_plots_by_disk(plots_paths)
+            # the proofs of every disk are verified by a shared pool, while the disk workers go on reading
+            if verification_workers:
+                self.verification_pool = verification_pool(workers=verification_workers,
+                                                           kind=verification_pool_kind)
+                self._log.info(f'The full proofs are verified by a pool of { verification_workers } { verification_pool_kind }(s).')
+            workers_per_disk = max(1, int(workers_per_disk))
+            self._log.info(f'The plots are spread over { len(plots_by_disk) } disk(s),'
+                           f' will use up to { workers_per_disk } worker(s) per disk.')
+            failed_plots = []
+
+            # reset the progress bar; with several plots checked at once, their sub-progress updates interleave
             progress_callback(subprogress={'maximum': 0,
                                            'value': 0,
                                            'text': f'0 / { nr_challenges }'},
                               progress={'maximum': 0,
                                         'value': 0,
-                                        'text': f'0 / { len(self.all_plots_paths) }'})
+                                        'text': f'0 / { len(self.plots_to_check) }'},
+                              parallel_plots=min(len(plots_paths), len(plots_by_disk) * workers_per_disk))
+
+            def disk_worker(disk_queue: Queue):
+                while not stop_flag_check():
+                    try:
+                        plot_index, plot_path = disk_queue.get(block=False)
+                    except Empty:
+                        return
+                    try:
+                        plot_checked = self._check_single_plot(plot_index=plot_index,
+                                                plot_path=plot_path,
+                                                nr_challenges=nr_challenges,
+                                                delay_between_checks=delay_between_checks,
+                                                progress_callback=progress_callback,
+                                                stop_flag_check=stop_flag_check,
+                                                specific_challenge=specific_challenge,
+                                                challenges=challenges,
+                                                check_mode=check_mode,
+                                                verification_sample_rate=verification_sample_rate,
+                                                early_stopping=early_stopping,
+                                                bad_proofs_ratio=bad_proofs_ratio)
+                    except:
+                        plot_checked = False
+                        self._log.error(f'Oh snap ! An error has occurred while checking {plot_path}:'
+                                        f'\n{format_exc(chain=False)}')
+                    if not plot_checked:
+                        failed_plots.append(plot_path)
+
+                    plots_done = self.throughput.add_plot()
+                    self.metrics.increment('plots_checked')
+                    if metrics_textfile:
+                        self.metrics.write_textfile(metrics_textfile)
+                    progress_callback(progress={'maximum': len(self.plots_to_check),
+                                                'value': plots_done,
+                                                'text': f"{ plots_done } / { len(self.plots_to_check) }"
+                                                        f" | { self.throughput.summary() }"})
+
+            with ThreadPoolExecutor(max_workers=max(1, len(plots_by_disk) * workers_per_disk)) as executor:
+                futures = []
+                for disk_key, disk_plots in plots_by_disk.items():
+                    disk_queue = Queue()
+                    for entry in disk_plots:
+                        disk_queue.put(entry)
+                    for _ in range(min(workers_per_disk, len(disk_plots))):
+                        futures.append(executor.submit(disk_worker, disk_queue))
+                for future in futures:
+                    future.result()
+
+            if self.verification_pool:
+                self.verification_pool.shutdown()
+                self.verification_pool = None
+
+            self.flush_summary_index()
+            self.plot_metadata_cache.save(force=True)
+            if self.farm_worker and not self.farm_worker.flush():
+                self._log.warning('Some results could not be sent to the coordinator yet, they will be synced on the next check.')
+            self.metrics.set_checking(False)
+            if metrics_textfile:
+                self.metrics.write_textfile(metrics_textfile,
+                                            force=True)
+
+            if user_stop_flag_check():
+                self._log.warning('STOP requested by the user. Do not worry,'
+                                  ' on the next execution the plot check will resume where it left off.')
+            elif stop_flag_check():
+                self._log.warning('The time budget is used up. Do not worry,'
+                                  ' on the next execution the plot check will resume where it left off.')
+
+            self._log.info(f'Overall throughput: { self.throughput.summary() }')
+            if failed_plots:
+                self._log.error(f'{ len(failed_plots) } plot(s) could not be checked, see the errors above: { failed_plots }')
+            return not failed_plots
 
-            for plot_index, plot_path in enumerate(self.all_plots_paths, 1):
+        except:
+            self._log.error('Oh snap ! An error has occurred while checking the plots:\n{}'.format(format_exc(chain=False)))
+            self.metrics.set_checking(False)
+            if self.verification_pool:
+                self.verification_pool.shutdown()
+                self.verification_pool = None
+            return False
+
+    def watch_plots(self,
+                    input_data: list,
+                    nr_challenges: int,
+                    progress_callback,
+                    stop_flag_check,
+                    recursive: bool = False,
+                    poll_interval_sec: float = 60,
+                    settle_sec: float = 60,
+                    watch_mode: str = 'auto',
+                    check_existing: bool = True,
+                    **check_options) -> bool:
+        """Daemon mode: the plot folders are discovered once, then watched; only the plots added or changed since
+        are checked, with nr_challenges and check_options as for check_plots. Runs until stop_flag_check() is true,
+        then returns False if any of the checks failed."""
+        self._log.info('Looking for plots in the input data ...')
+        watcher = plot_watcher([path.abspath(entry) for entry in input_data],
+                               recursive=recursive,
+                               settle_sec=settle_sec,
+                               watch_mode=watch_mode)
+        self.all_plots_paths, self.plots_stats = list(watcher.plots_paths), watcher.plots_stats
+        self._log.info(f'Discovered { len(self.all_plots_paths) } plots in the provided filepaths & folder paths.')
+        if self._precheck_duplicates():
+            watcher.stop()
+            raise Exception('Duplicate plots found. Please check the logs and rerun the tool.')
+
+        # the plots already fully checked are skipped right away, so this first pass mostly resumes the unfinished ones
+        plots_to_check = list(self.all_plots_paths) if check_existing else []
+        all_checked = True
+        try:
+            while not stop_flag_check():
+                if plots_to_check:
+                    all_checked = self.check_plots(nr_challenges=nr_challenges,
+                                                   progress_callback=progress_callback,
+                                                   stop_flag_check=stop_flag_check,
+                                                   plots_paths=plots_to_check,
+                                                   **check_options) and all_checked
+                    if stop_flag_check():
+                        break
+                    self._log.info(f'Waiting for new plots, { len(self.all_plots_paths) } plots watched ...')
+
+                next_poll = time() + poll_interval_sec
+                while time() < next_poll and not stop_flag_check():
+                    sleep(min(1, poll_interval_sec))
                 if stop_flag_check():
-                    self._log.warning('STOP requested by the user. Do not worry,'
-                                      ' on the next execution the plot check will resume where it left off.')
-                    return
-
-                if not path.isfile(plot_path):
-                    self._log.warning('{} is not a valid path. It will be skipped.'.format(plot_path))
-                else:
-                    plot_name = path.basename(plot_path)
-                    self._log.info(f'Please wait, now checking plot {plot_index}/{len(self.all_plots_paths)}: {plot_name}')
-
-                    existing_data_for_plot = self.load_data(plot_name)
-                    working_set = existing_data_for_plot if existing_data_for_plot else {'challenges': {},
-                                                                                         'path_history': []}
-
-                    working_set['path_history'].append(plot_path)
-                    working_set['path_history'] = working_set['path_history'][-5:]
-
-                    # ##########################################
-                    # if a specific challenge was provided
-                    if specific_challenge:
-                        self._log.info(f"Specific challenge provided, will check ONLY that one: {specific_challenge}")
-                        try:
-                            plot_obj = Plot(plot_filepath=plot_path)
-                            plot_obj.test_challenge(challenge=bytes.fromhex(specific_challenge))
-                        except:
-                            self._log.error(f'Found an error while checking a specific challenges for {plot_path}'
-                                            f' \n{format_exc(chain=False)}')
-                    # otherwise check multiple challenges in a range of (0, nr_challenges)
+                    break
+
+                added, changed, removed = watcher.poll()
+                self.all_plots_paths = list(watcher.plots_paths)
+                for plot_path in removed:
+                    self._log.info(f'The plot { plot_path } is gone, it is not watched anymore.')
+                if removed and not (added or changed):
+                    # otherwise the next check registers them
+                    self.register_with_farm()
+                for plot_path in changed:
+                    # the stored results belong to the previous content of the file
+                    self._log.warning(f'The plot { plot_path } changed on disk since it was checked, its stored results are dropped.')
+                    self.drop_data(path.basename(plot_path))
+
+                # the same plot name at another path is reported and left out, as for a regular check
+                duplicates = find_duplicates(self.all_plots_paths)
+                plots_to_check = []
+                for plot_path in added + changed:
+                    if path.basename(plot_path) in duplicates:
+                        self._log.warning(f'Found duplicate plot { path.basename(plot_path) }: { duplicates[path.basename(plot_path)] },'
+                                          f' { plot_path } will not be checked.')
                     else:
+                        plots_to_check.append(plot_path)
+                if added or changed:
+                    self._log.info(f'{ len(added) } new and { len(changed) } changed plot(s) found, { len(plots_to_check) } queued for a check.')
+        finally:
+            watcher.stop()
+            self._log.info('Stopped watching the plots.')
+        return all_checked
+
+    def generate_plot_keys(self,
+                           output_handle=None,
+                           output_format: str = 'csv',
+                           workers: int = None,
+                           chunk_size: int = 256) -> int:
+        """The plot public keys of all the discovered plots, for all the configured forks, in bulk.
+        The headers come from the metadata cache (the missing ones are read, one thread per disk),
+        then only the keys never derived are, in a process pool. They are cached with the headers and,
+        with an output_handle, written as csv/ json rows. Returns the nr of plots with new keys."""
+        ports = [port for _, port in self.forks]
+
+        def read_headers(disk_plots):
+            headers = {}
+            for _, plot_path in disk_plots:
+                cached_metadata = self.plot_metadata_cache.get(plot_path,
+                                                               identity=plot_metadata_cache.identity_from_stat(self.plots_stats[plot_path])
+                                                                        if plot_path in getattr(self, 'plots_stats', {}) else None)
+                try:
+                    headers[plot_path] = cached_metadata if cached_metadata else\
+                        self.plot_class(plot_filepath=plot_path,
+                                        metadata_cache=self.plot_metadata_cache,
+                                        forks=[]).metadata()
+                except:
+                    self._log.error(f'Failed to read the header of {plot_path}, its keys are skipped:\n{format_exc(chain=False)}')
+            return headers
+
+        headers = {}
+        plots_by_disk = self.group_plots_by_disk()
+        with ThreadPoolExecutor(max_workers=max(1, len(plots_by_disk))) as executor:
+            for disk_headers in executor.map(read_headers, plots_by_disk.values()):
+                headers.update(disk_headers)
+
+        missing_keys = [(plot_path, [port for port in ports if plot_key_name(port) not in metadata['plot_public_keys']])
+                        for plot_path, metadata in headers.items()]
+        missing_keys = [(plot_path, missing_ports) for plot_path, missing_ports in missing_keys if missing_ports]
+        self._log.info(f'{ len(headers) } plot headers read, deriving the plot public keys of { len(missing_keys) } plots'
+                       f' for the forks { [fork_name for fork_name, _ in self.forks] } ...')
+
+        derivation_arguments = [[headers[plot_path]['local_master_sk'] for plot_path, _ in missing_keys],
+                                [headers[plot_path]['farmer_public_key'] for plot_path, _ in missing_keys],
+                                [headers[plot_path]['plot_type'] == 'NFT' for plot_path, _ in missing_keys],
+                                [missing_ports for _, missing_ports in missing_keys]]
+        # a single chunk is not worth starting the processes
+        if len(missing_keys) <= chunk_size:
+            derived_keys = list(map(derive_plot_public_keys, *derivation_arguments))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                derived_keys = list(executor.map(derive_plot_public_keys, *derivation_arguments,
+                                                 chunksize=chunk_size))
+        for (plot_path, _), plot_keys in zip(missing_keys, derived_keys):
+            headers[plot_path] = {**headers[plot_path],
+                                  'plot_public_keys': {**headers[plot_path]['plot_public_keys'], **plot_keys}}
+            self.plot_metadata_cache.set(plot_path,
+                                         headers[plot_path])
+        self.plot_metadata_cache.save(force=True)
+
+        if output_handle:
+            write_plot_keys(({'name': path.basename(plot_path),
+                              'plot_id': metadata['id'],
+                              'plot_type': metadata['plot_type'],
+                              'fork': fork_name,
+                              'port': port,
+                              'plot_public_key': metadata['plot_public_keys'][plot_key_name(port)]}
+                             for plot_path, metadata in ((_, headers[_]) for _ in self.all_plots_paths if _ in headers)
+                             for fork_name, port in self.forks),
+                            output_handle,
+                            output_format=output_format)
+        return len(missing_keys)
+
+    def serve_metrics(self,
+                      port: int,
+                      address: str = '127.0.0.1'):
+        # the Prometheus endpoint stays up between the checks, e.g. for the GUI or a daemon
+        self.metrics.serve(port=port,
+                           address=address)
+
+    def _check_single_plot(self,
+                           plot_index: int,
+                           plot_path: AnyStr,
+                           nr_challenges: int,
+                           delay_between_checks: float,
+                           progress_callback,
+                           stop_flag_check,
+                           specific_challenge: AnyStr = None,
+                           challenges: challenge_set = None,
+                           check_mode: str = 'full',
+                           verification_sample_rate: int = 20,
+                           early_stopping: bool = False,
+                           bad_proofs_ratio: float = 0.7) -> bool:
+        # False when the plot could not be checked, a STOP still counts as a success
+
+        if not path.isfile(plot_path):
+            self._log.warning('{} is not a valid path. It will be skipped.'.format(plot_path))
+            return False
+
+        plot_name = path.basename(plot_path)
+        disk_key = get_disk_key(plot_path)
+        self._log.info(f'Please wait, now checking plot {plot_index}/{len(self.plots_to_check)}: {plot_name}')
+
+        existing_data_for_plot = self.load_data(plot_name)
+        working_set = existing_data_for_plot if existing_data_for_plot else {'challenges': {},
+                                                                             'path_history': []}
+
+        working_set['path_history'].append(plot_path)
+        working_set['path_history'] = working_set['path_history'][-5:]
+
+        # ##########################################
+        # if a specific challenge was provided
+        if specific_challenge:
+            self._log.info(f"Specific challenge provided, will check ONLY that one: {specific_challenge}")
+            try:
+                plot_obj = self.plot_class(plot_filepath=plot_path,
+                                           metadata_cache=self.plot_metadata_cache,
+                                           forks=self.forks)
+                proofs = plot_obj.test_challenge(challenge=bytes.fromhex(specific_challenge))
+                self._log.info(f'Found { proofs } proofs for the challenge { specific_challenge }.')
+                self.throughput.add_challenge()
+            except:
+                self._log.error(f'Found an error while checking a specific challenges for {plot_path}'
+                                f' \n{format_exc(chain=False)}')
+                return False
+        # otherwise check multiple challenges in a range of (0, nr_challenges)
+        else:
+            try:
+                sequential = sequential_test(bad_ratio=bad_proofs_ratio) if early_stopping else None
+                stored_early_stop = working_set.get('early_stop', {})
+                # a plot already decided by the same test is not checked again
+                if sequential\
+                        and stored_early_stop.get('decision', decision_undecided) != decision_undecided\
+                        and all(stored_early_stop.get(key) == value for key, value in sequential.parameters().items()):
+                    self._log.info(f"This plot was already found { stored_early_stop['decision'] } after { stored_early_stop['challenges'] } challenges,"
+                                   f" with a confidence of { stored_early_stop['confidence'] }.")
+                # only do the checks below if the plots has not been fully checked before
+                # this check saves some I/O requests
+                elif nr_challenges > len(working_set['challenges'].keys()):
+                    challenges = challenges if challenges else challenge_set(nr_challenges)
+                    plot_obj = self.plot_class(plot_filepath=plot_path,
+                                               metadata_cache=self.plot_metadata_cache,
+                                               forks=self.forks)
+                    plot_data = plot_obj.plot_data()
+                    working_set['plot_size'] = plot_data['size']
+                    working_set['plot_id'] = plot_data['id'].hex()
+                    working_set['farmer_public_key'] = str(plot_data['farmer_public_key'])
+                    working_set['local_master_sk'] = str(plot_data['local_master_sk'])
+                    working_set['pool_public_key_or_puzzle_hash'] = str(plot_data['pool_public_key_or_puzzle_hash'])
+                    working_set['plot_type'] = plot_data['plot_type']
+                    working_set.update(plot_data['plot_public_keys'])
+                    # the challenges are referred by index, the actual bytes come from this challenge set
+                    working_set['challenge_set'] = challenges.definition
+                    # a plot resumed in another mode is labelled mixed, the verified flag of each challenge tells them apart
+                    # (the results stored before the check modes were all fully verified)
+                    previous_check_mode = working_set.get('check_mode', 'full') if working_set['challenges'] else check_mode
+                    working_set['check_mode'] = check_mode if previous_check_mode == check_mode else 'mixed'
+                    # this also folds any journal left behind by an interrupted run into the snapshot
+                    self.compact_data(plot_name,
+                                      working_set)
+
+                    total_proofs = 0
+                    challenges_checked = 0
+                    # the first hit may have been verified by a previous run
+                    first_hit_verified = any(result['proofs'] > 0 and result.get('verified', True)
+                                             for result in working_set['challenges'].values())
+                    # with a verification pool, the challenge standing for the first hit while its proofs are verified
+                    first_hit_challenge = None
+                    # the per plot latency histograms are stored with the results and keep growing across the runs
+                    plot_latency = plot_latency_histograms(working_set.get('latency'))
+                    # the challenges in flight, in challenge order; with a verification pool, their proofs may still be verified
+                    pending_challenges = deque()
+
+                    def record_result(challenge_index: int,
+                                      verify_proofs: bool,
+                                      proofs: int,
+                                      phase_timings: List):
+                        nonlocal total_proofs, challenges_checked, first_hit_verified
+                        total_proofs += proofs
+                        challenges_checked += 1
+                        # None: the result was stored by a previous run
+                        if verify_proofs is None:
+                            return
+
+                        first_hit_verified = first_hit_verified or (verify_proofs and proofs > 0)
+                        # the verified flag tells fully verified results apart from fast-scan ones
+                        working_set['challenges'][str(challenge_index)] = {'proofs': proofs,
+                                                                           'verified': verify_proofs}
+                        self.throughput.add_challenge()
+                        self.metrics.increment('challenges_checked')
+                        self.metrics.increment('proofs_found', proofs)
+
+                        progress_callback(subprogress={'maximum': nr_challenges,
+                                                       'value': challenge_index+1,
+                                                       'text': f"{ challenge_index+1 } / { nr_challenges }"}
+                                          )
+                        save_start = perf_counter()
+                        self.append_challenge_result(plot_name,
+                                                     challenge_index,
+                                                     working_set['challenges'][str(challenge_index)])
+                        for phase, seconds in phase_timings + [('save', perf_counter() - save_start)]:
+                            plot_latency[phase].observe(seconds)
+                            self.metrics.observe(phase=phase,
+                                                 seconds=seconds,
+                                                 disk_key=disk_key)
+
+                    def settle_results(block: bool):
+                        # the finished challenges are recorded in order, so the totals and the early stop see them in sequence
+                        # a failed verification is logged and counted, its challenge is not recorded
+                        nonlocal first_hit_verified, verification_errors
+                        while pending_challenges and (block or pending_challenges[0][2].done()):
+                            challenge_index, verify_proofs, result, fetch_timings = pending_challenges.popleft()
+                            try:
+                                proofs, validate_timings = result.result()
+                            except:
+                                if challenge_index == first_hit_challenge:
+                                    # the first hit was not verified after all
+                                    first_hit_verified = False
+                                verification_errors += 1
+                                self._log.error(f'Found an error while verifying the proofs of {plot_path}'
+                                                f' \n{format_exc(chain=False)}')
+                                continue
+                            record_result(challenge_index, verify_proofs, proofs, fetch_timings + validate_timings)
+                            # the stored results count too, so a resumed plot reaches its decision again
+                            if sequential and sequential.decision == decision_undecided\
+                                    and sequential.update(proofs) != decision_undecided:
+                                self._log.info(f'Early stop: the plot is { sequential.decision } with a confidence of { sequential.confidence() },'
+                                               f' after { sequential.challenges } challenges.')
+
+                    last_summary_log = perf_counter()
+                    stopped = False
+                    verification_errors = 0
+
+                    try:
+                        for challenge_index in range(0, nr_challenges):
+                            if stop_flag_check():
+                                stopped = True
+                                break
+
+                            if self._log.isEnabledFor(DEBUG):
+                                self._log.debug(f'Checking challenge {challenge_index + 1}/{nr_challenges} ...')
+                            if perf_counter() - last_summary_log >= self.log_summary_every_sec:
+                                last_summary_log = perf_counter()
+                                self._log.info(f'{ plot_name }: { challenge_index }/{ nr_challenges } challenges, { total_proofs } proofs so far'
+                                               f' | { self.throughput.summary() }')
+
+                            if str(challenge_index) not in working_set['challenges'].keys():
+                                verify_proofs = check_mode == 'full'\
+                                                or (check_mode == 'sampled' and randrange(max(1, verification_sample_rate)) == 0)\
+                                                or (check_mode == 'first_hit' and not first_hit_verified)
+                                if self.verification_pool and verify_proofs:
+                                    # only the disk reads happen here, the next challenge is read while these proofs are verified
+                                    qualities, proofs = plot_obj.fetch_proofs(challenge=challenges[challenge_index])
+                                    result = self.verification_pool.submit(plot_obj.verifier_factory, plot_obj.id, plot_obj.size,
+                                                                           challenges[challenge_index], qualities, proofs, plot_path)
+                                    if check_mode == 'first_hit' and proofs:
+                                        # the next challenges are only fast scanned while these proofs are verified
+                                        first_hit_verified = True
+                                        first_hit_challenge = challenge_index
+                                else:
+                                    result = completed((plot_obj.test_challenge(challenge=challenges[challenge_index],
+                                                                                verify_proofs=verify_proofs), []))
+                                pending_challenges.append((challenge_index, verify_proofs, result, plot_obj.last_phase_timings))
+
+                                if self.throttle:
+                                    self.throttle.record(disk_key,
+                                                         plot_obj.last_lookup_latencies)
+                                    self.throttle.wait(disk_key)
+                                elif delay_between_checks:
+                                    self._log.debug(f"Going to sleep for { delay_between_checks } seconds ...")
+                                    sleep(delay_between_checks)
+                            else:
+                                self._log.debug('This challenge was already checked for this plot.')
+                                pending_challenges.append((challenge_index, None,
+                                                           completed((working_set['challenges'][str(challenge_index)]['proofs'], [])), []))
+
+                            settle_results(block=False)
+                            # past a failed verification, no new challenge is read from this plot
+                            if verification_errors or (sequential and sequential.decision != decision_undecided):
+                                break
+                    finally:
                         try:
-                            # only do the checks below if the plots has not been fully checked before
-                            # this check saves some I/O requests
-                            if nr_challenges > len(working_set['challenges'].keys()):
-                                plot_obj = Plot(plot_filepath=plot_path)
-                                plot_data = plot_obj.plot_data()
-                                working_set['plot_size'] = plot_data['size']
-                                working_set['plot_id'] = plot_data['id'].hex()
-                                working_set['farmer_public_key'] = str(plot_data['farmer_public_key'])
-                                working_set['local_master_sk'] = str(plot_data['local_master_sk'])
-                                working_set['pool_public_key_or_puzzle_hash'] = str(plot_data['pool_public_key_or_puzzle_hash'])
-                                working_set['plot_type'] = plot_data['plot_type']
-                                working_set.update(plot_data['plot_public_keys'])
-                                self.save_data(plot_name,
-                                               working_set)
-
-                                total_proofs = 0
-
-                                for challenge_index in range(0, nr_challenges):
-                                    if stop_flag_check():
-                                        self._log.warning('STOP requested by the user. Do not worry,'
-                                                          ' on the next execution the plot check will resume where it left off.')
-                                        return
-
-                                    self._log.info(f'Checking challenge {challenge_index + 1}/{nr_challenges} ...')
-
-                                    if str(challenge_index) not in working_set['challenges'].keys():
-                                        challenge = std_hash(challenge_index.to_bytes(32, "big"))
-                                        working_set['challenges'][challenge_index] = {'challenge': challenge.hex()}
-                                        self._log.info(f'Prepared challenge {challenge_index + 1}/{nr_challenges}: { challenge.hex() }')
-
-                                        proofs = plot_obj.test_challenge(challenge=challenge)
-                                        working_set['challenges'][challenge_index]['proofs'] = proofs
-                                        total_proofs += proofs
-
-                                        progress_callback(subprogress={'maximum': nr_challenges,
-                                                                       'value': challenge_index+1,
-                                                                       'text': f"{ challenge_index+1 } / { nr_challenges }"}
-                                                          )
-                                        self.save_data(plot_name,
-                                                       working_set)
-
-                                        if delay_between_checks:
-                                            self._log.info(f"Going to sleep for { delay_between_checks } seconds ...")
-                                            sleep(delay_between_checks)
-                                    else:
-                                        self._log.info('This challenge was already checked for this plot.')
-                                        total_proofs += working_set['challenges'][str(challenge_index)]['proofs']
-
-                                self._log.info(f'DONE. Found { total_proofs } proofs/ { nr_challenges } checks, with a ratio of { total_proofs/nr_challenges }.')
-
-                        except:
-                            self._log.error(f'Found an error while checking multiple challenges for {plot_path}'
-                                            f' \n{format_exc(chain=False)}')
-
-                progress_callback(progress={'maximum': len(self.all_plots_paths),
-                                            'value': plot_index,
-                                            'text': f"{ plot_index } / { len(self.all_plots_paths) }"})
+                            # the verifications still running are waited for, each failure is counted
+                            settle_results(block=True)
+                        finally:
+                            working_set['latency'] = {phase: plot_latency[phase].to_dict() for phase in phases}
+                            if sequential:
+                                working_set['early_stop'] = sequential.summary()
+                            # end of plot, STOP or error: fold the journal back into the snapshot
+                            self.compact_data(plot_name,
+                                              working_set)
+
+                    if verification_errors:
+                        raise Exception(f'The proofs of { verification_errors } challenge(s) could not be verified.')
+                    if stopped:
+                        return True
+                    self._log.info(f'DONE. Found { total_proofs } proofs/ { challenges_checked } checks, with a ratio of { total_proofs/max(challenges_checked, 1) }.')
+                    # a slow disk shows up in the qualities/ full_proof phases, a slow CPU in validate
+                    self._log.info('Mean latency per phase: ' + ', '.join(f'{ phase } { plot_latency[phase].sum / plot_latency[phase].count * 1000:.1f} ms'
+                                                                          for phase in phases if plot_latency[phase].count))
 
-        except:
-            self._log.error('Oh snap ! An error has occurred while checking the plots:\n{}'.format(format_exc(chain=False)))
\ No newline at end of file
+            except:
+                self._log.error(f'Found an error while checking multiple challenges for {plot_path}'
+                                f' \n{format_exc(chain=False)}')
+                return False
+        return True
\ No newline at end of file
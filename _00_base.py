@@ -1,14 +1,27 @@
-from logging import basicConfig,\
-    INFO, DEBUG, WARNING, ERROR, CRITICAL,\
+from logging import INFO, DEBUG, WARNING, ERROR, CRITICAL,\
     Formatter,\
     StreamHandler, Handler,\
     getLogger
+from logging.handlers import QueueListener,\
+    QueueHandler as ListenerQueueHandler
 from concurrent_log_handler import ConcurrentRotatingFileHandler
 from sys import stdout
 from queue import Queue
 from os import system
+from atexit import register
+
+# the thread writing the records to the console and to runtime_log.log, see configure_logger
+_log_listener: QueueListener = None
+
+def configure_logger(console_stream=stdout,
+                     level=INFO):
+    """The console and file handlers run on a single listener thread; the logging threads (e.g. the plot checks)
+    only put their records in a queue, so they never wait for the file lock of ConcurrentRotatingFileHandler.
+    Use level=DEBUG for the details of every challenge."""
+    global _log_listener
+    if _log_listener:
+        return _log_listener
 
-def configure_logger():
     class CustomFormatter(Formatter):
         grey = "\x1b[38;21m"
         yellow = "\x1b[33;21m"
@@ -17,20 +30,18 @@ def configure_logger():
         reset = "\x1b[0m"
         format = '%(asctime)s,%(msecs)d %(levelname)-4s [%(filename)s:%(lineno)d -> %(name)s - %(funcName)s] ___ %(message)s'
 
-        FORMATS = {
-            DEBUG: grey + format + reset,
-            INFO: grey + format + reset,
-            WARNING: yellow + format + reset,
-            ERROR: red + format + reset,
-            CRITICAL: bold_red + format + reset
+        FORMATTERS = {
+            DEBUG: Formatter(grey + format + reset),
+            INFO: Formatter(grey + format + reset),
+            WARNING: Formatter(yellow + format + reset),
+            ERROR: Formatter(red + format + reset),
+            CRITICAL: Formatter(bold_red + format + reset)
         }
 
         def format(self, record):
-            log_fmt = self.FORMATS.get(record.levelno)
-            formatter = Formatter(log_fmt)
-            return formatter.format(record)
+            return self.FORMATTERS.get(record.levelno, self.FORMATTERS[INFO]).format(record)
 
-    ch = StreamHandler(stream=stdout)
+    ch = StreamHandler(stream=console_stream)
     ch.setLevel(DEBUG)
     ch.setFormatter(CustomFormatter())
     fh = ConcurrentRotatingFileHandler('runtime_log.log',
@@ -40,12 +51,33 @@ def configure_logger():
     fh.setLevel(DEBUG)
     fh.setFormatter(Formatter('%(asctime)s,%(msecs)d %(levelname)-4s [%(filename)s:%(lineno)d -> %(name)s - %(funcName)s] ___ %(message)s'))
 
-    basicConfig(datefmt='%Y-%m-%d:%H:%M:%S',
-                level=DEBUG,
-                handlers=[
-                    fh,
-                    ch
-                ])
+    log_queue = Queue()
+    _log_listener = QueueListener(log_queue,
+                                  fh,
+                                  ch,
+                                  respect_handler_level=True)
+    _log_listener.start()
+    # the records still queued at exit are written before the process ends
+    register(stop_logger)
+
+    root_logger = getLogger()
+    root_logger.setLevel(level)
+    root_logger.addHandler(ListenerQueueHandler(log_queue))
+    return _log_listener
+
+def stop_logger():
+    # flushes the queued records and detaches the handlers set by configure_logger
+    global _log_listener
+    if not _log_listener:
+        return
+    _log_listener.stop()
+    root_logger = getLogger()
+    for handler in list(root_logger.handlers):
+        if isinstance(handler, ListenerQueueHandler):
+            root_logger.removeHandler(handler)
+    for handler in _log_listener.handlers:
+        handler.close()
+    _log_listener = None
 
 class QueueHandler(Handler):
     """Class to send logging records to a queue
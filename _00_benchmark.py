@@ -0,0 +1,455 @@
+import sys
+from os import path,\
+    devnull,\
+    chdir,\
+    getcwd,\
+    mkdir
+from subprocess import run
+from json import loads,\
+    dumps,\
+    dump
+from statistics import median
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from importlib.util import find_spec
+from hashlib import sha256
+from random import Random
+from math import exp
+from functools import partial
+from time import sleep,\
+    time,\
+    perf_counter
+from platform import platform,\
+    python_version
+from logging import getLogger,\
+    WARNING
+from typing import List,\
+    Dict
+
+from _00_pipeline import default_verification_pool_kind
+
+# the modules that must never be loaded just by importing the back end or the CLI
+heavy_modules = ['plotly', 'tabulate', 'chiapos', 'blspy', 'tkinter', 'PIL', 'numpy']
+
+_import_probe = '''
+import sys
+from time import perf_counter
+from json import dumps
+start = perf_counter()
+import {module}
+print(dumps({{'import_ms': (perf_counter() - start) * 1000,
+              'heavy_modules_loaded': [m for m in {heavy_modules!r} if m in sys.modules]}}))
+'''
+
+class fake_disk_prover():
+    """Stand-in for chiapos.DiskProver: no plot file is read, the lookups only sleep for the configured latency.
+    The number of qualities per challenge is Poisson distributed and deterministic for a (plot, challenge) pair."""
+
+    def __init__(self,
+                 plot_filepath: str,
+                 lookup_latency_sec: float = 0,
+                 proof_latency_sec: float = 0,
+                 mean_qualities: float = 1.0,
+                 failure_rate: float = 0):
+        self.plot_filepath = plot_filepath
+        self.lookup_latency_sec = lookup_latency_sec
+        self.proof_latency_sec = proof_latency_sec
+        self.mean_qualities = mean_qualities
+        self.failure_rate = failure_rate
+        self.id = sha256(path.basename(plot_filepath).encode()).digest()
+
+    def get_size(self) -> int:
+        return int(self.plot_filepath.split('-k')[1].split('-')[0])
+
+    def get_id(self) -> bytes:
+        return self.id
+
+    def get_memo(self) -> bytes:
+        return sha256(self.id).digest() * 4
+
+    def _poisson(self,
+                 rng: Random) -> int:
+        threshold = exp(-self.mean_qualities)
+        count = 0
+        product = rng.random()
+        while product > threshold:
+            count += 1
+            product *= rng.random()
+        return count
+
+    def get_qualities_for_challenge(self,
+                                    challenge: bytes) -> List:
+        if self.lookup_latency_sec:
+            sleep(self.lookup_latency_sec)
+        rng = Random(self.id + bytes(challenge))
+        if rng.random() < self.failure_rate:
+            raise RuntimeError(f'Simulated read failure for { self.plot_filepath }')
+        return [sha256(self.id + bytes(challenge) + bytes([quality_index])).digest()
+                for quality_index in range(self._poisson(rng))]
+
+    def get_full_proof(self,
+                       challenge: bytes,
+                       quality_index: int) -> bytes:
+        if self.proof_latency_sec:
+            sleep(self.proof_latency_sec)
+        # the fake proof carries its own quality, so the fake verifier can check it
+        return sha256(self.id + bytes(challenge) + bytes([quality_index])).digest() + bytes(224)
+
+class fake_verifier():
+    """Stand-in for chiapos.Verifier, optionally burning some CPU (holding the GIL) for each proof, like a real validation"""
+
+    def __init__(self,
+                 validate_cpu_ms: float = 0):
+        self.validate_cpu_ms = validate_cpu_ms
+
+    def validate_proof(self,
+                       plot_id: bytes,
+                       size: int,
+                       challenge: bytes,
+                       proof: bytes) -> bytes:
+        if self.validate_cpu_ms:
+            deadline = perf_counter() + self.validate_cpu_ms / 1000
+            while perf_counter() < deadline:
+                pass
+        return proof[:32]
+
+def build_synthetic_plot_class(prover_options: Dict,
+                               validate_cpu_ms: float = 0):
+    from _00_back_end import Plot
+
+    class synthetic_plot(Plot):
+        """Plot backed by the fake prover/ verifier, with a synthetic header (no blspy needed)"""
+
+        # picklable, for the process verification pool
+        verifier_factory = partial(fake_verifier, validate_cpu_ms=validate_cpu_ms)
+
+        @property
+        def prover(self):
+            if self._prover is None:
+                self._prover = fake_disk_prover(self.plot_filepath, **prover_options)
+            return self._prover
+
+        def read_header(self):
+            self.size = self.prover.get_size()
+            self.id = self.prover.get_id()
+            self.farmer_public_key = sha256(b'farmer' + self.id).hexdigest()
+            self.local_master_sk = sha256(b'local' + self.id).hexdigest()
+            self.pool_public_key_or_puzzle_hash = sha256(b'pool' + self.id).hexdigest()
+            self.plot_type = 'NFT'
+            self._plot_public_keys = {}
+
+    return synthetic_plot
+
+def _bytes_written() -> int:
+    # bytes handed to write() by this process, linux only
+    try:
+        with open('/proc/self/io', 'r') as input_handle:
+            for line in input_handle:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _folder_size(folder: str) -> int:
+    from os import walk
+    return sum(path.getsize(path.join(root, filename)) for root, _, filenames in walk(folder) for filename in filenames)
+
+def _create_plot_files(folder: str,
+                       nr_plots: int,
+                       nr_disks: int = 1) -> List:
+    input_folders = []
+    for disk_index in range(nr_disks):
+        disk_folder = path.join(folder, f'disk{ disk_index }')
+        mkdir(disk_folder)
+        input_folders.append(disk_folder)
+    for plot_index in range(nr_plots):
+        open(path.join(input_folders[plot_index % nr_disks], f'plot-k32-2023-01-01-00-00-{ plot_index:08d}.plot'), 'w').close()
+    return input_folders
+
+class in_temporary_workdir():
+    """LEAF keeps its output/ cache/ catalog relative to the working directory, so every benchmark gets a fresh one"""
+
+    def __enter__(self):
+        self.previous_workdir = getcwd()
+        self.temporary_directory = TemporaryDirectory(prefix='leaf_benchmark_')
+        chdir(self.temporary_directory.name)
+        return self.temporary_directory.name
+
+    def __exit__(self, *args):
+        chdir(self.previous_workdir)
+        self.temporary_directory.cleanup()
+
+def benchmark_import_time(module: str = '_00_back_end',
+                          repeat: int = 5) -> Dict:
+    # every sample runs in a fresh interpreter, so nothing is already cached in sys.modules
+    samples = []
+    heavy_modules_loaded = set()
+    for _ in range(repeat):
+        completed = run([sys.executable, '-c', _import_probe.format(module=module,
+                                                                    heavy_modules=heavy_modules)],
+                        cwd=path.dirname(path.abspath(__file__)),
+                        capture_output=True,
+                        text=True,
+                        check=True)
+        sample = loads(completed.stdout.strip().splitlines()[-1])
+        samples.append(sample['import_ms'])
+        heavy_modules_loaded.update(sample['heavy_modules_loaded'])
+
+    return {'benchmark': 'import_time',
+            'module': module,
+            'repeat': repeat,
+            'median_ms': median(samples),
+            'max_ms': max(samples),
+            'heavy_modules_loaded': sorted(heavy_modules_loaded)}
+
+def benchmark_check_plots(nr_plots: int = 20,
+                          nr_challenges: int = 50,
+                          nr_disks: int = 4,
+                          workers_per_disk: int = 1,
+                          storage_backend: str = 'json',
+                          check_mode: str = 'full',
+                          prover_options: Dict = None,
+                          log_level: str = None,
+                          validate_cpu_ms: float = 0,
+                          verification_workers: int = 0,
+                          verification_pool_kind: str = default_verification_pool_kind) -> Dict:
+    from _00_back_end import LEAF_back_end
+    from _00_base import configure_logger,\
+        stop_logger
+
+    prover_options = prover_options if prover_options else {}
+
+    class benchmark_back_end(LEAF_back_end):
+        plot_class = build_synthetic_plot_class(prover_options,
+                                                validate_cpu_ms=validate_cpu_ms)
+        # the synthetic headers carry no real keys to derive from
+        forks = []
+
+        def group_plots_by_disk(self,
+                                plots_paths: List = None) -> Dict:
+            # every plot lives on the same temporary disk, so the disks are simulated by the input folders
+            plots_by_disk = {}
+            for plot_index, plot_path in enumerate(plots_paths if plots_paths is not None else self.all_plots_paths, 1):
+                plots_by_disk.setdefault(path.dirname(plot_path), []).append((plot_index, plot_path))
+            return plots_by_disk
+
+    with in_temporary_workdir() as workdir, open(devnull, 'w') as console_stream:
+        if log_level:
+            # the full logging pipeline, as set up by the CLI, with the console output discarded
+            configure_logger(console_stream=console_stream,
+                             level=log_level)
+        input_folders = _create_plot_files(workdir, nr_plots, nr_disks)
+        back_end = benchmark_back_end(storage_backend=storage_backend)
+        back_end.parse_input_and_get_paths(input_folders)
+
+        bytes_written_before = _bytes_written()
+        start = perf_counter()
+        back_end.check_plots(nr_challenges=nr_challenges,
+                             delay_between_checks=0,
+                             progress_callback=lambda **kwargs: None,
+                             stop_flag_check=lambda: False,
+                             workers_per_disk=workers_per_disk,
+                             check_mode=check_mode,
+                             verification_workers=verification_workers,
+                             verification_pool_kind=verification_pool_kind)
+        elapsed = perf_counter() - start
+        bytes_written_after = _bytes_written()
+        back_end.storage.close()
+        if log_level:
+            stop_logger()
+            getLogger().setLevel(WARNING)
+
+        stored_bytes = _folder_size('output')
+        total_challenges = back_end.throughput.challenges_done
+        bytes_written = (bytes_written_after - bytes_written_before) if bytes_written_before is not None else None
+
+    return {'benchmark': 'check_plots',
+            'nr_plots': nr_plots,
+            'nr_challenges': nr_challenges,
+            'nr_disks': nr_disks,
+            'workers_per_disk': workers_per_disk,
+            'storage_backend': storage_backend,
+            'check_mode': check_mode,
+            'prover_options': prover_options,
+            'log_level': log_level,
+            'validate_cpu_ms': validate_cpu_ms,
+            'verification_workers': verification_workers,
+            'verification_pool_kind': verification_pool_kind if verification_workers else None,
+            'elapsed_sec': elapsed,
+            'plots_per_hour': nr_plots * 3600 / elapsed,
+            'challenges_per_sec': total_challenges / elapsed,
+            # only meaningful with a zero latency prover, the wall time is then spent in LEAF itself
+            'overhead_ms_per_challenge': (elapsed * nr_disks * workers_per_disk * 1000 / max(total_challenges, 1))
+                                         if not prover_options.get('lookup_latency_sec') and not prover_options.get('proof_latency_sec') else None,
+            'bytes_written': bytes_written,
+            'bytes_written_per_challenge': (bytes_written / max(total_challenges, 1)) if bytes_written is not None else None,
+            'stored_bytes': stored_bytes,
+            'write_amplification': (bytes_written / stored_bytes) if bytes_written is not None and stored_bytes else None}
+
+def benchmark_logging_overhead(nr_plots: int = 20,
+                               nr_challenges: int = 50) -> Dict:
+    # same zero latency check without any handler, then with the logging pipeline at INFO and DEBUG
+    overhead = {}
+    for log_level in [None, 'INFO', 'DEBUG']:
+        overhead[log_level] = benchmark_check_plots(nr_plots=nr_plots,
+                                                    nr_challenges=nr_challenges,
+                                                    nr_disks=1,
+                                                    log_level=log_level)['overhead_ms_per_challenge']
+    return {'benchmark': 'logging_overhead',
+            'nr_plots': nr_plots,
+            'nr_challenges': nr_challenges,
+            'no_logging_ms_per_challenge': overhead[None],
+            'info_logging_ms_per_challenge': overhead['INFO'] - overhead[None],
+            'debug_logging_ms_per_challenge': overhead['DEBUG'] - overhead[None]}
+
+def benchmark_verification_pipeline(nr_plots: int = 20,
+                                    nr_challenges: int = 50,
+                                    nr_disks: int = 4,
+                                    latency_ms: float = 5,
+                                    validate_cpu_ms: float = 2) -> List:
+    # the same check with the proofs verified inline, then by a thread and by a process pool
+    return [benchmark_check_plots(nr_plots=nr_plots,
+                                  nr_challenges=nr_challenges,
+                                  nr_disks=nr_disks,
+                                  prover_options={'lookup_latency_sec': latency_ms / 1000,
+                                                  'proof_latency_sec': latency_ms / 1000},
+                                  validate_cpu_ms=validate_cpu_ms,
+                                  verification_workers=verification_workers,
+                                  verification_pool_kind=verification_pool_kind)
+            for verification_workers, verification_pool_kind in [[0, 'thread'],
+                                                                 [nr_disks, 'thread'],
+                                                                 [nr_disks, 'process']]]
+
+def _store_synthetic_results(back_end,
+                             nr_plots: int,
+                             nr_challenges: int) -> List:
+    rng = Random(nr_plots)
+    plot_names = []
+    for plot_index in range(nr_plots):
+        plot_name = f'plot-k32-2023-01-01-00-00-{ plot_index:08d}.plot'
+        plot_names.append(plot_name)
+        content = {'challenges': {str(challenge_index): {'proofs': rng.choice([0, 0, 1, 1, 1, 2, 2, 3]),
+                                                         'verified': True}
+                                  for challenge_index in range(nr_challenges)},
+                   'path_history': [plot_name],
+                   'plot_id': sha256(plot_name.encode()).hexdigest(),
+                   'plot_type': 'NFT',
+                   'plot_size': 32}
+        if back_end.storage_backend == 'json':
+            # the setup skips the fsync of save_data, only the reports are measured here
+            with open(path.join('output', plot_name + '.json'), 'w') as output_handle:
+                dump(content, output_handle)
+        else:
+            back_end.save_data(plot_name, content)
+    return plot_names
+
+def benchmark_reports(nr_plots: int = 1000,
+                      nr_challenges: int = 100,
+                      storage_backend: str = 'json') -> Dict:
+    from _00_back_end import LEAF_back_end
+
+    with in_temporary_workdir():
+        back_end = LEAF_back_end(storage_backend=storage_backend)
+        plot_names = _store_synthetic_results(back_end, nr_plots, nr_challenges)
+        back_end.all_plots_paths = plot_names
+
+        timings = {}
+        # the first pass rebuilds the summary index (json backend), the second one only reads it
+        for run_name in ['cold', 'warm']:
+            start = perf_counter()
+            back_end.stored_results_report()
+            timings[f'sorted_report_{ run_name }_ms'] = (perf_counter() - start) * 1000
+
+        start = perf_counter()
+        back_end.stored_results_report(limit=50)
+        timings['first_page_report_ms'] = (perf_counter() - start) * 1000
+
+        # the optional dependencies missing here are reported as None
+        timings['print_stored_results_ms'] = None
+        if find_spec('tabulate'):
+            start = perf_counter()
+            back_end.print_stored_results('proofs_found')
+            timings['print_stored_results_ms'] = (perf_counter() - start) * 1000
+
+        timings['histogram_html_ms'] = None
+        if find_spec('plotly') and find_spec('numpy'):
+            start = perf_counter()
+            back_end.trigger_histogram_build(output_filepath='histograms.html')
+            timings['histogram_html_ms'] = (perf_counter() - start) * 1000
+
+        back_end.storage.close()
+
+    return {'benchmark': 'reports',
+            'nr_plots': nr_plots,
+            'nr_challenges': nr_challenges,
+            'storage_backend': storage_backend,
+            **timings}
+
+def main(argv=None) -> int:
+    parser = ArgumentParser(prog='_00_benchmark.py',
+                            description='LEAF benchmarks on a synthetic prover; the results are printed as json, so runs can be compared over time.')
+    parser.add_argument('--suite', choices=['all', 'startup', 'check', 'logging', 'pipeline', 'reports'], default='all')
+    parser.add_argument('--repeat', type=int, default=5, help='Import time samples.')
+    parser.add_argument('--max-import-ms', type=float, default=None, help='Fail if the median import time is above this budget.')
+    parser.add_argument('--plots', type=int, default=20, help='Synthetic plots for the check benchmarks.')
+    parser.add_argument('--challenges', type=int, default=50, help='Challenges per plot for the check benchmarks.')
+    parser.add_argument('--disks', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=5, help='Simulated latency of each lookup.')
+    parser.add_argument('--failure-rate', type=float, default=0)
+    parser.add_argument('--validate-cpu-ms', type=float, default=2, help='Simulated CPU time of each proof validation, for the pipeline benchmark.')
+    parser.add_argument('--report-sizes', default='1000,10000', help='Comma separated nr of plots for the report benchmarks, e.g. 1000,10000,100000.')
+    parser.add_argument('--output', help='Also write the results to this json file.')
+    args = parser.parse_args(argv)
+
+    # the benchmarks measure the engine, not the console
+    getLogger().setLevel(WARNING)
+
+    results = []
+    if args.suite in ['all', 'startup']:
+        results += [benchmark_import_time(module, repeat=args.repeat) for module in ['_00_back_end', '_00_CLI']]
+    if args.suite in ['all', 'check']:
+        for storage_backend in ['json', 'sqlite']:
+            # zero latency: what is left is the per-challenge overhead of LEAF itself
+            results.append(benchmark_check_plots(nr_plots=args.plots,
+                                                 nr_challenges=args.challenges,
+                                                 nr_disks=1,
+                                                 storage_backend=storage_backend,
+                                                 prover_options={'failure_rate': args.failure_rate}))
+        results.append(benchmark_check_plots(nr_plots=args.plots,
+                                             nr_challenges=args.challenges,
+                                             nr_disks=args.disks,
+                                             prover_options={'lookup_latency_sec': args.latency_ms / 1000,
+                                                             'proof_latency_sec': args.latency_ms / 1000,
+                                                             'failure_rate': args.failure_rate}))
+    if args.suite in ['all', 'logging']:
+        results.append(benchmark_logging_overhead(nr_plots=args.plots,
+                                                  nr_challenges=args.challenges))
+    if args.suite in ['all', 'pipeline']:
+        results += benchmark_verification_pipeline(nr_plots=args.plots,
+                                                   nr_challenges=args.challenges,
+                                                   nr_disks=args.disks,
+                                                   latency_ms=args.latency_ms,
+                                                   validate_cpu_ms=args.validate_cpu_ms)
+    if args.suite in ['all', 'reports']:
+        for nr_plots in [int(_) for _ in args.report_sizes.split(',') if _.strip()]:
+            for storage_backend in ['json', 'sqlite']:
+                results.append(benchmark_reports(nr_plots=nr_plots,
+                                                 storage_backend=storage_backend))
+
+    output = {'timestamp': time(),
+              'python': python_version(),
+              'platform': platform(),
+              'results': results}
+    print(dumps(output, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output_handle:
+            dump(output, output_handle, indent=2)
+
+    startup_results = [result for result in results if result['benchmark'] == 'import_time']
+    failed = any(result['heavy_modules_loaded'] for result in startup_results)\
+             or (args.max_import_ms is not None and any(result['median_ms'] > args.max_import_ms for result in startup_results))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+from os import path,\
+    scandir,\
+    stat,\
+    stat_result
+from logging import getLogger
+from concurrent.futures import ThreadPoolExecutor
+from typing import List,\
+    Dict,\
+    Tuple
+
+def list_folder(folder: str) -> Tuple[List[Tuple[str, stat_result]], List[str]]:
+    # a single level of a folder: its plots, with their stat results, and its subfolders
+    _log = getLogger()
+    plots = []
+    subfolders = []
+    with scandir(folder) as folder_entries:
+        for entry in folder_entries:
+            try:
+                if entry.name.endswith('.plot') and entry.is_file():
+                    entry_stat = entry.stat()
+                    # on Windows the scandir stat carries no st_ino/ st_dev, which the disk grouping
+                    # and the plot metadata cache rely on
+                    if not entry_stat.st_ino:
+                        entry_stat = stat(entry.path)
+                    plots.append((entry.path, entry_stat))
+                elif entry.is_dir(follow_symlinks=False):
+                    subfolders.append(entry.path)
+            except OSError:
+                _log.warning(f'Could not read { entry.path }, it will be skipped.')
+    return plots, subfolders
+
+def _scan_folder(folder: str,
+                 recursive: bool,
+                 folders_mtimes: Dict = None) -> List[Tuple[str, stat_result]]:
+    # scandir hands out the file type without an extra syscall and its stat result is reused later on
+    _log = getLogger()
+    found = []
+    folders_to_scan = [folder]
+    while folders_to_scan:
+        current_folder = folders_to_scan.pop()
+        try:
+            if folders_mtimes is not None:
+                # taken before the listing, so a plot added meanwhile still shows up as a folder change
+                folders_mtimes[current_folder] = stat(current_folder).st_mtime_ns
+            plots, subfolders = list_folder(current_folder)
+            found += plots
+            if recursive:
+                folders_to_scan += subfolders
+        except OSError:
+            _log.warning(f'Could not list { current_folder }, it will be skipped.')
+    return sorted(found, key=lambda x:x[0])
+
+def discover_plots(input_data: List,
+                   recursive: bool = False,
+                   max_threads: int = 16,
+                   folders_mtimes: Dict = None) -> Tuple[List, Dict]:
+    """Returns the plot paths, in the input order, and their stat results.
+    Folders on separate devices/ mount points are scanned in parallel, the ones sharing a device sequentially.
+    folders_mtimes, if provided, is filled with the mtime of every folder listed (see plot_watcher)."""
+    _log = getLogger()
+
+    results = {}
+    folders_by_device = {}
+    for input_index, entry in enumerate(input_data):
+        try:
+            entry_stat = stat(entry)
+        except OSError:
+            _log.warning(f"{ entry } is neither a valid file nor a valid path !")
+            continue
+        if path.isdir(entry):
+            folders_by_device.setdefault(entry_stat.st_dev, []).append((input_index, entry))
+        else:
+            results[input_index] = [(entry, entry_stat)]
+
+    def scan_device(device_folders):
+        return [(input_index, _scan_folder(folder, recursive, folders_mtimes)) for input_index, folder in device_folders]
+
+    if folders_by_device:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_threads, len(folders_by_device)))) as executor:
+            for device_results in executor.map(scan_device, folders_by_device.values()):
+                results.update(device_results)
+
+    all_plots_paths = []
+    plots_stats = {}
+    for input_index in sorted(results.keys()):
+        for plot_path, plot_stat in results[input_index]:
+            all_plots_paths.append(plot_path)
+            plots_stats[plot_path] = plot_stat
+    return all_plots_paths, plots_stats
+
+def find_duplicates(all_plots_paths: List) -> Dict:
+    # one pass over a hash map, returns every group of paths sharing the same plot filename
+    paths_by_name = {}
+    for plot_path in all_plots_paths:
+        paths_by_name.setdefault(path.basename(plot_path), []).append(plot_path)
+    return {plot_name: plot_paths for plot_name, plot_paths in paths_by_name.items() if len(plot_paths) > 1}
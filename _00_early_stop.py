@@ -0,0 +1,106 @@
+from math import log,\
+    lgamma,\
+    exp
+from typing import Dict,\
+    List
+
+def poisson_cdf(k: int,
+                mean: float) -> float:
+    # P(X <= k), summed in log space so large k/ means do not overflow
+    if mean <= 0:
+        return 1.0
+    log_mean = log(mean)
+    return min(1.0, sum(exp(i * log_mean - mean - lgamma(i + 1)) for i in range(k + 1)))
+
+def poisson_ratio_interval(proofs: int,
+                           challenges: int,
+                           confidence: float = 0.95) -> List:
+    """Exact (Garwood) confidence interval of the proofs ratio, for a Poisson nr of proofs over the challenges"""
+    if not challenges:
+        return [0.0, None]
+    tail = (1 - confidence) / 2
+
+    def solve(target, k):
+        # the mean for which P(X <= k) == target, by bisection (the cdf decreases with the mean)
+        low, high = 0.0, max(10.0, (proofs + 1) * 4.0)
+        for _ in range(100):
+            middle = (low + high) / 2
+            if poisson_cdf(k, middle) > target:
+                low = middle
+            else:
+                high = middle
+        return (low + high) / 2
+
+    lower = solve(1 - tail, proofs - 1) if proofs else 0.0
+    upper = solve(tail, proofs)
+    return [lower / challenges, upper / challenges]
+
+# test outcomes
+decision_good = 'good'
+decision_bad = 'bad'
+decision_undecided = 'undecided'
+
+class sequential_test():
+    """Wald's sequential probability ratio test on the proofs of a plot, assumed Poisson per challenge.
+    H0: the plot is healthy (proofs ratio good_ratio) vs H1: the plot is damaged (proofs ratio bad_ratio).
+    A healthy plot is accepted after ~80 challenges and a plot without any proof is rejected after ~15, with the defaults;
+    the borderline plots keep being sampled, up to the requested nr of challenges."""
+
+    def __init__(self,
+                 good_ratio: float = 1.0,
+                 bad_ratio: float = 0.7,
+                 alpha: float = 0.01,
+                 beta: float = 0.01):
+        if not 0 < bad_ratio < good_ratio:
+            raise Exception(f'The bad proofs ratio { bad_ratio } must be positive and below the good one { good_ratio } !')
+        self.good_ratio = good_ratio
+        self.bad_ratio = bad_ratio
+        # alpha: chance to call a healthy plot bad, beta: chance to call a damaged plot good
+        self.alpha = alpha
+        self.beta = beta
+
+        self.upper_bound = log((1 - beta) / alpha)
+        self.lower_bound = log(beta / (1 - alpha))
+        self.log_ratio_per_proof = log(bad_ratio / good_ratio)
+        self.log_ratio_per_challenge = good_ratio - bad_ratio
+
+        self.challenges = 0
+        self.proofs = 0
+        self.log_likelihood_ratio = 0.0
+        self.decision = decision_undecided
+
+    def parameters(self) -> Dict:
+        return {'good_ratio': self.good_ratio,
+                'bad_ratio': self.bad_ratio,
+                'alpha': self.alpha,
+                'beta': self.beta}
+
+    def update(self,
+               proofs: int) -> str:
+        # log(P(proofs | H1)/ P(proofs | H0)) of one challenge; the decision is final once taken
+        self.challenges += 1
+        self.proofs += proofs
+        self.log_likelihood_ratio += proofs * self.log_ratio_per_proof + self.log_ratio_per_challenge
+        if self.decision == decision_undecided:
+            if self.log_likelihood_ratio >= self.upper_bound:
+                self.decision = decision_bad
+            elif self.log_likelihood_ratio <= self.lower_bound:
+                self.decision = decision_good
+        return self.decision
+
+    def confidence(self) -> float:
+        if self.decision == decision_good:
+            return 1 - self.beta
+        if self.decision == decision_bad:
+            return 1 - self.alpha
+        return None
+
+    def summary(self) -> Dict:
+        # as stored with the results of the plot, under 'early_stop'
+        return {'decision': self.decision,
+                'confidence': self.confidence(),
+                'challenges': self.challenges,
+                'proofs': self.proofs,
+                'log_likelihood_ratio': self.log_likelihood_ratio,
+                'ratio_interval_95': poisson_ratio_interval(self.proofs, self.challenges),
+                **self.parameters()}
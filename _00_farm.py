@@ -0,0 +1,490 @@
+from os import path,\
+    replace,\
+    sep,\
+    altsep
+from logging import getLogger
+from socket import gethostname
+from threading import Lock,\
+    Condition,\
+    Thread
+from collections import deque
+from time import time
+from json import load,\
+    dump,\
+    loads,\
+    dumps
+from traceback import format_exc
+from hmac import compare_digest
+from urllib.request import Request,\
+    urlopen
+from urllib.error import HTTPError
+from urllib.parse import urlencode,\
+    urlsplit,\
+    parse_qs
+from http.server import ThreadingHTTPServer,\
+    BaseHTTPRequestHandler
+from typing import List,\
+    Dict
+
+from _00_report import report_filter
+from _00_histograms import bin_summaries
+from _00_analytics import analyze_proof_counts,\
+    default_expected_ratio,\
+    default_alpha
+
+# the coordinator gathers the results of the workers (one per harvester, each checking its own disks) into a single
+# storage backend and serves the farm-wide report and histograms; plain json over HTTP, for a trusted local network.
+# Every request carries the shared token of the farm, the coordinator only listens beyond the loopback with one.
+default_farm_port = 8450
+token_header = 'X-LEAF-Token'
+loopback_addresses = ['127.0.0.1', 'localhost', '::1']
+
+class farm_request_error(Exception):
+    """A request the coordinator refuses, answered with its HTTP status"""
+
+    def __init__(self,
+                 status: int,
+                 message: str):
+        super(farm_request_error, self).__init__(message)
+        self.status = status
+
+def valid_plot_name(plot_name) -> bool:
+    # the plot names become file names in the output folder: only a bare plot file name is accepted, never a path
+    return isinstance(plot_name, str) and plot_name.endswith('.plot') and path.basename(plot_name) == plot_name\
+           and not any(separator in plot_name for separator in [sep, altsep, '/', '\\'] if separator)\
+           and plot_name not in ['.plot', '..plot'] and '\0' not in plot_name
+
+def _checked_plot_name(plot_name):
+    if not valid_plot_name(plot_name):
+        raise farm_request_error(400, f'Invalid plot name { plot_name !r}, expected a plot file name.')
+    return plot_name
+
+def _request(farm_url: str,
+             route: str,
+             payload: Dict = None,
+             query: Dict = None,
+             timeout_sec: float = 30,
+             token: str = None) -> Dict:
+    # a POST with a json payload, a GET otherwise; the response is always json
+    url = farm_url.rstrip('/') + route + ('?' + urlencode(query, doseq=True) if query else '')
+    request = Request(url,
+                      data=dumps(payload, separators=(',', ':')).encode() if payload is not None else None,
+                      headers={'Content-Type': 'application/json',
+                               **({token_header: token} if token else {})})
+    with urlopen(request, timeout=timeout_sec) as response:
+        return loads(response.read())
+
+def fetch_farm_report(farm_url: str,
+                      token: str = None,
+                      **report_options) -> Dict:
+    """The stored_results_report of the whole farm, built by the coordinator"""
+    return _request(farm_url, '/report',
+                    query={key: value for key, value in report_options.items() if value is not None},
+                    token=token)
+
+def fetch_farm_histograms(farm_url: str,
+                          views: List = None,
+                          token: str = None) -> Dict:
+    """The bin_summaries of the whole farm, the disks are labelled <worker>:<disk>"""
+    return _request(farm_url, '/histograms',
+                    query={'view': views} if views else None,
+                    token=token)
+
+def fetch_farm_analytics(farm_url: str,
+                         expected_ratio: float = default_expected_ratio,
+                         alpha: float = default_alpha,
+                         token: str = None) -> Dict:
+    """The analyze_proof_counts of the whole farm, the disks are labelled <worker>:<disk>"""
+    return _request(farm_url, '/analytics',
+                    query={'expected_ratio': expected_ratio,
+                           'alpha': alpha},
+                    timeout_sec=600,
+                    token=token)
+
+class farm_worker_storage():
+    """Wraps the storage backend of a worker: everything is still stored locally, so a check resumes without the
+    coordinator, and every write is also streamed to the coordinator by a background thread, in order.
+    The reads and everything else go to the local storage."""
+
+    def __init__(self,
+                 storage,
+                 farm_url: str,
+                 worker_name: str = None,
+                 token: str = None,
+                 batch_size: int = 500,
+                 max_pending_results: int = 100000,
+                 retry_sec: float = 5):
+        self._log = getLogger()
+
+        self.storage = storage
+        self.farm_url = farm_url.rstrip('/')
+        self.worker_name = worker_name if worker_name else gethostname()
+        self.token = token
+        self.batch_size = batch_size
+        self.max_pending_results = max_pending_results
+        self.retry_sec = retry_sec
+
+        # [route, plot_name, payload], sent one by one from the left
+        self._outbox = deque()
+        self._pending_results = 0
+        self._sending = False
+        self._closed = False
+        self._offline = False
+        self._condition = Condition()
+        self._sender = Thread(target=self._send_loop, daemon=True)
+        self._sender.start()
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def _enqueue(self,
+                 route: str,
+                 plot_name,
+                 payload):
+        with self._condition:
+            if route == 'results':
+                self._pending_results += len(payload)
+                last_entry = self._outbox[-1] if self._outbox else None
+                # the results of a plot are batched, as long as nothing else was queued in between
+                if last_entry and last_entry[0] == route and last_entry[1] == plot_name and len(last_entry[2]) < self.batch_size:
+                    last_entry[2] += payload
+                else:
+                    self._outbox.append([route, plot_name, payload])
+                # a long outage: the oldest results go, the snapshot sent at the end of their plot holds them anyway
+                while self._pending_results > self.max_pending_results:
+                    dropped_entry = next(_ for _ in self._outbox if _[0] == 'results')
+                    self._outbox.remove(dropped_entry)
+                    self._pending_results -= len(dropped_entry[2])
+            else:
+                # a snapshot or a drop supersedes the results of the plot still waiting to be sent
+                for superseded_entry in [_ for _ in self._outbox if _[1] == plot_name and _[0] == 'results']:
+                    self._outbox.remove(superseded_entry)
+                    self._pending_results -= len(superseded_entry[2])
+                self._outbox.append([route, plot_name, payload])
+            self._condition.notify_all()
+
+    def _send_loop(self):
+        while True:
+            with self._condition:
+                while not self._outbox and not self._closed:
+                    self._condition.wait()
+                if not self._outbox:
+                    return
+                route, plot_name, payload = self._outbox.popleft()
+                if route == 'results':
+                    self._pending_results -= len(payload)
+                self._sending = True
+            try:
+                _request(self.farm_url, f'/{ route }', {'worker': self.worker_name,
+                                                        'plot_name': plot_name,
+                                                        route: payload},
+                         token=self.token)
+                if self._offline:
+                    self._offline = False
+                    self._log.info(f'The coordinator { self.farm_url } is reachable again.')
+            except HTTPError:
+                # reached, but refused (see the coordinator logs): sending it again would not help
+                self._log.error(f'The coordinator { self.farm_url } refused the { route } of { plot_name }, it is skipped;'
+                                f' the next check syncs the plot again.\n{format_exc(chain=False)}')
+            except:
+                if not self._offline:
+                    self._offline = True
+                    self._log.warning(f'Failed to send the results to the coordinator { self.farm_url }, will keep retrying;'
+                                      f' they are stored locally in the meantime.\n{format_exc(chain=False)}')
+                with self._condition:
+                    # back to the front, unless superseded meanwhile
+                    if route != 'results' or not any(_[1] == plot_name and _[0] != 'results' for _ in self._outbox):
+                        self._outbox.appendleft([route, plot_name, payload])
+                        self._pending_results += len(payload) if route == 'results' else 0
+                    self._sending = False
+                    self._condition.notify_all()
+                    retry_at = time() + self.retry_sec
+                    while not self._closed and time() < retry_at:
+                        self._condition.wait(retry_at - time())
+                    if self._closed:
+                        return
+                continue
+            with self._condition:
+                self._sending = False
+                self._condition.notify_all()
+
+    def register_plots(self,
+                       plots: List) -> int:
+        """Tells the coordinator which plots this worker holds ({'name', 'path', 'disk'} each) with their stored summaries;
+        the coordinator answers with the plots it is missing or holds outdated results of, their snapshots are queued.
+        Returns the nr of plots queued, None if the coordinator could not be reached."""
+        summaries = {entry['name']: entry for entry in self.storage.iter_relevant_data([plot['name'] for plot in plots])}
+        try:
+            response = _request(self.farm_url, '/register', {'worker': self.worker_name,
+                                                             'plots': [{**plot,
+                                                                        'challenges_tried': summaries[plot['name']]['challenges_tried'],
+                                                                        'proofs_found': summaries[plot['name']]['proofs_found'],
+                                                                        'verified_challenges': summaries[plot['name']]['verified_challenges']}
+                                                                       for plot in plots]},
+                                token=self.token)
+        except:
+            self._log.warning(f'Failed to register the plots with the coordinator { self.farm_url },'
+                              f' they will be synced on the next check.\n{format_exc(chain=False)}')
+            return None
+        for plot_name in response['wanted']:
+            content = self.storage.load_data(plot_name)
+            if content:
+                self._enqueue('snapshot', plot_name, content)
+        self._log.info(f'Registered { len(plots) } plots with the coordinator { self.farm_url } as { self.worker_name },'
+                       f' { len(response["wanted"]) } stored results to sync.')
+        return len(response['wanted'])
+
+    def save_data(self,
+                  plot_name,
+                  content):
+        self.storage.save_data(plot_name,
+                               content)
+        # serialized right away, the content keeps changing while the plot is checked
+        self._enqueue('snapshot', plot_name, loads(dumps(content)))
+
+    def append_challenge_result(self,
+                                plot_name,
+                                challenge_index: int,
+                                result: Dict):
+        self.storage.append_challenge_result(plot_name,
+                                             challenge_index,
+                                             result)
+        self._enqueue('results', plot_name, [[challenge_index, dict(result)]])
+
+    def compact_data(self,
+                     plot_name,
+                     content):
+        self.storage.compact_data(plot_name,
+                                  content)
+        self._enqueue('snapshot', plot_name, loads(dumps(content)))
+
+    def drop_data(self,
+                  plot_name):
+        self.storage.drop_data(plot_name)
+        self._enqueue('drop', plot_name, None)
+
+    def flush(self,
+              timeout_sec: float = 30) -> bool:
+        """Waits until everything queued was sent; False if the coordinator could not be reached in time, or at all"""
+        deadline = time() + timeout_sec
+        with self._condition:
+            while (self._outbox or self._sending) and not self._offline and time() < deadline:
+                self._condition.wait(min(1, max(0, deadline - time())))
+            return not self._outbox and not self._sending
+
+    def close(self):
+        if not self.flush():
+            self._log.warning(f'{ len(self._outbox) } updates could not be sent to the coordinator { self.farm_url },'
+                              f' they will be synced on the next check.')
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._sender.join(timeout=self.retry_sec + 1)
+        self.storage.close()
+
+class farm_coordinator():
+    """Merges the results streamed by the workers into the storage of a back end and serves the farm-wide reports.
+    The plots of each worker are kept in a registry file, so the reports know the plots never checked too."""
+
+    def __init__(self,
+                 back_end,
+                 registry_path: str = 'LEAF_farm.json',
+                 token: str = None):
+        self._log = getLogger()
+
+        self.back_end = back_end
+        self.token = token
+        self.registry_path = registry_path
+        # {worker: {'last_seen': ts, 'plots': {plot_name: {'path': ..., 'disk': ...}}}}
+        self.registry = {}
+        if path.isfile(registry_path):
+            try:
+                with open(registry_path, 'r') as input_handle:
+                    self.registry = load(input_handle)
+            except:
+                self._log.warning(f'Failed to read the farm registry { registry_path }, it will be rebuilt'
+                                  f' as the workers register.\n{format_exc(chain=False)}')
+        # the storage backends are not meant to be shared by threads, every request goes through this lock
+        self._lock = Lock()
+        self._http_server = None
+
+    def _save_registry(self):
+        with open(self.registry_path + '.tmp', 'w') as output_handle:
+            dump(self.registry, output_handle)
+        replace(self.registry_path + '.tmp', self.registry_path)
+
+    def farm_plots(self) -> List:
+        # worker by worker, each in its registration order; a plot held by 2 workers is only listed once
+        return list(dict.fromkeys(plot_name for worker in sorted(self.registry)
+                                  for plot_name in self.registry[worker]['plots']))
+
+    def disk_by_name(self) -> Dict:
+        return {plot_name: f"{ worker }:{ plot['disk'] }" for worker in sorted(self.registry)
+                for plot_name, plot in self.registry[worker]['plots'].items()}
+
+    def register(self,
+                 worker: str,
+                 plots: List) -> Dict:
+        for plot in plots:
+            _checked_plot_name(plot.get('name'))
+        with self._lock:
+            other_plots = {plot_name: other_worker for other_worker in self.registry if other_worker != worker
+                           for plot_name in self.registry[other_worker]['plots']}
+            for plot in plots:
+                if plot['name'] in other_plots:
+                    self._log.warning(f"Found duplicate plot { plot['name'] } on the workers { other_plots[plot['name']] } and { worker }.")
+            self.registry[worker] = {'last_seen': time(),
+                                     'plots': {plot['name']: {'path': plot['path'],
+                                                              'disk': plot['disk']} for plot in plots}}
+            self._save_registry()
+
+            # the worker is the reference for its plots: any difference means the coordinator missed some updates
+            stored = {entry['name']: entry for entry in self.back_end.iter_relevant_data([plot['name'] for plot in plots])}
+            wanted = [plot['name'] for plot in plots
+                      if plot['challenges_tried']
+                      and any(plot[key] != stored[plot['name']][key] for key in ['challenges_tried', 'proofs_found', 'verified_challenges'])]
+        self._log.info(f'{ worker } registered { len(plots) } plots, { len(wanted) } of them need to be synced.')
+        return {'wanted': wanted}
+
+    def add_results(self,
+                    worker: str,
+                    plot_name,
+                    results: List) -> Dict:
+        _checked_plot_name(plot_name)
+        with self._lock:
+            for challenge_index, result in results:
+                self.back_end.append_challenge_result(plot_name,
+                                                      challenge_index,
+                                                      result)
+            self.back_end.flush_journal(plot_name)
+            if worker in self.registry:
+                self.registry[worker]['last_seen'] = time()
+        return {}
+
+    def add_snapshot(self,
+                     worker: str,
+                     plot_name,
+                     snapshot: Dict) -> Dict:
+        _checked_plot_name(plot_name)
+        with self._lock:
+            self.back_end.compact_data(plot_name,
+                                       snapshot)
+            if worker in self.registry:
+                self.registry[worker]['last_seen'] = time()
+        return {}
+
+    def drop(self,
+             worker: str,
+             plot_name,
+             drop=None) -> Dict:
+        _checked_plot_name(plot_name)
+        with self._lock:
+            self.back_end.drop_data(plot_name)
+        return {}
+
+    def report(self,
+               query: Dict) -> Dict:
+        with self._lock:
+            return self.back_end.build_stored_report(self.farm_plots(),
+                                                     sort_by=query.get('sort_by', ['proofs_found'])[0],
+                                                     descending=query.get('descending', ['False'])[0] == 'True',
+                                                     limit=int(query['limit'][0]) if 'limit' in query else None,
+                                                     offset=int(query.get('offset', [0])[0]),
+                                                     row_filter=report_filter(min_ratio=float(query['min_ratio'][0]) if 'min_ratio' in query else None,
+                                                                              max_ratio=float(query['max_ratio'][0]) if 'max_ratio' in query else None,
+                                                                              plot_types=query.get('plot_types')))
+
+    def histograms(self,
+                   query: Dict) -> Dict:
+        with self._lock:
+            return bin_summaries(self.back_end.iter_relevant_data(self.farm_plots()),
+                                 disk_by_name=self.disk_by_name(),
+                                 views=query.get('view'))
+
+    def analytics(self,
+                  query: Dict) -> Dict:
+        with self._lock:
+            return analyze_proof_counts(self.back_end.iter_proof_counts(self.farm_plots()),
+                                        disk_by_name=self.disk_by_name(),
+                                        expected_ratio=float(query.get('expected_ratio', [default_expected_ratio])[0]),
+                                        alpha=float(query.get('alpha', [default_alpha])[0]))
+
+    def workers(self,
+                query: Dict) -> Dict:
+        with self._lock:
+            return {worker: {'last_seen': self.registry[worker]['last_seen'],
+                             'plots': len(self.registry[worker]['plots'])} for worker in sorted(self.registry)}
+
+    def serve(self,
+              port: int = default_farm_port,
+              address: str = '127.0.0.1'):
+        if self._http_server:
+            return
+        if address not in loopback_addresses and not self.token:
+            raise Exception(f'The coordinator only listens on { address } with a farm token (--farm-token or LEAF_FARM_TOKEN),'
+                            f' anyone reaching it could write results otherwise.')
+        coordinator = self
+        post_routes = {'/register': lambda payload: coordinator.register(payload['worker'], payload['plots']),
+                       '/results': lambda payload: coordinator.add_results(**payload),
+                       '/snapshot': lambda payload: coordinator.add_snapshot(**payload),
+                       '/drop': lambda payload: coordinator.drop(**payload)}
+        get_routes = {'/report': coordinator.report,
+                      '/histograms': coordinator.histograms,
+                      '/analytics': coordinator.analytics,
+                      '/workers': coordinator.workers}
+
+        class farm_handler(BaseHTTPRequestHandler):
+            def _respond(self,
+                         routes: Dict,
+                         argument_parser):
+                route = urlsplit(self.path).path
+                if coordinator.token and not compare_digest(self.headers.get(token_header, '').encode(), coordinator.token.encode()):
+                    self.send_error(401)
+                    return
+                if route not in routes:
+                    self.send_error(404)
+                    return
+                try:
+                    body = dumps(routes[route](argument_parser())).encode()
+                except farm_request_error as request_error:
+                    coordinator._log.warning(f'Refused a request to { route } from { self.client_address[0] }: { request_error }')
+                    self.send_error(request_error.status, str(request_error))
+                    return
+                except (ValueError, KeyError, TypeError):
+                    # a malformed payload or query
+                    coordinator._log.warning(f'Refused a malformed request to { route } from { self.client_address[0] }.')
+                    self.send_error(400)
+                    return
+                except:
+                    coordinator._log.error(f'Oh snap ! An error has occurred while serving { route }:\n{format_exc(chain=False)}')
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond(get_routes,
+                              lambda: parse_qs(urlsplit(self.path).query))
+
+            def do_POST(self):
+                self._respond(post_routes,
+                              lambda: loads(self.rfile.read(int(self.headers.get('Content-Length', 0)))))
+
+            def log_message(self, *args):
+                pass
+
+        self._http_server = ThreadingHTTPServer((address, port), farm_handler)
+        Thread(target=self._http_server.serve_forever, daemon=True).start()
+        self._log.info(f'Coordinating the farm on http://{ address }:{ self._http_server.server_address[1] },'
+                       f' { len(self.farm_plots()) } plots known from { len(self.registry) } worker(s).')
+
+    def stop_serving(self):
+        if self._http_server:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._http_server = None
+        with self._lock:
+            self.back_end.flush_summary_index()
@@ -0,0 +1,101 @@
+from os import path
+from re import search
+from typing import List,\
+    Dict,\
+    Iterable
+
+# ratio: proofs ratio of all the checked plots; challenges: nr of challenges tried
+# ratio_by_*: the proofs ratio split by plot type/ k size/ disk, on the same bins
+histogram_views = ['ratio', 'challenges', 'ratio_by_plot_type', 'ratio_by_size', 'ratio_by_disk']
+default_histogram_views = ['ratio', 'challenges']
+
+ratio_bin_width = 0.05
+max_challenges_bins = 100
+
+# the file types handled by plotly's static image export (kaleido), anything else is written as html
+image_extensions = ['.png', '.jpg', '.jpeg', '.webp', '.svg', '.pdf']
+
+def plot_size_from_name(plot_name) -> str:
+    size = search(r'-k(\d+)-', plot_name)
+    return f'k{ size.group(1) }' if size else 'unknown'
+
+def bin_summaries(relevant_data: Iterable,
+                  disk_by_name: Dict = None,
+                  views: List = None) -> Dict:
+    """The histograms of the checked plots, binned ahead of the rendering: the figure only carries the bin counts,
+    so its size does not grow with the nr of plots.
+    Returns {view: {'edges': [...], 'series': {label: [counts]}}}"""
+    import numpy as np
+
+    views = views if views else default_histogram_views
+    unknown_views = set(views) - set(histogram_views)
+    if unknown_views:
+        raise Exception(f'Unknown histogram views { sorted(unknown_views) }, valid options: { histogram_views }')
+    disk_by_name = disk_by_name if disk_by_name else {}
+
+    challenges_tried, proofs_found, groups = [], [], {'ratio_by_plot_type': [], 'ratio_by_size': [], 'ratio_by_disk': []}
+    for entry in relevant_data:
+        if not entry['challenges_tried']:
+            continue
+        challenges_tried.append(entry['challenges_tried'])
+        proofs_found.append(entry['proofs_found'])
+        groups['ratio_by_plot_type'].append(entry.get('plot_type') or 'unknown')
+        groups['ratio_by_size'].append(plot_size_from_name(entry['name']))
+        groups['ratio_by_disk'].append(disk_by_name.get(entry['name'], 'unknown'))
+
+    challenges_tried = np.asarray(challenges_tried, dtype=np.float64)
+    ratios = np.asarray(proofs_found, dtype=np.float64) / challenges_tried if len(challenges_tried) else np.zeros(0)
+
+    # fixed width ratio bins, shared by all the ratio views so they can be compared
+    ratio_edges = np.arange(0, (np.floor(ratios.max() / ratio_bin_width) + 2) * ratio_bin_width if len(ratios) else ratio_bin_width * 2,
+                            ratio_bin_width)
+
+    binned = {}
+    for view in views:
+        if view == 'challenges':
+            edges = np.histogram_bin_edges(challenges_tried, bins=min(max_challenges_bins, max(1, len(np.unique(challenges_tried)))))\
+                if len(challenges_tried) else np.array([0, 1])
+            binned[view] = {'edges': edges.tolist(),
+                            'series': {'challenges_tried': np.histogram(challenges_tried, bins=edges)[0].tolist()}}
+        elif view == 'ratio':
+            binned[view] = {'edges': ratio_edges.tolist(),
+                            'series': {'proofs_ratio': np.histogram(ratios, bins=ratio_edges)[0].tolist()}}
+        else:
+            labels = np.asarray(groups[view], dtype=object)
+            binned[view] = {'edges': ratio_edges.tolist(),
+                            'series': {str(label): np.histogram(ratios[labels == label], bins=ratio_edges)[0].tolist()
+                                       for label in sorted(set(groups[view]))}}
+    return binned
+
+def render_histograms(binned: Dict,
+                      output_filepath: str = None,
+                      include_plotlyjs=True):
+    """One subplot per view, as bar traces over the precomputed bins.
+    Written to a standalone html file, to a static image (by the file extension, needs kaleido) or shown in a browser."""
+    from plotly.subplots import make_subplots
+    import plotly.graph_objects as go
+
+    views = list(binned.keys())
+    fig = make_subplots(rows=len(views), cols=1, subplot_titles=views)
+    for row, view in enumerate(views, 1):
+        edges = binned[view]['edges']
+        centers = [(low + high) / 2 for low, high in zip(edges[:-1], edges[1:])]
+        widths = [high - low for low, high in zip(edges[:-1], edges[1:])]
+        for label, counts in binned[view]['series'].items():
+            fig.add_trace(go.Bar(x=centers,
+                                 y=counts,
+                                 width=widths,
+                                 name=f'{ view }: { label }'),
+                          row=row, col=1)
+    # the series of a view are stacked, so the total of each bin stays readable
+    fig.update_layout(barmode='stack',
+                      height=max(450, 350 * len(views)))
+
+    if not output_filepath:
+        fig.show()
+    elif path.splitext(output_filepath)[1].lower() in image_extensions:
+        fig.write_image(output_filepath)
+    else:
+        fig.write_html(output_filepath,
+                       include_plotlyjs=include_plotlyjs)
+    return fig
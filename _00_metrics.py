@@ -0,0 +1,191 @@
+from os import path,\
+    mkdir,\
+    replace
+from logging import getLogger
+from threading import Lock,\
+    Thread
+from bisect import bisect_left
+from time import time
+from traceback import format_exc
+from http.server import ThreadingHTTPServer,\
+    BaseHTTPRequestHandler
+from typing import List,\
+    Dict
+
+# the phases of a single challenge check
+# qualities: get_qualities_for_challenge (disk), full_proof: get_full_proof (disk),
+# validate: validate_proof (CPU), save: storing the challenge result
+phases = ['qualities', 'full_proof', 'validate', 'save']
+
+# upper bounds [s], from a cached lookup on an SSD up to an overloaded/ sleeping HDD
+latency_buckets = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+class latency_histogram():
+    """Fixed bucket latency histogram, with the same semantics as a Prometheus histogram (the +Inf bucket is the count)"""
+
+    def __init__(self,
+                 stored: Dict = None):
+        self.bucket_counts = [0] * len(latency_buckets)
+        self.count = 0
+        self.sum = 0.0
+        if stored:
+            self.merge(stored)
+
+    def observe(self,
+                seconds: float):
+        bucket_index = bisect_left(latency_buckets, seconds)
+        if bucket_index < len(latency_buckets):
+            self.bucket_counts[bucket_index] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def merge(self,
+              stored: Dict):
+        # the results stored by an older bucket layout are dropped instead of being mixed in
+        if stored.get('buckets') != latency_buckets:
+            return
+        for bucket_index, bucket_count in enumerate(stored['counts']):
+            self.bucket_counts[bucket_index] += bucket_count
+        self.count += stored['count']
+        self.sum += stored['sum']
+
+    def cumulative_counts(self) -> List:
+        cumulative = []
+        running_count = 0
+        for bucket_count in self.bucket_counts:
+            running_count += bucket_count
+            cumulative.append(running_count)
+        return cumulative
+
+    def quantile(self,
+                 q: float) -> float:
+        # the upper bound of the bucket holding the quantile, None above the last bucket
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bucket_index, cumulative_count in enumerate(self.cumulative_counts()):
+            if cumulative_count >= rank:
+                return latency_buckets[bucket_index]
+        return None
+
+    def to_dict(self) -> Dict:
+        return {'buckets': latency_buckets,
+                'counts': self.bucket_counts,
+                'count': self.count,
+                'sum': self.sum}
+
+def plot_latency_histograms(stored: Dict = None) -> Dict[str, latency_histogram]:
+    # the per plot histograms, as kept in the working set of the plot under 'latency'
+    stored = stored if stored else {}
+    return {phase: latency_histogram(stored.get(phase)) for phase in phases}
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(**labels) -> str:
+    return ','.join(f'{ key }="{ _escape_label(value) }"' for key, value in labels.items())
+
+class phase_metrics():
+    """Latency histograms of every check phase, per disk, exported in the Prometheus text format.
+    The per plot histograms are stored with the results of each plot instead (see plot_latency_histograms):
+    a series per plot would grow without bound in the daemon mode and flood Prometheus on big farms."""
+
+    def __init__(self,
+                 write_every_sec: float = 15):
+        self._log = getLogger()
+
+        self._lock = Lock()
+        self.write_every_sec = write_every_sec
+        self.last_write = 0
+        self.by_disk: Dict[tuple, latency_histogram] = {}
+        self.counters = {'plots_checked': 0,
+                         'challenges_checked': 0,
+                         'proofs_found': 0}
+        self.checking = 0
+        self._http_server = None
+
+    def observe(self,
+                phase: str,
+                seconds: float,
+                disk_key: str):
+        with self._lock:
+            self.by_disk.setdefault((phase, disk_key), latency_histogram()).observe(seconds)
+
+    def increment(self,
+                  counter: str,
+                  value: int = 1):
+        with self._lock:
+            self.counters[counter] += value
+
+    def set_checking(self,
+                     checking: bool):
+        with self._lock:
+            self.checking = int(checking)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines += ['# HELP leaf_phase_latency_seconds Latency of each plot check phase, per disk.',
+                      '# TYPE leaf_phase_latency_seconds histogram']
+            for (phase, disk_key), histogram in sorted(self.by_disk.items()):
+                for upper_bound, cumulative_count in zip(latency_buckets, histogram.cumulative_counts()):
+                    lines.append(f'leaf_phase_latency_seconds_bucket{{{ _labels(phase=phase, disk=disk_key, le=upper_bound) }}} { cumulative_count }')
+                lines.append(f'leaf_phase_latency_seconds_bucket{{{ _labels(phase=phase, disk=disk_key, le="+Inf") }}} { histogram.count }')
+                lines.append(f'leaf_phase_latency_seconds_sum{{{ _labels(phase=phase, disk=disk_key) }}} { histogram.sum }')
+                lines.append(f'leaf_phase_latency_seconds_count{{{ _labels(phase=phase, disk=disk_key) }}} { histogram.count }')
+
+            for counter, value in self.counters.items():
+                lines += [f'# TYPE leaf_{ counter }_total counter',
+                          f'leaf_{ counter }_total { value }']
+            lines += ['# HELP leaf_check_in_progress 1 while a plot check is running.',
+                      '# TYPE leaf_check_in_progress gauge',
+                      f'leaf_check_in_progress { self.checking }']
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self,
+                       textfile_path: str,
+                       force: bool = False):
+        # for the node_exporter textfile collector, which needs the file to be replaced atomically
+        if not force and time() - self.last_write < self.write_every_sec:
+            return
+        self.last_write = time()
+        try:
+            if path.dirname(textfile_path) and not path.isdir(path.dirname(textfile_path)):
+                mkdir(path.dirname(textfile_path))
+            with open(textfile_path + '.tmp', 'w') as output_handle:
+                output_handle.write(self.render())
+            replace(textfile_path + '.tmp', textfile_path)
+        except:
+            self._log.warning(f'Failed to write the metrics to { textfile_path }\n{format_exc(chain=False)}')
+
+    def serve(self,
+              port: int,
+              address: str = '127.0.0.1'):
+        if self._http_server:
+            return
+        metrics = self
+
+        class metrics_handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ['/', '/metrics']:
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._http_server = ThreadingHTTPServer((address, port), metrics_handler)
+        Thread(target=self._http_server.serve_forever, daemon=True).start()
+        self._log.info(f'Serving the metrics on http://{ address }:{ self._http_server.server_address[1] }/metrics')
+
+    def stop_serving(self):
+        if self._http_server:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._http_server = None
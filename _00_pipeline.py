@@ -0,0 +1,91 @@
+from threading import BoundedSemaphore,\
+    local
+from time import perf_counter
+from concurrent.futures import Future,\
+    ThreadPoolExecutor,\
+    ProcessPoolExecutor
+from typing import List,\
+    Tuple
+
+# thread: the verifications run in threads of this process (enough when validate_proof releases the GIL)
+# process: the verifications run in separate processes, the disk reads never wait for the CPU
+verification_pool_kinds = ['thread', 'process']
+# shared by the CLI, the GUI and the back end; threads are cheap to start, e.g. for the short cron runs
+default_verification_pool_kind = 'thread'
+
+def chiapos_verifier():
+    import chiapos
+    return chiapos.Verifier()
+
+def validate_proofs(verifier,
+                    plot_id: bytes,
+                    size: int,
+                    challenge: bytes,
+                    qualities: List,
+                    proofs: List,
+                    plot_label: str = '') -> Tuple[int, List]:
+    """Validates the full proofs fetched for a challenge against their qualities.
+    Returns the nr of proofs and the ('validate', seconds) timings; a mismatch raises, naming the plot, challenge and quality."""
+    timings = []
+    for quality_index, (quality_str, proof) in enumerate(zip(qualities, proofs)):
+        validate_start = perf_counter()
+        ver_quality_str = verifier.validate_proof(plot_id, size, challenge, proof)
+        timings.append(('validate', perf_counter() - validate_start))
+        if quality_str != ver_quality_str:
+            raise Exception(f'Proof verification mismatch for { plot_label }, challenge { bytes(challenge).hex() },'
+                            f' quality index { quality_index } !')
+    return len(proofs), timings
+
+# one verifier per factory, per thread/ process of the pool
+_pool_verifiers = local()
+
+def _validate_proofs_job(verifier_factory,
+                         *args) -> Tuple[int, List]:
+    verifiers = getattr(_pool_verifiers, 'verifiers', None)
+    if verifiers is None:
+        verifiers = _pool_verifiers.verifiers = {}
+    if verifier_factory not in verifiers:
+        verifiers[verifier_factory] = verifier_factory()
+    return validate_proofs(verifiers[verifier_factory], *args)
+
+def completed(result) -> Future:
+    # a result known right away, handled like the pending verifications
+    future = Future()
+    future.set_result(result)
+    return future
+
+class verification_pool():
+    """Runs validate_proofs off the disk reading threads. At most max_pending verifications are queued,
+    past that submit() blocks, so the readers never run far ahead of the verifiers."""
+
+    def __init__(self,
+                 workers: int,
+                 kind: str = default_verification_pool_kind,
+                 max_pending: int = None):
+        if kind not in verification_pool_kinds:
+            raise Exception(f'Unknown verification pool { kind }, valid options: { verification_pool_kinds }')
+        self.workers = max(1, int(workers))
+        self.kind = kind
+        self._pending_slots = BoundedSemaphore(max_pending if max_pending else self.workers * 4)
+        self._executor = (ProcessPoolExecutor if kind == 'process' else ThreadPoolExecutor)(max_workers=self.workers)
+
+    def submit(self,
+               verifier_factory,
+               plot_id: bytes,
+               size: int,
+               challenge: bytes,
+               qualities: List,
+               proofs: List,
+               plot_label: str = '') -> Future:
+        self._pending_slots.acquire()
+        try:
+            future = self._executor.submit(_validate_proofs_job, verifier_factory, plot_id, size,
+                                           bytes(challenge), qualities, proofs, plot_label)
+        except:
+            self._pending_slots.release()
+            raise
+        future.add_done_callback(lambda _: self._pending_slots.release())
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
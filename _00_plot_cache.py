@@ -0,0 +1,92 @@
+from os import path,\
+    mkdir,\
+    replace,\
+    stat,\
+    stat_result
+from logging import getLogger
+from json import load,\
+    dump
+from traceback import format_exc
+from threading import Lock
+from time import time
+from typing import List,\
+    Dict
+
+class plot_metadata_cache():
+    """Plot header metadata (plot id, size, memo keys, plot public keys), keyed by the plot file identity.
+    The memo parsing and the BLS derivations then happen only once in the lifetime of a plot file."""
+
+    version = 1
+
+    def __init__(self,
+                 cache_filepath: str = path.join('cache', 'plot_headers.json'),
+                 save_every_sec: float = 30):
+        self._log = getLogger()
+
+        self.cache_filepath = cache_filepath
+        self.save_every_sec = save_every_sec
+        self._lock = Lock()
+        self.entries = {}
+        self.dirty = False
+        self.last_save = time()
+
+        if path.isfile(self.cache_filepath):
+            try:
+                with open(self.cache_filepath, 'r') as input_handle:
+                    stored_cache = load(input_handle)
+                if stored_cache.get('version') == self.version:
+                    self.entries = stored_cache['plots']
+            except:
+                self._log.warning(f'Failed to read the plot metadata cache { self.cache_filepath }, it will be rebuilt.')
+
+    @staticmethod
+    def identity_from_stat(plot_stat: stat_result) -> List:
+        return [plot_stat.st_ino, plot_stat.st_size, plot_stat.st_mtime_ns]
+
+    @staticmethod
+    def file_identity(plot_filepath) -> List:
+        return plot_metadata_cache.identity_from_stat(stat(plot_filepath))
+
+    def get(self,
+            plot_filepath,
+            identity: List = None) -> Dict:
+        # a plot that was replaced, resized or touched since it was cached is a miss
+        try:
+            identity = identity if identity else self.file_identity(plot_filepath)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self.entries.get(path.abspath(plot_filepath))
+        if entry and entry['identity'] == identity:
+            return entry['metadata']
+        return None
+
+    def set(self,
+            plot_filepath,
+            metadata: Dict):
+        try:
+            identity = self.file_identity(plot_filepath)
+        except OSError:
+            return
+        with self._lock:
+            self.entries[path.abspath(plot_filepath)] = {'identity': identity,
+                                                         'metadata': metadata}
+            self.dirty = True
+        self.save()
+
+    def save(self,
+             force: bool = False):
+        with self._lock:
+            if not self.dirty or (not force and time() - self.last_save < self.save_every_sec):
+                return
+            try:
+                if path.dirname(self.cache_filepath) and not path.isdir(path.dirname(self.cache_filepath)):
+                    mkdir(path.dirname(self.cache_filepath))
+                with open(self.cache_filepath+'.tmp', 'w') as output_handle:
+                    dump({'version': self.version,
+                          'plots': self.entries}, output_handle, separators=(',', ':'))
+                replace(self.cache_filepath+'.tmp', self.cache_filepath)
+                self.dirty = False
+                self.last_save = time()
+            except:
+                self._log.warning(f'Failed to save the plot metadata cache { self.cache_filepath }\n{format_exc(chain=False)}')
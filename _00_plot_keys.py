@@ -0,0 +1,119 @@
+from __future__ import annotations
+from os import path
+from hashlib import sha256
+from functools import lru_cache
+from csv import writer
+from json import dumps
+from typing import List,\
+    Dict,\
+    Iterable,\
+    TYPE_CHECKING
+
+# blspy is only imported by the derivations, see _00_back_end
+if TYPE_CHECKING:
+    from blspy import G1Element, PrivateKey
+
+# [fork name, port]; the port is also the coin type in the local sk derivation path of the fork
+default_forks = [['chia-XCH', 8444],
+                 ['chives-XCC', 9699]]
+
+def _derive_path(sk: PrivateKey, path) -> PrivateKey:
+    from blspy import AugSchemeMPL
+    for index in path:
+        sk = AugSchemeMPL.derive_child_sk(sk, index)
+    return sk
+
+def master_sk_to_local_sk(master: PrivateKey,
+                          port: int) -> PrivateKey:
+    return _derive_path(master, [12381, port, 3, 0])
+
+def std_hash(b) -> bytes:
+    """
+    The standard hash used in many places.
+    """
+    # SHA-256, same as blspy.Util.hash256 and chia's own std_hash, without loading blspy
+    return sha256(bytes(b)).digest()
+
+def generate_taproot_sk(local_pk: G1Element, farmer_pk: G1Element) -> PrivateKey:
+        from blspy import AugSchemeMPL
+        taproot_message: bytes = bytes(local_pk + farmer_pk) + bytes(local_pk) + bytes(farmer_pk)
+        taproot_hash: bytes = std_hash(taproot_message)
+        return AugSchemeMPL.key_gen(taproot_hash)
+
+def generate_plot_public_key(local_pk: G1Element, farmer_pk: G1Element, include_taproot: bool = False) -> G1Element:
+    if include_taproot:
+        taproot_sk: PrivateKey = generate_taproot_sk(local_pk, farmer_pk)
+        return local_pk + farmer_pk + taproot_sk.get_g1()
+    else:
+        return local_pk + farmer_pk
+
+def plot_key_name(port: int) -> str:
+    # as stored with the results and in the plot metadata cache
+    return f'plot_public_key_{ port }'
+
+def parse_fork(fork: str) -> List:
+    """A fork as NAME:PORT (e.g. chia-XCH:8444) or the path of its config.yaml"""
+    if path.isfile(fork):
+        return read_fork(fork)
+    name, _, port = fork.rpartition(':')
+    if not name or not port.isdigit():
+        raise Exception(f'Invalid fork { fork }, expected NAME:PORT (e.g. chia-XCH:8444) or the path of a fork config.yaml.')
+    return [name, int(port)]
+
+def read_fork(config_filepath: str) -> List:
+    """The [fork name, port] of a chia (fork) install, from its config.yaml (e.g. ~/.chives/mainnet/config/config.yaml -> chives-XCC)"""
+    from yaml import safe_load
+    with open(config_filepath, 'r') as input_yaml_config:
+        yaml_config = safe_load(input_yaml_config)
+    fork_name = path.basename(path.dirname(path.dirname(path.dirname(path.abspath(config_filepath))))).lstrip('.')
+    try:
+        address_prefix = yaml_config['network_overrides']['config'][yaml_config['selected_network']]['address_prefix']
+    except (KeyError, TypeError):
+        address_prefix = None
+    return [f'{ fork_name }-{ address_prefix.upper() }' if address_prefix else fork_name,
+            int(yaml_config['full_node']['port'])]
+
+def _key_bytes(key) -> bytes:
+    # the keys as cached (hex, possibly as '<PrivateKey hex>') or as blspy objects
+    if isinstance(key, str):
+        return bytes.fromhex(key.strip('<>').split(' ')[-1].replace('0x', ''))
+    return bytes(key)
+
+@lru_cache(maxsize=1 << 17)
+def plot_public_key(local_master_sk: str,
+                    farmer_public_key: str,
+                    include_taproot: bool,
+                    port: int) -> str:
+    """The plot public key of a plot for a fork, memoised per (local_master_sk, port):
+    the local master sk is unique to a plot, so are its farmer key and taproot flag"""
+    from blspy import G1Element, PrivateKey
+    local_sk = master_sk_to_local_sk(master=PrivateKey.from_bytes(_key_bytes(local_master_sk)),
+                                     port=port)
+    return str(generate_plot_public_key(local_sk.get_g1(),
+                                        G1Element.from_bytes(_key_bytes(farmer_public_key)),
+                                        include_taproot))
+
+def derive_plot_public_keys(local_master_sk: str,
+                            farmer_public_key: str,
+                            include_taproot: bool,
+                            ports: List) -> Dict:
+    # module level and fed with strings only, so it can run in a process pool
+    return {plot_key_name(port): plot_public_key(local_master_sk, farmer_public_key, include_taproot, port)
+            for port in ports}
+
+plot_keys_columns = ['name', 'plot_id', 'plot_type', 'fork', 'port', 'plot_public_key']
+
+def write_plot_keys(rows: Iterable,
+                    output_handle,
+                    output_format: str = 'csv'):
+    # one row per plot and fork, written as they come
+    if output_format == 'json':
+        output_handle.write('[')
+        for row_index, row in enumerate(rows):
+            output_handle.write((',\n  ' if row_index else '\n  ') + dumps({column: row.get(column) for column in plot_keys_columns}))
+        output_handle.write('\n]\n')
+    else:
+        csv_writer = writer(output_handle)
+        csv_writer.writerow(plot_keys_columns)
+        for row in rows:
+            csv_writer.writerow([row.get(column) for column in plot_keys_columns])
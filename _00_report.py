@@ -0,0 +1,160 @@
+from heapq import nsmallest,\
+    nlargest
+from json import dumps
+from csv import writer
+from typing import List,\
+    Dict,\
+    Iterable,\
+    Callable
+
+# the sortable report fields; proofs_found sorts by the proofs ratio, as it always did in the GUI
+sort_fields = ['proofs_found', 'challenges_tried', 'last_checked']
+
+report_columns = ['name', 'challenges_tried', 'proofs_found', 'proofs_ratio',
+                  'verified_challenges', 'plot_id', 'plot_type', 'last_checked']
+
+def report_row(relevant_data: Dict) -> Dict:
+    return {**relevant_data,
+            'proofs_ratio': (relevant_data['proofs_found'] / relevant_data['challenges_tried'])
+                            if relevant_data['challenges_tried'] else None}
+
+def _sort_value(row: Dict,
+                sort_by: str):
+    if sort_by == 'proofs_found':
+        return row['proofs_ratio']
+    return row[sort_by] or 0
+
+class report_filter():
+    """Keeps the rows matching every criteria provided; the plots never checked only match when no ratio bound is set"""
+
+    def __init__(self,
+                 min_ratio: float = None,
+                 max_ratio: float = None,
+                 plot_types: List = None,
+                 checked_only: bool = False):
+        self.min_ratio = min_ratio
+        self.max_ratio = max_ratio
+        self.plot_types = set(plot_types) if plot_types else None
+        self.checked_only = checked_only or min_ratio is not None or max_ratio is not None
+
+    def __call__(self,
+                 row: Dict) -> bool:
+        if self.checked_only and not row['challenges_tried']:
+            return False
+        if self.min_ratio is not None and row['proofs_ratio'] < self.min_ratio:
+            return False
+        if self.max_ratio is not None and row['proofs_ratio'] > self.max_ratio:
+            return False
+        if self.plot_types and row['plot_type'] not in self.plot_types:
+            return False
+        return True
+
+class report_statistics():
+    """Summary of all the plots seen by a report, filtered or not, accumulated one row at a time"""
+
+    def __init__(self,
+                 low_ratio_threshold: float = 0.8):
+        self.low_ratio_threshold = low_ratio_threshold
+        self.plots = 0
+        self.checked_plots = 0
+        self.matching_plots = 0
+        self.challenges_tried = 0
+        self.proofs_found = 0
+        self.low_ratio_plots = 0
+        self.min_ratio = None
+        self.max_ratio = None
+        self.plot_types = {}
+
+    def add(self,
+            row: Dict,
+            matching: bool):
+        self.plots += 1
+        self.matching_plots += 1 if matching else 0
+        if not row['challenges_tried']:
+            return
+        self.checked_plots += 1
+        self.challenges_tried += row['challenges_tried']
+        self.proofs_found += row['proofs_found']
+        self.low_ratio_plots += 1 if row['proofs_ratio'] < self.low_ratio_threshold else 0
+        self.min_ratio = row['proofs_ratio'] if self.min_ratio is None else min(self.min_ratio, row['proofs_ratio'])
+        self.max_ratio = row['proofs_ratio'] if self.max_ratio is None else max(self.max_ratio, row['proofs_ratio'])
+        self.plot_types[row['plot_type']] = self.plot_types.get(row['plot_type'], 0) + 1
+
+    def summary(self) -> Dict:
+        return {'plots': self.plots,
+                'checked_plots': self.checked_plots,
+                'not_checked_plots': self.plots - self.checked_plots,
+                'matching_plots': self.matching_plots,
+                'challenges_tried': self.challenges_tried,
+                'proofs_found': self.proofs_found,
+                'overall_ratio': (self.proofs_found / self.challenges_tried) if self.challenges_tried else None,
+                'min_ratio': self.min_ratio,
+                'max_ratio': self.max_ratio,
+                f'plots_below_{ self.low_ratio_threshold }_ratio': self.low_ratio_plots,
+                'plot_types': self.plot_types}
+
+def build_report(relevant_data: Iterable,
+                 sort_by: str = 'proofs_found',
+                 descending: bool = False,
+                 limit: int = None,
+                 offset: int = 0,
+                 row_filter: report_filter = None,
+                 sorted_rows: Callable = None) -> Dict:
+    """Single pass over the plot summaries (e.g. iter_relevant_data): the statistics are accumulated on the fly and,
+    with a limit, only the best offset + limit rows are kept, in a heap. The plots never checked always go last.
+    A storage backend sorting in its queries provides sorted_rows(sort_by, descending, limit, offset, row_filter),
+    the summaries are then only read for the statistics.
+    Returns {'rows': [...], 'statistics': {...}}"""
+    if sort_by not in sort_fields:
+        raise Exception(f'Unknown sort field { sort_by }, valid options: { sort_fields }')
+    row_filter = row_filter if row_filter else report_filter()
+    statistics = report_statistics()
+
+    def matching_rows():
+        for relevant_data_entry in relevant_data:
+            row = report_row(relevant_data_entry)
+            matching = row_filter(row)
+            statistics.add(row, matching)
+            if matching:
+                yield row
+
+    if sorted_rows:
+        for _ in matching_rows():
+            pass
+        return {'rows': sorted_rows(sort_by=sort_by,
+                                    descending=descending,
+                                    limit=limit,
+                                    offset=offset,
+                                    row_filter=row_filter),
+                'statistics': statistics.summary()}
+
+    # (checked, value): the checked plots first in both orders, the ties keep their original order
+    if descending:
+        sort_key = lambda row: (bool(row['challenges_tried']), _sort_value(row, sort_by) if row['challenges_tried'] else 0)
+        select = nlargest
+    else:
+        sort_key = lambda row: (not row['challenges_tried'], _sort_value(row, sort_by) if row['challenges_tried'] else 0)
+        select = nsmallest
+
+    if limit is None:
+        rows = sorted(matching_rows(), key=sort_key, reverse=descending)[offset:]
+    else:
+        rows = select(offset + limit, matching_rows(), key=sort_key)[offset:]
+
+    return {'rows': rows,
+            'statistics': statistics.summary()}
+
+def write_csv(rows: Iterable,
+              output_handle):
+    csv_writer = writer(output_handle)
+    csv_writer.writerow(report_columns)
+    for row in rows:
+        csv_writer.writerow([row.get(column) for column in report_columns])
+
+def write_json(rows: Iterable,
+               output_handle):
+    # a json array written row by row, the whole document is never built in memory
+    output_handle.write('[')
+    for row_index, row in enumerate(rows):
+        output_handle.write((',\n  ' if row_index else '\n  ') + dumps({column: row.get(column) for column in report_columns}))
+    output_handle.write('\n]\n')
@@ -0,0 +1,139 @@
+from array import array
+from hashlib import sha256
+from struct import Struct
+from json import loads,\
+    dumps
+from typing import List,\
+    Dict,\
+    Tuple
+
+# binary layout of the results of a plot:
+# magic | header length (uint32 LE) | header json | proofs: array('B'), 1 byte per challenge index |
+# verified, verified flag present, legacy challenge hex present: 3 bitsets, 1 bit per challenge index
+# the header holds the plot metadata (everything but the challenges: plot id, keys, challenge set definition, latency ...),
+# the nr of challenge indices and the few results that do not fit the arrays, as they are in the json layout
+magic = b'LEAF\x01'
+_header_length = Struct('<I')
+# a proofs count of not_checked marks a challenge with no result, or one only kept in the header (see _is_compact)
+not_checked = 255
+
+def _legacy_challenge_hex(challenge_index: int) -> str:
+    # the challenge hex the versions before the challenge sets stored with every result (std_hash of the index)
+    return sha256(challenge_index.to_bytes(32, "big")).hexdigest()
+
+def _is_compact(challenge_index: int,
+                result: Dict) -> bool:
+    # the results fully described by the arrays; anything else goes to the header as is, so the encoding stays lossless
+    return set(result.keys()) <= {'proofs', 'verified', 'challenge'}\
+           and type(result.get('proofs')) is int and 0 <= result['proofs'] < not_checked\
+           and type(result.get('verified', True)) is bool\
+           and result.get('challenge', _legacy_challenge_hex(challenge_index)) == _legacy_challenge_hex(challenge_index)
+
+def _bitset(nr_bits: int) -> bytearray:
+    return bytearray((nr_bits + 7) // 8)
+
+def _bits(bitset,
+          nr_bits: int) -> List[bool]:
+    return [bool(byte >> bit & 1) for byte in bitset for bit in range(8)][:nr_bits]
+
+def encode_results(content: Dict) -> bytes:
+    """The json layout of a plot ({..metadata.., 'challenges': {'<index>': {'proofs': n, 'verified': bool}}}) in the binary layout"""
+    challenges = content.get('challenges', {})
+    nr_challenges = max([int(_) + 1 for _ in challenges.keys()] + [0])
+
+    proofs = array('B', [not_checked]) * nr_challenges
+    verified, verified_present, challenge_hex_present = _bitset(nr_challenges), _bitset(nr_challenges), _bitset(nr_challenges)
+    other_results = {}
+    for challenge_key, result in challenges.items():
+        challenge_index = int(challenge_key)
+        if str(challenge_index) != challenge_key or challenge_index < 0 or not _is_compact(challenge_index, result):
+            other_results[challenge_key] = result
+            continue
+        proofs[challenge_index] = result['proofs']
+        if result.get('verified', True):
+            verified[challenge_index >> 3] |= 1 << (challenge_index & 7)
+        if 'verified' in result:
+            verified_present[challenge_index >> 3] |= 1 << (challenge_index & 7)
+        if 'challenge' in result:
+            challenge_hex_present[challenge_index >> 3] |= 1 << (challenge_index & 7)
+
+    header = dumps({'metadata': {key: value for key, value in content.items() if key != 'challenges'},
+                    'nr_challenges': nr_challenges,
+                    'other_results': other_results}, separators=(',', ':')).encode()
+    return b''.join([magic, _header_length.pack(len(header)), header,
+                     proofs.tobytes(), bytes(verified), bytes(verified_present), bytes(challenge_hex_present)])
+
+def _decode_header(data: bytes):
+    if not data.startswith(magic):
+        raise ValueError('Not LEAF binary results, or an unsupported version.')
+    header_start = len(magic) + _header_length.size
+    header_end = header_start + _header_length.unpack_from(data, len(magic))[0]
+    header = loads(data[header_start:header_end])
+    nr_challenges = header['nr_challenges']
+    bitset_length = (nr_challenges + 7) // 8
+    if len(data) != header_end + nr_challenges + 3 * bitset_length:
+        raise ValueError('Truncated LEAF binary results.')
+    return header, header_end, nr_challenges, bitset_length
+
+def decode_results(data: bytes) -> Dict:
+    """The binary layout back to the json one, exactly as it was encoded"""
+    header, arrays_start, nr_challenges, bitset_length = _decode_header(data)
+    proofs = array('B', data[arrays_start:arrays_start + nr_challenges])
+    verified, verified_present, challenge_hex_present = [_bits(data[arrays_start + nr_challenges + bitset_index * bitset_length:
+                                                                    arrays_start + nr_challenges + (bitset_index + 1) * bitset_length],
+                                                               nr_challenges)
+                                                         for bitset_index in range(3)]
+
+    challenges = {}
+    for challenge_index, challenge_proofs in enumerate(proofs):
+        if challenge_proofs == not_checked:
+            continue
+        if challenge_hex_present[challenge_index]:
+            result = {'challenge': _legacy_challenge_hex(challenge_index),
+                      'proofs': challenge_proofs}
+        else:
+            result = {'proofs': challenge_proofs}
+        if verified_present[challenge_index]:
+            result['verified'] = verified[challenge_index]
+        challenges[str(challenge_index)] = result
+    challenges.update(header['other_results'])
+
+    return {**header['metadata'],
+            'challenges': challenges}
+
+def summarize_encoded_results(data: bytes) -> Tuple[Dict, Dict]:
+    """The plot metadata and the summarize_challenges of the encoded results, straight from the header and the arrays"""
+    header, arrays_start, nr_challenges, bitset_length = _decode_header(data)
+    proofs = data[arrays_start:arrays_start + nr_challenges]
+    # the results without a verified flag (before the fast scan mode) were always fully verified, their bit is set too
+    verified = data[arrays_start + nr_challenges:arrays_start + nr_challenges + bitset_length]
+    other_results = header['other_results']
+
+    return header['metadata'], {'challenges_tried': max([len(proofs.rstrip(bytes([not_checked])))] + [int(_) + 1 for _ in other_results.keys()]),
+                                'proofs_found': sum(proofs) - not_checked * proofs.count(not_checked)
+                                                + sum(result['proofs'] for result in other_results.values()),
+                                'verified_challenges': sum(bin(_).count('1') for _ in verified)
+                                                       + sum(1 for result in other_results.values() if result.get('verified', True))}
+
+def challenges_proofs(challenges: Dict) -> bytes:
+    """The proofs count of every challenge index in the json layout, not_checked for the missing ones"""
+    proofs = bytearray([not_checked]) * max([int(_) + 1 for _ in challenges.keys() if str(_).isdigit()] + [0])
+    for challenge_key, result in challenges.items():
+        if str(challenge_key).isdigit() and type(result.get('proofs')) is int:
+            proofs[int(challenge_key)] = min(max(result['proofs'], 0), not_checked - 1)
+    return bytes(proofs)
+
+def decode_proofs(data: bytes) -> Tuple[Dict, bytes]:
+    """The plot metadata and the proofs count of every challenge index (not_checked for the missing ones),
+    straight from the arrays; only the few results kept in the header are decoded"""
+    header, arrays_start, nr_challenges, _ = _decode_header(data)
+    proofs = data[arrays_start:arrays_start + nr_challenges]
+    if header['other_results']:
+        other_proofs = challenges_proofs(header['other_results'])
+        proofs = bytes(other_proof if other_proof != not_checked else proof
+                       for proof, other_proof in zip(proofs.ljust(len(other_proofs), bytes([not_checked])),
+                                                     other_proofs.ljust(len(proofs), bytes([not_checked]))))
+    return header['metadata'], proofs
+
+def is_encoded_results(data: bytes) -> bool:
+    return data.startswith(magic)
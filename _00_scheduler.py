@@ -0,0 +1,41 @@
+from os import path
+from math import sqrt
+from typing import List,\
+    Dict,\
+    Tuple
+
+# discovery: the plots are checked in the order they were found
+# priority: the plots with the least certain results are checked first, see plot_priority
+scheduling_modes = ['discovery', 'priority']
+
+# with fewer challenges the proofs ratio of a plot is still too noisy to call it healthy (~10% standard error at 100)
+well_sampled_challenges = 100
+# how many standard errors below the expected ratio of 1.0 make a plot suspicious
+suspicious_z_score = 2
+
+def plot_priority(relevant_data: Dict) -> Tuple:
+    """Sort key of a plot (lower goes first), from its stored summary:
+    0 - never checked, in the discovery order
+    1 - suspicious (ratio significantly below 1.0) or not sampled enough yet; the most uncertain/ suspicious first
+    2 - healthy and well sampled; the ones checked the longest ago first"""
+    challenges_tried = relevant_data.get('challenges_tried')
+    if not challenges_tried:
+        return (0, 0, 0)
+
+    proofs_found = relevant_data.get('proofs_found') or 0
+    ratio = proofs_found / challenges_tried
+    # Poisson standard error of the ratio, never 0 so plots without proofs stay comparable
+    standard_error = sqrt(max(proofs_found, 1)) / challenges_tried
+    z_score = (1 - ratio) / standard_error
+
+    if z_score > suspicious_z_score or challenges_tried < well_sampled_challenges:
+        return (1, -(max(0, 1 - ratio) + 1 / sqrt(challenges_tried)), challenges_tried)
+    return (2, relevant_data.get('last_checked') or 0, challenges_tried)
+
+def prioritize_plots(plots_paths: List,
+                     relevant_data: List) -> List:
+    # relevant_data as returned by parse_and_return_relevant_data, for the plot names of plots_paths
+    relevant_data_by_name = {entry['name']: entry for entry in relevant_data}
+    # sorted() is stable, so the ties keep their discovery order
+    return sorted(plots_paths,
+                  key=lambda plot_path: plot_priority(relevant_data_by_name.get(path.basename(plot_path), {})))
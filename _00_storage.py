@@ -0,0 +1,783 @@
+from os import path,\
+    listdir,\
+    mkdir,\
+    fsync,\
+    replace,\
+    remove,\
+    stat
+from logging import getLogger
+from json import load,\
+    dump,\
+    loads,\
+    dumps
+from traceback import format_exc
+from threading import Lock
+from time import sleep,\
+    time
+import sqlite3
+from typing import List,\
+    Dict
+
+from _00_report import report_row,\
+    report_filter
+from _00_result_codec import encode_results,\
+    decode_results,\
+    decode_proofs,\
+    challenges_proofs,\
+    summarize_encoded_results,\
+    not_checked
+
+# binary: output/<plot>.leaf, see _00_result_codec; json: the former output/<plot>.json
+# both are always readable, a snapshot is converted to the configured format the next time it is written
+snapshot_formats = ['binary', 'json']
+
+def summarize_challenges(challenges: Dict) -> Dict:
+    # results stored before the fast scan mode existed carry no flag and were always fully verified
+    return {'challenges_tried': (max(int(_) for _ in challenges.keys())+1)
+                                if challenges.keys()
+                                else 0,
+            'proofs_found': sum([_['proofs'] for _ in challenges.values()]),
+            'verified_challenges': sum([1 for _ in challenges.values() if _.get('verified', True)])}
+
+def empty_relevant_data(plot_name) -> Dict:
+    return {'name': plot_name,
+            'challenges_tried': None,
+            'proofs_found': None,
+            'verified_challenges': None,
+            'plot_id': None,
+            'plot_type': None,
+            'last_checked': None}
+
+class summary_index():
+    """Persistent per-plot summary (plot_id, challenges tried, proofs found, last check, results mtime),
+    so that the reports never need to parse the full results of a plot"""
+
+    # version 2 added the plot type
+    version = 2
+
+    def __init__(self,
+                 index_path: str,
+                 save_every_sec: float = 30):
+        self._log = getLogger()
+
+        self.index_path = index_path
+        self.save_every_sec = save_every_sec
+        self._lock = Lock()
+        self.entries = {}
+        self.dirty = False
+        self.last_save = time()
+
+        if path.isfile(self.index_path):
+            try:
+                with open(self.index_path, 'r') as input_handle:
+                    stored_index = load(input_handle)
+                if stored_index.get('version') == self.version:
+                    self.entries = stored_index['plots']
+            except:
+                self._log.warning(f'Failed to read the summary index { self.index_path }, it will be rebuilt.')
+
+    def get(self,
+            plot_name) -> Dict:
+        with self._lock:
+            return self.entries.get(plot_name)
+
+    def set(self,
+            plot_name,
+            entry: Dict):
+        with self._lock:
+            self.entries[plot_name] = entry
+            self.dirty = True
+
+    def drop(self,
+             plot_name):
+        with self._lock:
+            if self.entries.pop(plot_name, None):
+                self.dirty = True
+
+    def save(self,
+             force: bool = False):
+        with self._lock:
+            if not self.dirty or (not force and time() - self.last_save < self.save_every_sec):
+                return
+            try:
+                with open(self.index_path+'.tmp', 'w') as output_handle:
+                    dump({'version': self.version,
+                          'plots': self.entries}, output_handle, separators=(',', ':'))
+                replace(self.index_path+'.tmp', self.index_path)
+                self.dirty = False
+                self.last_save = time()
+            except:
+                self._log.warning(f'Failed to save the summary index { self.index_path }\n{format_exc(chain=False)}')
+
+class json_storage_backend():
+    """One output/<plot>.leaf (or .json) snapshot per plot, plus an append-only output/<plot>.journal"""
+
+    _snapshot_extensions = {'binary': '.leaf',
+                            'json': '.json'}
+
+    def __init__(self,
+                 output_folder: str = 'output',
+                 journal_flush_every_n: int = 50,
+                 journal_flush_every_sec: float = 10,
+                 summary_index_path: str = 'LEAF_catalog.json',
+                 snapshot_format: str = 'binary'):
+        self._log = getLogger()
+
+        if snapshot_format not in snapshot_formats:
+            raise Exception(f'Unknown snapshot format { snapshot_format }, valid options: { snapshot_formats }')
+        self.snapshot_format = snapshot_format
+
+        self.output_folder = output_folder
+        if not path.isdir(self.output_folder):
+            mkdir(self.output_folder)
+
+        self.summary_index = summary_index(summary_index_path)
+
+        # per-challenge results are appended to the journal and only
+        # compacted into the snapshot at the end of a plot
+        self.journal_flush_every_n = journal_flush_every_n
+        self.journal_flush_every_sec = journal_flush_every_sec
+        self._journal_lock = Lock()
+        self._journal_buffers = {}
+        self._journal_last_flush = {}
+
+    def _snapshot_path(self,
+                       plot_name,
+                       snapshot_format: str = None):
+        return path.join(self.output_folder, plot_name+self._snapshot_extensions[snapshot_format if snapshot_format else self.snapshot_format])
+
+    def _snapshot_paths(self,
+                        plot_name) -> List:
+        return [self._snapshot_path(plot_name, snapshot_format) for snapshot_format in snapshot_formats]
+
+    def _journal_path(self,
+                      plot_name):
+        return path.join(self.output_folder, plot_name+'.journal')
+
+    def _results_mtime(self,
+                       plot_name) -> List:
+        # the identity of the stored results, an index entry with a different one is stale
+        results_mtime = []
+        for filepath in self._snapshot_paths(plot_name) + [self._journal_path(plot_name)]:
+            try:
+                results_mtime.append(stat(filepath).st_mtime_ns)
+            except OSError:
+                results_mtime.append(None)
+        return results_mtime
+
+    def _index_entry(self,
+                     content: Dict,
+                     summary: Dict,
+                     plot_name) -> Dict:
+        return {**summary,
+                'plot_id': content.get('plot_id'),
+                'plot_type': content.get('plot_type'),
+                'last_checked': time(),
+                'mtime': self._results_mtime(plot_name)}
+
+    def _load_journal(self,
+                      plot_name) -> Dict:
+        journal_entries = {}
+        if path.isfile(self._journal_path(plot_name)):
+            with open(self._journal_path(plot_name), 'r') as input_handle:
+                for line in input_handle:
+                    if not line.strip():
+                        continue
+                    try:
+                        challenge_index, result = loads(line)
+                    except:
+                        # a torn last line from a crash; everything before it is still valid
+                        self._log.warning(f'Skipping a corrupted journal record for { plot_name }.')
+                        continue
+                    journal_entries[str(challenge_index)] = result
+        return journal_entries
+
+    def _load_snapshot(self,
+                       plot_name):
+        # either format; the latest one wins if a crash left both behind
+        snapshot_paths = sorted([filepath for filepath in self._snapshot_paths(plot_name) if path.isfile(filepath)],
+                                key=lambda filepath: stat(filepath).st_mtime_ns)
+        if not snapshot_paths:
+            return None
+        try:
+            with open(snapshot_paths[-1], 'rb') as input_handle:
+                data = input_handle.read()
+            return decode_results(data) if snapshot_paths[-1].endswith(self._snapshot_extensions['binary']) else loads(data)
+        except:
+            self._log.warning(f'Failed to read the stored results { snapshot_paths[-1] }\n{format_exc(chain=False)}')
+            return None
+
+    def load_data(self,
+                  plot_name):
+        snapshot = self._load_snapshot(plot_name)
+
+        try:
+            journal_entries = self._load_journal(plot_name)
+        except:
+            self._log.warning(f'Failed to read the journal for { plot_name }\n{format_exc(chain=False)}')
+            journal_entries = {}
+
+        if journal_entries:
+            if not snapshot:
+                snapshot = {'challenges': {},
+                            'path_history': []}
+            snapshot['challenges'].update(journal_entries)
+
+        return snapshot
+
+    def save_data(self,
+                  plot_name,
+                  content):
+        max_retry = 5
+        current_try = -1
+        while True:
+            current_try += 1
+            if current_try == max_retry:
+                self._log.error(f"Max retries reached while trying to load the json for { plot_name }.")
+                raise Exception
+            try:
+                # write to a temporary file first, so a crash never leaves a truncated snapshot behind
+                with open(self._snapshot_path(plot_name)+'.tmp', 'wb') as output_handle:
+                    output_handle.write(encode_results(content) if self.snapshot_format == 'binary'
+                                        else dumps(content, indent=2).encode())
+                    output_handle.flush()
+                    fsync(output_handle.fileno())
+                replace(self._snapshot_path(plot_name)+'.tmp', self._snapshot_path(plot_name))
+                # the snapshot in the other format, if any, is outdated now
+                for filepath in self._snapshot_paths(plot_name):
+                    if filepath != self._snapshot_path(plot_name) and path.isfile(filepath):
+                        remove(filepath)
+                break
+            except:
+                current_try += 1
+                self._log.warning(f"Error found while trying to load the json for { plot_name }."
+                                  f" Will retry in 5 sec. Retry { current_try } / { max_retry }\n{format_exc(chain=False)}")
+                sleep(5)
+
+    def append_challenge_result(self,
+                                plot_name,
+                                challenge_index: int,
+                                result: Dict):
+        with self._journal_lock:
+            buffer = self._journal_buffers.setdefault(plot_name, [])
+            buffer.append((challenge_index, result))
+            last_flush = self._journal_last_flush.setdefault(plot_name, time())
+            flush_needed = len(buffer) >= self.journal_flush_every_n\
+                           or (time() - last_flush) >= self.journal_flush_every_sec
+        if flush_needed:
+            self.flush_journal(plot_name)
+
+    def flush_journal(self,
+                      plot_name):
+        with self._journal_lock:
+            buffer = self._journal_buffers.pop(plot_name, [])
+            self._journal_last_flush[plot_name] = time()
+            if not buffer:
+                return
+            mtime_before_flush = self._results_mtime(plot_name)
+            with open(self._journal_path(plot_name), 'a') as output_handle:
+                # the leading newline isolates these records from a torn line left by a crash
+                output_handle.write('\n' + '\n'.join(dumps([challenge_index, result], separators=(',', ':'))
+                                                     for challenge_index, result in buffer) + '\n')
+                output_handle.flush()
+                fsync(output_handle.fileno())
+
+            # update the summary incrementally, but only if it was up to date before this flush
+            index_entry = self.summary_index.get(plot_name)
+            if index_entry and index_entry['mtime'] == mtime_before_flush:
+                index_entry = dict(index_entry)
+                for challenge_index, result in buffer:
+                    index_entry['challenges_tried'] = max(index_entry['challenges_tried'], int(challenge_index) + 1)
+                    index_entry['proofs_found'] += result['proofs']
+                    index_entry['verified_challenges'] += 1 if result.get('verified', True) else 0
+                index_entry['last_checked'] = time()
+                index_entry['mtime'] = self._results_mtime(plot_name)
+                self.summary_index.set(plot_name, index_entry)
+            else:
+                self.summary_index.drop(plot_name)
+
+    def compact_data(self,
+                     plot_name,
+                     content):
+        # the content already holds every journaled result, so once the snapshot
+        # is safely on disk the journal (and any unflushed records) can be dropped
+        self.save_data(plot_name,
+                       content)
+        with self._journal_lock:
+            self._journal_buffers.pop(plot_name, None)
+            self._journal_last_flush.pop(plot_name, None)
+            if path.isfile(self._journal_path(plot_name)):
+                remove(self._journal_path(plot_name))
+        self.summary_index.set(plot_name, self._index_entry(content,
+                                                            summarize_challenges(content['challenges']),
+                                                            plot_name))
+        self.summary_index.save()
+
+    def drop_data(self,
+                  plot_name):
+        with self._journal_lock:
+            self._journal_buffers.pop(plot_name, None)
+            self._journal_last_flush.pop(plot_name, None)
+            for filepath in self._snapshot_paths(plot_name) + [self._journal_path(plot_name)]:
+                if path.isfile(filepath):
+                    remove(filepath)
+        self.summary_index.drop(plot_name)
+        self.summary_index.save()
+
+    def get_entries(self) -> List:
+        snapshot_extensions = tuple(self._snapshot_extensions.values())
+        return sorted(set(path.splitext(entry)[0] for entry in listdir(self.output_folder) if entry.endswith(snapshot_extensions)))
+
+    def convert_snapshots(self) -> int:
+        # every snapshot rewritten in the snapshot format of this backend, losslessly; the journals are left as they are
+        converted = 0
+        for plot_name in self.get_entries():
+            if path.isfile(self._snapshot_path(plot_name)) and len([_ for _ in self._snapshot_paths(plot_name) if path.isfile(_)]) == 1:
+                continue
+            snapshot = self._load_snapshot(plot_name)
+            if snapshot is not None:
+                self.save_data(plot_name,
+                               snapshot)
+                converted += 1
+        self._log.info(f'Converted { converted } plot results in { self.output_folder } to the { self.snapshot_format } format.')
+        return converted
+
+    def _summarize_stored(self,
+                          plot_name) -> Dict:
+        # a binary snapshot with no journal is summarized from its header and arrays, without building the challenges
+        binary_snapshot_path = self._snapshot_path(plot_name, 'binary')
+        if path.isfile(binary_snapshot_path) and not path.isfile(self._journal_path(plot_name))\
+                and not path.isfile(self._snapshot_path(plot_name, 'json')):
+            try:
+                with open(binary_snapshot_path, 'rb') as input_handle:
+                    metadata, summary = summarize_encoded_results(input_handle.read())
+                return self._index_entry(metadata, summary, plot_name)
+            except:
+                self._log.warning(f'Failed to summarize { binary_snapshot_path }, it will be fully read.')
+        stored_data = self.load_data(plot_name)
+        if not stored_data:
+            return None
+        return self._index_entry(stored_data,
+                                 summarize_challenges(stored_data['challenges']),
+                                 plot_name)
+
+    def iter_relevant_data(self,
+                           list_of_plots):
+        # one summary at a time, in the order of list_of_plots
+        try:
+            for plot_name in list_of_plots:
+                results_mtime = self._results_mtime(plot_name)
+                index_entry = self.summary_index.get(plot_name)
+                if index_entry and index_entry['mtime'] == results_mtime:
+                    yield {'name': plot_name,
+                           **{key: value for key, value in index_entry.items() if key != 'mtime'}}
+                    continue
+
+                # missing or stale index entry, rebuild it from the stored results
+                index_entry = self._summarize_stored(plot_name) if any(results_mtime) else None
+                if index_entry:
+                    index_entry['last_checked'] = max(filter(None, results_mtime)) / 1e9
+                    self.summary_index.set(plot_name, index_entry)
+                    yield {'name': plot_name,
+                           **{key: value for key, value in index_entry.items() if key != 'mtime'}}
+                else:
+                    yield empty_relevant_data(plot_name)
+        finally:
+            self.summary_index.save(force=True)
+
+    def iter_proof_counts(self,
+                          list_of_plots):
+        """(plot name, plot type, proofs count per challenge index as bytes, not_checked for the missing ones), in the order of list_of_plots;
+        a binary snapshot with no journal is read straight from its arrays"""
+        for plot_name in list_of_plots:
+            binary_snapshot_path = self._snapshot_path(plot_name, 'binary')
+            if path.isfile(binary_snapshot_path) and not path.isfile(self._journal_path(plot_name))\
+                    and not path.isfile(self._snapshot_path(plot_name, 'json')):
+                try:
+                    with open(binary_snapshot_path, 'rb') as input_handle:
+                        metadata, proofs = decode_proofs(input_handle.read())
+                    yield plot_name, metadata.get('plot_type'), proofs
+                    continue
+                except:
+                    self._log.warning(f'Failed to read the proofs of { binary_snapshot_path }, it will be fully read.')
+            stored_data = self.load_data(plot_name)
+            yield plot_name, stored_data.get('plot_type') if stored_data else None,\
+                challenges_proofs(stored_data['challenges']) if stored_data else b''
+
+    def parse_and_return_relevant_data(self,
+                                       list_of_plots):
+        return list(self.iter_relevant_data(list_of_plots))
+
+    def flush_summary_index(self):
+        self.summary_index.save(force=True)
+
+    def close(self):
+        self.flush_summary_index()
+
+class sqlite_storage_backend():
+    """All the plots and challenge results in a single SQLite database (WAL mode)"""
+
+    # the sort values of build_report, for the checked plots
+    _sort_value_sql = {'proofs_found': 'CAST(plots.proofs_found AS REAL) / plots.challenges_tried',
+                       'challenges_tried': 'plots.challenges_tried',
+                       'last_checked': 'COALESCE(plots.last_checked, 0)'}
+    # the indexes matching the sort values, see sorted_report_rows
+    _sort_index = {'proofs_found': 'idx_plots_proofs_ratio',
+                   'challenges_tried': 'idx_plots_challenges_tried'}
+    _report_columns_sql = ('wanted_plots.name, plots.challenges_tried, plots.proofs_found, plots.verified_challenges,'
+                           ' plots.plot_id, plots.plot_type, plots.last_checked')
+
+    def __init__(self,
+                 db_path: str = path.join('output', 'LEAF_results.sqlite3'),
+                 journal_flush_every_n: int = 50,
+                 journal_flush_every_sec: float = 10):
+        self._log = getLogger()
+
+        if path.dirname(db_path) and not path.isdir(path.dirname(db_path)):
+            mkdir(path.dirname(db_path))
+
+        self.db_path = db_path
+        self.journal_flush_every_n = journal_flush_every_n
+        self.journal_flush_every_sec = journal_flush_every_sec
+
+        # one connection shared by all the check workers, serialized by the lock
+        self._lock = Lock()
+        self._connection = sqlite3.connect(self.db_path,
+                                           check_same_thread=False)
+        self._journal_buffers = {}
+        self._journal_last_flush = {}
+
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.executescript('''
+                CREATE TABLE IF NOT EXISTS plots (
+                    name TEXT PRIMARY KEY,
+                    plot_id TEXT,
+                    metadata TEXT NOT NULL DEFAULT '{}',
+                    challenges_tried INTEGER NOT NULL DEFAULT 0,
+                    proofs_found INTEGER NOT NULL DEFAULT 0,
+                    verified_challenges INTEGER NOT NULL DEFAULT 0,
+                    last_checked REAL,
+                    plot_type TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_plots_plot_id ON plots(plot_id);
+                -- a report of the whole table walks these in order instead of sorting every plot (sorted_report_rows)
+                CREATE INDEX IF NOT EXISTS idx_plots_challenges_tried ON plots(challenges_tried);
+                CREATE INDEX IF NOT EXISTS idx_plots_proofs_ratio ON plots(CAST(proofs_found AS REAL) / challenges_tried);
+                CREATE TABLE IF NOT EXISTS challenge_results (
+                    plot_name TEXT NOT NULL,
+                    challenge_index INTEGER NOT NULL,
+                    proofs INTEGER NOT NULL,
+                    verified INTEGER NOT NULL DEFAULT 1,
+                    result TEXT NOT NULL,
+                    PRIMARY KEY (plot_name, challenge_index)
+                ) WITHOUT ROWID;
+            ''')
+            # databases created by older versions lack some of the columns
+            for table, column in [['plots', 'verified_challenges INTEGER NOT NULL DEFAULT 0'],
+                                  ['plots', 'last_checked REAL'],
+                                  ['plots', 'plot_type TEXT'],
+                                  ['challenge_results', 'verified INTEGER NOT NULL DEFAULT 1']]:
+                existing_columns = [row[1] for row in self._connection.execute(f'PRAGMA table_info({ table })')]
+                if column.split(' ')[0] not in existing_columns:
+                    self._connection.execute(f'ALTER TABLE { table } ADD COLUMN { column }')
+                    if column.startswith('plot_type'):
+                        # filled from the stored metadata, once
+                        self._connection.executemany('UPDATE plots SET plot_type = ? WHERE name = ?',
+                                                     [(loads(metadata).get('plot_type'), name)
+                                                      for name, metadata in self._connection.execute('SELECT name, metadata FROM plots').fetchall()])
+            self._connection.commit()
+
+    def _refresh_summary(self,
+                         plot_name):
+        self._connection.execute('''
+            UPDATE plots
+            SET challenges_tried = COALESCE((SELECT MAX(challenge_index) + 1 FROM challenge_results WHERE plot_name = :name), 0),
+                proofs_found = COALESCE((SELECT SUM(proofs) FROM challenge_results WHERE plot_name = :name), 0),
+                verified_challenges = COALESCE((SELECT SUM(verified) FROM challenge_results WHERE plot_name = :name), 0),
+                last_checked = :now
+            WHERE name = :name''', {'name': plot_name,
+                                    'now': time()})
+
+    def _write_challenge_results(self,
+                                 plot_name,
+                                 results: List):
+        self._connection.execute('INSERT OR IGNORE INTO plots (name) VALUES (?)', (plot_name,))
+        self._connection.executemany('INSERT OR REPLACE INTO challenge_results (plot_name, challenge_index, proofs, verified, result)'
+                                     ' VALUES (?, ?, ?, ?, ?)',
+                                     [(plot_name, int(challenge_index), result['proofs'], int(result.get('verified', True)),
+                                       dumps(result, separators=(',', ':')))
+                                      for challenge_index, result in results])
+        self._refresh_summary(plot_name)
+
+    def load_data(self,
+                  plot_name):
+        with self._lock:
+            plot_row = self._connection.execute('SELECT metadata FROM plots WHERE name = ?', (plot_name,)).fetchone()
+            if not plot_row:
+                return None
+            content = loads(plot_row[0])
+            content.setdefault('path_history', [])
+            content['challenges'] = {str(challenge_index): loads(result)
+                                     for challenge_index, result
+                                     in self._connection.execute('SELECT challenge_index, result FROM challenge_results'
+                                                                 ' WHERE plot_name = ? ORDER BY challenge_index',
+                                                                 (plot_name,))}
+        # results appended since the last flush are not in the database yet
+        for challenge_index, result in self._journal_buffers.get(plot_name, []):
+            content['challenges'][str(challenge_index)] = result
+        return content
+
+    def save_data(self,
+                  plot_name,
+                  content):
+        metadata = {key: value for key, value in content.items() if key != 'challenges'}
+        with self._lock:
+            try:
+                self._connection.execute('INSERT INTO plots (name, plot_id, plot_type, metadata) VALUES (?, ?, ?, ?)'
+                                         ' ON CONFLICT(name) DO UPDATE SET plot_id = excluded.plot_id, plot_type = excluded.plot_type,'
+                                         ' metadata = excluded.metadata',
+                                         (plot_name, metadata.get('plot_id'), metadata.get('plot_type'), dumps(metadata)))
+                self._write_challenge_results(plot_name,
+                                              list(content.get('challenges', {}).items()))
+                self._connection.commit()
+            except:
+                self._connection.rollback()
+                self._log.error(f"Failed to save the results for { plot_name }.\n{format_exc(chain=False)}")
+                raise
+
+    def append_challenge_result(self,
+                                plot_name,
+                                challenge_index: int,
+                                result: Dict):
+        with self._lock:
+            buffer = self._journal_buffers.setdefault(plot_name, [])
+            buffer.append((challenge_index, result))
+            last_flush = self._journal_last_flush.setdefault(plot_name, time())
+            flush_needed = len(buffer) >= self.journal_flush_every_n\
+                           or (time() - last_flush) >= self.journal_flush_every_sec
+        if flush_needed:
+            self.flush_journal(plot_name)
+
+    def flush_journal(self,
+                      plot_name):
+        with self._lock:
+            buffer = self._journal_buffers.pop(plot_name, [])
+            self._journal_last_flush[plot_name] = time()
+            if not buffer:
+                return
+            try:
+                self._write_challenge_results(plot_name,
+                                              buffer)
+                self._connection.commit()
+            except:
+                self._connection.rollback()
+                raise
+
+    def compact_data(self,
+                     plot_name,
+                     content):
+        with self._lock:
+            self._journal_buffers.pop(plot_name, None)
+            self._journal_last_flush.pop(plot_name, None)
+        self.save_data(plot_name,
+                       content)
+
+    def drop_data(self,
+                  plot_name):
+        with self._lock:
+            self._journal_buffers.pop(plot_name, None)
+            self._journal_last_flush.pop(plot_name, None)
+            try:
+                self._connection.execute('DELETE FROM challenge_results WHERE plot_name = ?', (plot_name,))
+                self._connection.execute('DELETE FROM plots WHERE name = ?', (plot_name,))
+                self._connection.commit()
+            except:
+                self._connection.rollback()
+                raise
+
+    def get_entries(self) -> List:
+        with self._lock:
+            return [row[0] for row in self._connection.execute('SELECT name FROM plots')]
+
+    def _query_plots(self,
+                     list_of_plots) -> List:
+        # the wanted plots go through a temporary table, so the lookup is a single indexed join
+        with self._lock:
+            self._connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted_plots (name TEXT PRIMARY KEY)')
+            self._connection.execute('DELETE FROM wanted_plots')
+            self._connection.executemany('INSERT OR IGNORE INTO wanted_plots (name) VALUES (?)',
+                                         [(plot_name,) for plot_name in list_of_plots])
+            rows = self._connection.execute('SELECT plots.name, plots.challenges_tried, plots.proofs_found, plots.verified_challenges,'
+                                            ' plots.plot_id, plots.plot_type, plots.last_checked'
+                                            ' FROM wanted_plots JOIN plots ON plots.name = wanted_plots.name').fetchall()
+            self._connection.execute('DELETE FROM wanted_plots')
+            self._connection.commit()
+        return [{'name': name,
+                 'challenges_tried': challenges_tried,
+                 'proofs_found': proofs_found,
+                 'verified_challenges': verified_challenges,
+                 'plot_id': plot_id,
+                 'plot_type': plot_type,
+                 'last_checked': last_checked}
+                for name, challenges_tried, proofs_found, verified_challenges, plot_id, plot_type, last_checked in rows]
+
+    def iter_relevant_data(self,
+                           list_of_plots,
+                           chunk_size: int = 5000):
+        # one query per chunk of plots, so only a chunk of summaries is held in memory at a time
+        for chunk_start in range(0, len(list_of_plots), chunk_size):
+            chunk = list_of_plots[chunk_start:chunk_start + chunk_size]
+            stored = {entry['name']: entry for entry in self._query_plots(chunk)}
+            for plot_name in chunk:
+                yield stored.get(plot_name, empty_relevant_data(plot_name))
+
+    def iter_proof_counts(self,
+                          list_of_plots,
+                          chunk_size: int = 1000):
+        # one indexed scan of the challenge results per chunk of plots
+        for chunk_start in range(0, len(list_of_plots), chunk_size):
+            chunk = list_of_plots[chunk_start:chunk_start + chunk_size]
+            proofs, plot_types = {}, {}
+            with self._lock:
+                self._connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted_plots (name TEXT PRIMARY KEY)')
+                self._connection.execute('DELETE FROM wanted_plots')
+                self._connection.executemany('INSERT OR IGNORE INTO wanted_plots (name) VALUES (?)',
+                                             [(plot_name,) for plot_name in chunk])
+                for plot_name, plot_type in self._connection.execute('SELECT plots.name, plots.plot_type'
+                                                                     ' FROM wanted_plots JOIN plots ON plots.name = wanted_plots.name'):
+                    plot_types[plot_name] = plot_type
+                for plot_name, challenge_index, challenge_proofs in self._connection.execute(
+                        'SELECT challenge_results.plot_name, challenge_results.challenge_index, challenge_results.proofs'
+                        ' FROM wanted_plots JOIN challenge_results ON challenge_results.plot_name = wanted_plots.name'
+                        ' WHERE challenge_results.challenge_index >= 0'):
+                    plot_proofs = proofs.setdefault(plot_name, bytearray())
+                    if challenge_index >= len(plot_proofs):
+                        plot_proofs += bytearray([not_checked]) * (challenge_index + 1 - len(plot_proofs))
+                    plot_proofs[challenge_index] = min(max(challenge_proofs, 0), not_checked - 1)
+                self._connection.execute('DELETE FROM wanted_plots')
+                self._connection.commit()
+            for plot_name in chunk:
+                yield plot_name, plot_types.get(plot_name), bytes(proofs.get(plot_name, b''))
+
+    def parse_and_return_relevant_data(self,
+                                       list_of_plots):
+        return list(self.iter_relevant_data(list_of_plots))
+
+    def sorted_report_rows(self,
+                           list_of_plots,
+                           sort_by: str,
+                           descending: bool = False,
+                           limit: int = None,
+                           offset: int = 0,
+                           row_filter: report_filter = None) -> List:
+        """The rows of build_report, filtered, sorted and paged by the query: the checked plots first, the ties
+        and the plots never checked in the order of list_of_plots"""
+        row_filter = row_filter if row_filter else report_filter()
+        checked = 'COALESCE(plots.challenges_tried, 0) > 0'
+        conditions, parameters = [], []
+        if row_filter.checked_only:
+            conditions.append(checked)
+        if row_filter.min_ratio is not None:
+            conditions.append(f"{ self._sort_value_sql['proofs_found'] } >= ?")
+            parameters.append(row_filter.min_ratio)
+        if row_filter.max_ratio is not None:
+            conditions.append(f"{ self._sort_value_sql['proofs_found'] } <= ?")
+            parameters.append(row_filter.max_ratio)
+        if row_filter.plot_types:
+            conditions.append(f"plots.plot_type IN ({ ', '.join('?' * len(row_filter.plot_types)) })")
+            parameters += sorted(row_filter.plot_types)
+
+        where_sql = ''.join(f' AND { condition }' for condition in conditions)
+        direction = 'DESC' if descending else 'ASC'
+
+        with self._lock:
+            self._connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted_plots (name TEXT PRIMARY KEY)')
+            self._connection.execute('DELETE FROM wanted_plots')
+            self._connection.executemany('INSERT OR IGNORE INTO wanted_plots (name) VALUES (?)',
+                                         [(plot_name,) for plot_name in list_of_plots])
+            whole_table = sort_by in self._sort_index\
+                          and self._connection.execute('SELECT COUNT(*) FROM plots').fetchone()[0]\
+                              == self._connection.execute('SELECT COUNT(*) FROM wanted_plots JOIN plots ON plots.name = wanted_plots.name').fetchone()[0]
+            if whole_table:
+                # every stored plot is wanted: the checked ones are read in the order of the index and only the ties
+                # are sorted, instead of sorting every plot for a single page
+                rows = self._connection.execute(f'SELECT { self._report_columns_sql }'
+                                                f' FROM plots INDEXED BY { self._sort_index[sort_by] }'
+                                                f' CROSS JOIN wanted_plots ON wanted_plots.name = plots.name'
+                                                f' WHERE plots.challenges_tried > 0{ where_sql }'
+                                                f' ORDER BY { self._sort_value_sql[sort_by] } { direction }, wanted_plots.rowid'
+                                                f' LIMIT ? OFFSET ?',
+                                                parameters + [limit if limit is not None else -1, offset]).fetchall()
+                if not row_filter.checked_only and (limit is None or len(rows) < limit):
+                    # then the plots never checked, in the order of list_of_plots
+                    if rows or not offset:
+                        checked_rows = offset + len(rows)
+                    else:
+                        checked_rows = self._connection.execute(f'SELECT COUNT(*) FROM plots WHERE plots.challenges_tried > 0{ where_sql }',
+                                                                parameters).fetchone()[0]
+                    rows += self._connection.execute(f'SELECT { self._report_columns_sql }'
+                                                     f' FROM wanted_plots LEFT JOIN plots ON plots.name = wanted_plots.name'
+                                                     f' WHERE NOT { checked }{ where_sql }'
+                                                     f' ORDER BY wanted_plots.rowid LIMIT ? OFFSET ?',
+                                                     parameters + [limit - len(rows) if limit is not None else -1,
+                                                                   max(0, offset - checked_rows)]).fetchall()
+            else:
+                rows = self._connection.execute(f'SELECT { self._report_columns_sql }'
+                                                f' FROM wanted_plots LEFT JOIN plots ON plots.name = wanted_plots.name'
+                                                + (' WHERE ' + ' AND '.join(conditions) if conditions else '')
+                                                + f' ORDER BY { checked } DESC,'
+                                                  f' CASE WHEN { checked } THEN { self._sort_value_sql[sort_by] } ELSE 0 END { direction },'
+                                                  f' wanted_plots.rowid'
+                                                + ' LIMIT ? OFFSET ?',
+                                                parameters + [limit if limit is not None else -1, offset]).fetchall()
+            self._connection.execute('DELETE FROM wanted_plots')
+            self._connection.commit()
+        return [report_row({'name': name,
+                            'challenges_tried': challenges_tried,
+                            'proofs_found': proofs_found,
+                            'verified_challenges': verified_challenges,
+                            'plot_id': plot_id,
+                            'plot_type': plot_type,
+                            'last_checked': last_checked})
+                for name, challenges_tried, proofs_found, verified_challenges, plot_id, plot_type, last_checked in rows]
+
+    def import_json_outputs(self,
+                            output_folder: str = 'output') -> int:
+        json_backend = json_storage_backend(output_folder=output_folder)
+        imported = 0
+        for plot_name in json_backend.get_entries():
+            content = json_backend.load_data(plot_name)
+            if content:
+                self.save_data(plot_name,
+                               content)
+                imported += 1
+        self._log.info(f'Imported { imported } plot results from { output_folder } into { self.db_path }.')
+        return imported
+
+    def flush_summary_index(self):
+        # the plots table is the summary index, it is always up to date
+        pass
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+storage_backends = {'json': json_storage_backend,
+                    'sqlite': sqlite_storage_backend}
+
+if __name__ == '__main__':
+    # one-shot import of the existing output/ results into SQLite: python _00_storage.py
+    # or conversion of the output/ snapshots between the binary and json formats: python _00_storage.py --convert-to json
+    from argparse import ArgumentParser
+    from _00_base import configure_logger
+    parser = ArgumentParser()
+    parser.add_argument('--convert-to', choices=snapshot_formats, default=None)
+    args = parser.parse_args()
+
+    configure_logger()
+    if args.convert_to:
+        json_storage_backend(snapshot_format=args.convert_to).convert_snapshots()
+    else:
+        sqlite_storage_backend().import_json_outputs()
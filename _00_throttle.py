@@ -0,0 +1,81 @@
+from logging import getLogger
+from threading import Lock
+from collections import deque
+from time import sleep
+from typing import Dict,\
+    List
+
+class disk_latency_controller():
+    """AIMD controller for the delay between the lookups of a single disk.
+    The delay backs off multiplicatively while the p95 lookup latency is above the target
+    and shrinks additively while it is below; a disk well under the target is sped up faster.
+    Every disk lookup is a sample (the qualities and each full proof), the delay is adjusted once per challenge."""
+
+    def __init__(self,
+                 target_p95_ms: float,
+                 window: int = 20,
+                 max_delay: float = 10,
+                 min_backoff_delay: float = 0.05,
+                 decrease_step: float = 0.02):
+        self.target_p95_ms = target_p95_ms
+        self.max_delay = max_delay
+        self.min_backoff_delay = min_backoff_delay
+        self.decrease_step = decrease_step
+
+        self._lock = Lock()
+        self.latencies_ms = deque(maxlen=window)
+        self.delay = 0
+
+    def p95_ms(self) -> float:
+        with self._lock:
+            if not self.latencies_ms:
+                return 0
+            ordered = sorted(self.latencies_ms)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def record(self,
+               latencies_sec: List) -> float:
+        with self._lock:
+            self.latencies_ms.extend(latency_sec * 1000 for latency_sec in latencies_sec)
+        p95_ms = self.p95_ms()
+        with self._lock:
+            if p95_ms > self.target_p95_ms:
+                self.delay = min(self.max_delay, max(self.min_backoff_delay, self.delay * 2))
+            elif p95_ms < self.target_p95_ms / 2:
+                # the disk is mostly idle, speed up faster
+                self.delay = max(0, self.delay / 2 - self.decrease_step)
+            else:
+                self.delay = max(0, self.delay - self.decrease_step)
+            return self.delay
+
+class adaptive_throttle():
+    """Keeps the p95 lookup latency of every disk under a target, instead of a fixed delay after each challenge"""
+
+    def __init__(self,
+                 target_p95_ms: float):
+        self._log = getLogger()
+
+        self.target_p95_ms = target_p95_ms
+        self._lock = Lock()
+        self.controllers: Dict[str, disk_latency_controller] = {}
+
+    def controller(self,
+                   disk_key: str) -> disk_latency_controller:
+        with self._lock:
+            if disk_key not in self.controllers:
+                self.controllers[disk_key] = disk_latency_controller(target_p95_ms=self.target_p95_ms)
+            return self.controllers[disk_key]
+
+    def record(self,
+               disk_key: str,
+               latencies_sec: List) -> float:
+        """The latencies of the disk lookups of a challenge"""
+        return self.controller(disk_key).record(latencies_sec)
+
+    def wait(self,
+             disk_key: str):
+        controller = self.controller(disk_key)
+        if controller.delay:
+            self._log.debug(f"Disk { disk_key }: p95 lookup { controller.p95_ms():.0f} ms"
+                           f" (target { self.target_p95_ms } ms), going to sleep for { controller.delay:.2f} seconds ...")
+            sleep(controller.delay)
@@ -0,0 +1,213 @@
+from os import path,\
+    sep,\
+    stat
+from logging import getLogger
+from threading import Lock
+from time import time
+from typing import List,\
+    Tuple
+
+from _00_discovery import discover_plots,\
+    list_folder
+from _00_plot_cache import plot_metadata_cache
+
+# inotify: the folders are watched with watchdog (inotify on Linux, ReadDirectoryChangesW on Windows, FSEvents on macOS)
+# polling: the mtime of every folder is polled, only the folders with a new mtime are listed again
+# auto: inotify when watchdog is installed, polling otherwise
+watch_modes = ['auto', 'inotify', 'polling']
+
+class plot_watcher():
+    """Keeps the plots of the input folders up to date in memory, after a single full discovery.
+    poll() returns the plots added, changed (same path, new size/ mtime/ inode) and removed since the previous call;
+    the added/ changed plots are only returned once their size and mtime did not move for settle_sec,
+    so a plot still being copied is never checked half written.
+    The polling never notices a plot rewritten in place (its folder mtime does not change), inotify does."""
+
+    def __init__(self,
+                 input_data: List,
+                 recursive: bool = False,
+                 settle_sec: float = 60,
+                 watch_mode: str = 'auto'):
+        self._log = getLogger()
+
+        if watch_mode not in watch_modes:
+            raise Exception(f'Unknown watch mode { watch_mode }, valid options: { watch_modes }')
+        self.recursive = recursive
+        self.settle_sec = settle_sec
+
+        # the only full scan, every later change is applied folder by folder
+        self.folders_mtimes = {}
+        self.plots_paths, self.plots_stats = discover_plots(input_data,
+                                                            recursive=recursive,
+                                                            folders_mtimes=self.folders_mtimes)
+        self.root_folders = [entry for entry in input_data if path.isdir(entry)]
+        # plot files provided directly are not covered by a folder, they are stat-ed on every poll
+        self.watched_files = [entry for entry in input_data if entry in self.plots_stats]
+        self.identities = {plot_path: plot_metadata_cache.identity_from_stat(plot_stat)
+                           for plot_path, plot_stat in self.plots_stats.items()}
+        self.plots_by_folder = {}
+        for plot_path in self.plots_paths:
+            if plot_path not in self.watched_files:
+                self.plots_by_folder.setdefault(path.dirname(plot_path), set()).add(plot_path)
+
+        # plot path: (identity, since when it did not change), until it settles
+        self.settling = {}
+
+        self._lock = Lock()
+        self._dirty_folders = set()
+        self._observer = None
+        if watch_mode != 'polling':
+            self._observer = self._start_observer(required=watch_mode == 'inotify')
+        self.watch_mode = 'inotify' if self._observer else 'polling'
+        self._log.info(f'Watching { len(self.folders_mtimes) } folder(s) and { len(self.watched_files) } plot file(s)'
+                       f' for changes ({ self.watch_mode }).')
+
+    def _start_observer(self,
+                        required: bool):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            if required:
+                raise Exception('The inotify watch mode needs watchdog: pip install watchdog')
+            self._log.info('watchdog is not installed, the plot folders will be polled instead.')
+            return None
+
+        watcher = self
+
+        class folder_events(FileSystemEventHandler):
+            def on_any_event(self, event):
+                watcher._folder_event(event)
+
+        observer = Observer()
+        for folder in self.root_folders:
+            observer.schedule(folder_events(), folder, recursive=self.recursive)
+        observer.start()
+        return observer
+
+    def _folder_event(self,
+                      event):
+        # only flags the folder, it is listed again by the next poll; called from the watchdog thread
+        event_paths = [event.src_path, getattr(event, 'dest_path', None)]
+        if event.is_directory or any(str(_).endswith('.plot') for _ in event_paths if _):
+            with self._lock:
+                self._dirty_folders.update(path.dirname(str(_)) for _ in event_paths if _)
+                if event.is_directory:
+                    self._dirty_folders.update(str(_) for _ in event_paths if _)
+
+    def _changed_folders(self) -> List:
+        if self._observer:
+            with self._lock:
+                dirty_folders, self._dirty_folders = self._dirty_folders, set()
+            return [folder for folder in dirty_folders if folder in self.folders_mtimes]
+
+        changed_folders = []
+        for folder, folder_mtime in self.folders_mtimes.items():
+            try:
+                current_mtime = stat(folder).st_mtime_ns
+            except OSError:
+                current_mtime = None
+            if current_mtime != folder_mtime:
+                changed_folders.append(folder)
+        return changed_folders
+
+    def _forget_folder(self,
+                       folder: str,
+                       removed: List):
+        # the folder and its subfolders are gone, so are their plots
+        for known_folder in [_ for _ in self.folders_mtimes if _ == folder or _.startswith(folder.rstrip(sep) + sep)]:
+            self.folders_mtimes.pop(known_folder)
+            for plot_path in self.plots_by_folder.pop(known_folder, set()):
+                self._forget_plot(plot_path, removed)
+
+    def _forget_plot(self,
+                     plot_path: str,
+                     removed: List):
+        self.settling.pop(plot_path, None)
+        if self.identities.pop(plot_path, None) is not None:
+            self.plots_stats.pop(plot_path, None)
+            removed.append(plot_path)
+
+    def _observe(self,
+                 plot_path: str,
+                 plot_stat):
+        identity = plot_metadata_cache.identity_from_stat(plot_stat)
+        if self.identities.get(plot_path) == identity:
+            self.settling.pop(plot_path, None)
+        elif plot_path not in self.settling or self.settling[plot_path][0] != identity:
+            self.settling[plot_path] = (identity, time())
+
+    def _list_folder(self,
+                     folder: str,
+                     removed: List):
+        folders_to_list = [folder]
+        while folders_to_list:
+            current_folder = folders_to_list.pop()
+            try:
+                self.folders_mtimes[current_folder] = stat(current_folder).st_mtime_ns
+                plots, subfolders = list_folder(current_folder)
+            except OSError:
+                if current_folder in self.root_folders:
+                    # e.g. an unmounted disk; it is listed again once it is back
+                    self.folders_mtimes[current_folder] = None
+                    for plot_path in self.plots_by_folder.pop(current_folder, set()):
+                        self._forget_plot(plot_path, removed)
+                else:
+                    self._forget_folder(current_folder, removed)
+                continue
+
+            listed_plots = set()
+            for plot_path, plot_stat in plots:
+                listed_plots.add(plot_path)
+                self._observe(plot_path, plot_stat)
+            for plot_path in self.plots_by_folder.get(current_folder, set()) - listed_plots:
+                self.plots_by_folder[current_folder].discard(plot_path)
+                self._forget_plot(plot_path, removed)
+            for plot_path in [_ for _ in self.settling if path.dirname(_) == current_folder and _ not in listed_plots]:
+                self.settling.pop(plot_path)
+
+            if self.recursive:
+                for known_subfolder in [_ for _ in self.folders_mtimes if path.dirname(_) == current_folder and _ not in subfolders]:
+                    self._forget_folder(known_subfolder, removed)
+                folders_to_list += [_ for _ in subfolders if _ not in self.folders_mtimes]
+
+    def poll(self) -> Tuple[List, List, List]:
+        """Returns the (added, changed, removed) plot paths since the previous poll"""
+        added, changed, removed = [], [], []
+
+        for folder in self._changed_folders():
+            self._list_folder(folder, removed)
+        for plot_path in self.watched_files:
+            try:
+                self._observe(plot_path, stat(plot_path))
+            except OSError:
+                self._forget_plot(plot_path, removed)
+
+        # the settling plots are stat-ed on every poll, a file growing in place does not touch its folder mtime
+        for plot_path, (identity, since) in list(self.settling.items()):
+            try:
+                plot_stat = stat(plot_path)
+            except OSError:
+                self.settling.pop(plot_path)
+                continue
+            if plot_metadata_cache.identity_from_stat(plot_stat) != identity:
+                self._observe(plot_path, plot_stat)
+            elif time() - since >= self.settle_sec:
+                self.settling.pop(plot_path)
+                (changed if plot_path in self.identities else added).append(plot_path)
+                self.identities[plot_path] = identity
+                self.plots_stats[plot_path] = plot_stat
+                if plot_path not in self.watched_files:
+                    self.plots_by_folder.setdefault(path.dirname(plot_path), set()).add(plot_path)
+
+        if removed:
+            removed_set = set(removed)
+            self.plots_paths = [_ for _ in self.plots_paths if _ not in removed_set]
+        self.plots_paths += sorted(added)
+        return sorted(added), sorted(changed), sorted(removed)
+
+    def stop(self):
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
@@ -0,0 +1,41 @@
+import sys
+from os import path,\
+    mkdir
+
+import pytest
+
+# the modules live at the root of the repository, next to _00_GUI.py/ _00_CLI.py
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+@pytest.fixture
+def back_end(tmp_path, monkeypatch):
+    # the output/ cache/ catalog of LEAF live in the working directory
+    monkeypatch.chdir(tmp_path)
+    from _00_back_end import LEAF_back_end
+    back_end = LEAF_back_end()
+    yield back_end
+    back_end.storage.close()
+
+@pytest.fixture
+def synthetic_back_end(back_end):
+    # two plots on the synthetic prover of the benchmarks, nothing is read from the plot files
+    from _00_benchmark import build_synthetic_plot_class
+    back_end.plot_class = build_synthetic_plot_class({})
+    # the synthetic headers carry no real keys to derive from
+    back_end.forks = []
+    mkdir('plots')
+    for plot_index in range(2):
+        open(path.join('plots', f'plot-k32-2023-01-01-00-00-{ plot_index:08d}.plot'), 'w').close()
+    back_end.parse_input_and_get_paths(['plots'])
+    return back_end
+
+@pytest.fixture
+def run_check(synthetic_back_end):
+    def run(nr_challenges: int,
+            **check_options) -> bool:
+        return synthetic_back_end.check_plots(nr_challenges=nr_challenges,
+                                              delay_between_checks=0,
+                                              progress_callback=lambda **kwargs: None,
+                                              stop_flag_check=lambda: False,
+                                              **check_options)
+    return run
@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from _00_early_stop import poisson_cdf
+from _00_result_codec import not_checked
+from _00_analytics import poisson_lower_tail,\
+    benjamini_hochberg,\
+    load_proof_counts,\
+    analyze_proof_counts
+
+def test_poisson_lower_tail_matches_the_scalar_cdf():
+    observed, expected = zip(*[(k, mean) for k in [0, 1, 2, 5, 10, 80, 100, 130, 900, 1000, 4999]
+                                         for mean in [0.5, 1, 3, 10, 100, 1000]])
+    tail = poisson_lower_tail(observed, expected)
+    reference = np.array([poisson_cdf(k, mean) for k, mean in zip(observed, expected)])
+    significant = reference > 1e-12
+    assert tail[significant] == pytest.approx(reference[significant], rel=1e-8)
+    assert np.all(np.abs(tail[~significant] - reference[~significant]) < 1e-12)
+
+def test_poisson_lower_tail_approximation_above_the_exact_limit():
+    # Wilson-Hilferty, beyond 5000 proofs
+    for k, mean in [(5100, 5000), (6000, 6500), (9000, 10000)]:
+        assert poisson_lower_tail([k], [mean])[0] == pytest.approx(poisson_cdf(k, mean), rel=0.05)
+
+def test_poisson_lower_tail_without_challenges():
+    assert list(poisson_lower_tail([0, 3], [0, 0])) == [1, 1]
+
+def test_benjamini_hochberg():
+    assert list(benjamini_hochberg([0.01, 0.04, 0.03, 0.005])) == pytest.approx([0.02, 0.04, 0.04, 0.02])
+    # the q-values never exceed 1 and keep the order of the p-values
+    assert list(benjamini_hochberg([0.9, 0.8])) == pytest.approx([0.9, 0.9])
+    assert list(benjamini_hochberg([1, 1, 1])) == [1, 1, 1]
+    assert len(benjamini_hochberg([])) == 0
+
+def test_load_proof_counts():
+    names, plot_types, counts = load_proof_counts([('a.plot', 'NFT', bytes([1, 0, not_checked, 2])),
+                                                   ('b.plot', None, b'')])
+    assert names == ['a.plot', 'b.plot']
+    assert plot_types == ['NFT', 'unknown']
+    assert list(counts['challenges']) == [3, 0]
+    assert list(counts['proofs']) == [3, 0]
+    assert list(counts['zero_challenges']) == [1, 0]
+
+def test_only_the_damaged_plot_is_flagged():
+    rng = np.random.default_rng(0)
+    proof_counts = [(f'plot-k32-{ plot_index }.plot', 'OG', rng.poisson(1.0, 1000).astype(np.uint8).tobytes())
+                    for plot_index in range(50)]
+    proof_counts.append(('plot-k33-damaged.plot', 'NFT', rng.poisson(0.7, 1000).astype(np.uint8).tobytes()))
+    proof_counts.append(('plot-k32-unchecked.plot', 'OG', b''))
+
+    analytics = analyze_proof_counts(proof_counts,
+                                     disk_by_name={'plot-k33-damaged.plot': 'disk2'})
+    assert analytics['summary']['plots'] == 52
+    assert analytics['summary']['checked_plots'] == 51
+    assert [row['name'] for row in analytics['underperformers']] == ['plot-k33-damaged.plot']
+    # the worst group goes first
+    assert analytics['aggregates']['disk'][0]['name'] == 'disk2'
+    assert analytics['aggregates']['size'][0]['flagged_plots'] == 1
+
+def test_invalid_parameters_are_rejected():
+    with pytest.raises(Exception):
+        analyze_proof_counts([], alpha=1)
+    with pytest.raises(Exception):
+        analyze_proof_counts([], expected_ratio=0)
@@ -0,0 +1,50 @@
+from os import path
+
+import pytest
+
+from _00_back_end import challenge_set
+from _00_plot_keys import std_hash
+
+def baseline_challenge(challenge_index):
+    # how check_plots hashed every challenge before the challenge sets
+    return std_hash(challenge_index.to_bytes(32, "big"))
+
+def test_challenges_match_the_baseline(tmp_path):
+    challenges = challenge_set(50, cache_folder=str(tmp_path))
+    assert len(challenges) == 50
+    assert [challenges[challenge_index] for challenge_index in range(50)] == [baseline_challenge(_) for _ in range(50)]
+    with pytest.raises(IndexError):
+        challenges[50]
+
+def test_cache_is_reused_and_extended(tmp_path):
+    challenges = challenge_set(10, cache_folder=str(tmp_path))
+    # a fresh run with fewer, then more challenges gets the very same ones
+    assert challenge_set(5, cache_folder=str(tmp_path)).buffer == challenges.buffer[:5 * 32]
+    assert challenge_set(20, cache_folder=str(tmp_path)).buffer[:10 * 32] == challenges.buffer
+    assert path.getsize(challenges.cache_filepath) == 20 * 32 + 32
+
+def test_cached_challenges_are_not_rehashed(tmp_path, monkeypatch):
+    challenge_set(10, cache_folder=str(tmp_path))
+    hashed = []
+    monkeypatch.setattr('_00_back_end.std_hash', lambda b: hashed.append(b) or std_hash(b))
+    challenge_set(10, cache_folder=str(tmp_path))
+    # only the digest of the cache is checked
+    assert len(hashed) == 1
+
+@pytest.mark.parametrize('damage', [lambda cached: cached[:-40],
+                                    lambda cached: cached[:64],
+                                    lambda cached: cached[:40] + bytes([cached[40] ^ 1]) + cached[41:],
+                                    lambda cached: b'',
+                                    # a cache written before the trailing digest
+                                    lambda cached: cached[:-32]])
+def test_damaged_cache_is_rebuilt(tmp_path, damage):
+    cache_filepath = challenge_set(10, cache_folder=str(tmp_path)).cache_filepath
+    with open(cache_filepath, 'rb') as input_handle:
+        cached = input_handle.read()
+    with open(cache_filepath, 'wb') as output_handle:
+        output_handle.write(damage(cached))
+
+    challenges = challenge_set(10, cache_folder=str(tmp_path))
+    assert [challenges[challenge_index] for challenge_index in range(10)] == [baseline_challenge(_) for _ in range(10)]
+    with open(cache_filepath, 'rb') as input_handle:
+        assert input_handle.read() == cached
@@ -0,0 +1,59 @@
+from inspect import signature
+
+import pytest
+
+from _00_base import stop_logger
+from _00_back_end import LEAF_back_end
+from _00_pipeline import default_verification_pool_kind
+from _00_CLI import parse_args,\
+    main
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # runtime_log.log, output/ and cache/ go to the working directory
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'plots').mkdir()
+    (tmp_path / 'plots' / 'plot-k32-a.plot').touch()
+    (tmp_path / 'leaf.yaml').write_text('paths: [plots]\n'
+                                        'challenges: 50\n'
+                                        'check-mode: sampled\n')
+    yield tmp_path
+    stop_logger()
+
+class recorded_checks(list):
+    # the options of every check_plots call; the check fails when check_failed is set
+    check_failed = False
+
+@pytest.fixture
+def checks(monkeypatch):
+    checks = recorded_checks()
+    def check_plots(back_end, **check_options):
+        checks.append(check_options)
+        return not checks.check_failed
+    monkeypatch.setattr(LEAF_back_end, 'check_plots', check_plots)
+    return checks
+
+def test_config_file_fills_in_the_defaults(workdir):
+    args = parse_args(['--config', 'leaf.yaml', 'check', 'more_plots', '--challenges', '7'])
+    assert args.paths == ['more_plots', 'plots']
+    # the command line takes precedence
+    assert args.challenges == 7
+    assert args.check_mode == 'sampled'
+
+def test_same_verification_pool_as_the_back_end():
+    assert parse_args(['check', 'plots']).verification_pool == default_verification_pool_kind
+    assert signature(LEAF_back_end.check_plots).parameters['verification_pool_kind'].default == default_verification_pool_kind
+    assert default_verification_pool_kind == 'thread'
+
+def test_check_exit_codes(workdir, checks):
+    assert main(['--config', 'leaf.yaml', 'check']) == 0
+    assert checks[-1]['nr_challenges'] == 50
+    assert checks[-1]['check_mode'] == 'sampled'
+
+    checks.check_failed = True
+    assert main(['--config', 'leaf.yaml', 'check']) == 1
+
+def test_errors_exit_with_1(workdir, checks):
+    # no plot paths at all
+    assert main(['check']) == 1
+    assert checks == []
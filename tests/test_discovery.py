@@ -0,0 +1,72 @@
+from os import path,\
+    walk,\
+    listdir
+
+import pytest
+
+import _00_discovery
+from _00_discovery import discover_plots,\
+    find_duplicates
+
+@pytest.fixture
+def farm(tmp_path):
+    # disk1/ with nested plots, disk2/ with a single plot, plus files that are no plots
+    for relative_path in ['disk1/a.plot', 'disk1/b.plot', 'disk1/notes.txt', 'disk1/old/c.plot', 'disk1/old/older/d.plot',
+                          'disk1/old/older/d.plot.tmp', 'disk2/e.plot', 'loose/f.plot']:
+        (tmp_path / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / relative_path).touch()
+    # a folder named like a plot is no plot
+    (tmp_path / 'disk2' / 'g.plot').mkdir()
+    return tmp_path
+
+def baseline_listdir(folder):
+    # the discovery of LEAF before the scandir rewrite, a single folder level
+    return [path.join(folder, filename) for filename in listdir(folder) if filename.endswith('.plot')]
+
+def baseline_walk(folder):
+    return [path.join(root, filename) for root, _, filenames in walk(folder) for filename in filenames if filename.endswith('.plot')]
+
+def test_recursive_discovery_matches_a_walk(farm):
+    input_data = [str(farm / 'disk1'), str(farm / 'disk2')]
+    plots_paths, plots_stats = discover_plots(input_data, recursive=True)
+    assert sorted(plots_paths) == sorted(baseline_walk(str(farm / 'disk1')) + baseline_walk(str(farm / 'disk2')))
+    assert set(plots_stats) == set(plots_paths)
+    assert plots_stats[str(farm / 'disk1' / 'old' / 'c.plot')].st_ino == (farm / 'disk1' / 'old' / 'c.plot').stat().st_ino
+
+def test_single_level_discovery_matches_the_baseline(farm):
+    plots_paths, _ = discover_plots([str(farm / 'disk1'), str(farm / 'disk2')])
+    assert sorted(plots_paths) == sorted(baseline_listdir(str(farm / 'disk1')) + [str(farm / 'disk2' / 'e.plot')])
+
+def test_input_order_is_kept(farm):
+    plots_paths, _ = discover_plots([str(farm / 'loose' / 'f.plot'), str(farm / 'disk2'), str(farm / 'missing'), str(farm / 'disk1')])
+    assert plots_paths == [str(farm / 'loose' / 'f.plot'),
+                           str(farm / 'disk2' / 'e.plot'),
+                           str(farm / 'disk1' / 'a.plot'),
+                           str(farm / 'disk1' / 'b.plot')]
+
+def baseline_duplicates(all_plots_paths):
+    # the quadratic count of the baseline
+    names = [path.basename(entry) for entry in all_plots_paths]
+    return sorted(entry for index, entry in enumerate(all_plots_paths) if names.count(names[index]) > 1)
+
+def test_duplicates_are_found_by_name(monkeypatch):
+    all_plots_paths = [f'/mnt/disk{ plot_index % 7 }/plot-{ plot_index % 500 }.plot' for plot_index in range(600)]\
+                      + ['/mnt/disk9/unique.plot']
+
+    basenames = []
+    original_basename = _00_discovery.path.basename
+    monkeypatch.setattr(_00_discovery.path, 'basename', lambda entry: basenames.append(entry) or original_basename(entry))
+    duplicates = find_duplicates(all_plots_paths)
+    monkeypatch.undo()
+
+    # a single pass over the paths
+    assert len(basenames) == len(all_plots_paths)
+    assert len(duplicates) == 100
+    assert duplicates['plot-0.plot'] == ['/mnt/disk0/plot-0.plot', '/mnt/disk3/plot-0.plot']
+    assert sorted(entry for entries in duplicates.values() for entry in entries) == baseline_duplicates(all_plots_paths)
+    assert find_duplicates(['/mnt/disk1/a.plot', '/mnt/disk2/b.plot']) == {}
+
+def test_duplicate_plots_stop_the_check(back_end, farm):
+    (farm / 'disk2' / 'a.plot').touch()
+    with pytest.raises(Exception, match='Duplicate plots found'):
+        back_end.parse_input_and_get_paths([str(farm / 'disk1'), str(farm / 'disk2')])
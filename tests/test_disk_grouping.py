@@ -0,0 +1,29 @@
+from os import stat_result
+
+from _00_back_end import get_disk_key
+
+def fake_stat(st_dev):
+    return stat_result((0o100644, 1, st_dev, 1, 0, 0, 0, 0, 0, 0))
+
+def test_plots_are_grouped_by_device(back_end):
+    back_end.all_plots_paths = ['/mnt/a/1.plot', '/mnt/b/2.plot', '/mnt/a/sub/3.plot', '/mnt/c/4.plot']
+    # /mnt/c is another mount point of the device of /mnt/b
+    back_end.plots_stats = dict(zip(back_end.all_plots_paths, [fake_stat(11), fake_stat(22), fake_stat(11), fake_stat(22)]))
+
+    assert back_end.group_plots_by_disk() == {'11': [(1, '/mnt/a/1.plot'), (3, '/mnt/a/sub/3.plot')],
+                                              '22': [(2, '/mnt/b/2.plot'), (4, '/mnt/c/4.plot')]}
+
+def test_grouping_keeps_the_order_of_the_provided_plots(back_end):
+    back_end.all_plots_paths = ['/mnt/a/1.plot', '/mnt/a/2.plot', '/mnt/b/3.plot']
+    back_end.plots_stats = dict(zip(back_end.all_plots_paths, [fake_stat(11), fake_stat(11), fake_stat(22)]))
+
+    assert back_end.group_plots_by_disk(['/mnt/b/3.plot', '/mnt/a/2.plot', '/mnt/a/1.plot']) == {'22': [(1, '/mnt/b/3.plot')],
+                                                                                                 '11': [(2, '/mnt/a/2.plot'),
+                                                                                                        (3, '/mnt/a/1.plot')]}
+
+def test_disk_key_of_real_files(tmp_path):
+    plot_path = tmp_path / 'a.plot'
+    plot_path.touch()
+    assert get_disk_key(str(plot_path)) == str(tmp_path.stat().st_dev)
+    # without a stat result, the folder of a missing plot stands for its disk
+    assert get_disk_key(str(tmp_path / 'missing.plot')) == str(tmp_path)
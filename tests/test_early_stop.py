@@ -0,0 +1,65 @@
+from math import exp
+
+import pytest
+
+from _00_early_stop import poisson_cdf,\
+    poisson_ratio_interval,\
+    sequential_test,\
+    decision_good,\
+    decision_bad,\
+    decision_undecided
+
+def test_poisson_cdf():
+    assert poisson_cdf(0, 1) == pytest.approx(exp(-1))
+    assert poisson_cdf(2, 2) == pytest.approx(5 * exp(-2))
+    assert poisson_cdf(3, 0) == 1.0
+    # large means do not overflow
+    assert poisson_cdf(1000, 1000) == pytest.approx(0.5084, abs=1e-3)
+
+def test_garwood_interval():
+    # the published exact 95% limits of a Poisson count
+    assert poisson_ratio_interval(0, 1) == pytest.approx([0.0, 3.6889], abs=1e-4)
+    assert poisson_ratio_interval(10, 1) == pytest.approx([4.7954, 18.3904], abs=1e-4)
+    # the count limits divided by the challenges
+    assert poisson_ratio_interval(10, 100) == pytest.approx([0.047954, 0.183904], abs=1e-6)
+    assert poisson_ratio_interval(0, 0) == [0.0, None]
+
+def decide(proofs_per_challenge, challenges=500, **test_options):
+    test = sequential_test(**test_options)
+    for _ in range(challenges):
+        if test.update(proofs_per_challenge) != decision_undecided:
+            break
+    return test
+
+def test_healthy_plot_is_accepted():
+    test = decide(1)
+    assert test.decision == decision_good
+    assert 70 <= test.challenges <= 90
+    assert test.confidence() == pytest.approx(0.99)
+
+def test_plot_without_proofs_is_rejected():
+    test = decide(0)
+    assert test.decision == decision_bad
+    assert test.challenges == 16
+    assert test.summary()['ratio_interval_95'][0] == 0.0
+
+def test_decision_is_final():
+    test = decide(0)
+    for _ in range(100):
+        test.update(3)
+    assert test.decision == decision_bad
+    assert test.proofs == 300
+
+def test_borderline_plot_stays_undecided():
+    test = sequential_test()
+    # a proofs ratio of 5/6, between the bad 0.7 and the good 1.0
+    for challenge_index in range(40):
+        test.update(1 if challenge_index % 6 else 0)
+    assert test.decision == decision_undecided
+    assert test.confidence() is None
+
+def test_invalid_ratios_are_rejected():
+    with pytest.raises(Exception):
+        sequential_test(bad_ratio=1.2)
+    with pytest.raises(Exception):
+        sequential_test(bad_ratio=0)
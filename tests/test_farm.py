@@ -0,0 +1,137 @@
+from urllib.error import HTTPError
+
+import pytest
+
+from _00_storage import json_storage_backend
+from _00_farm import farm_coordinator,\
+    farm_worker_storage,\
+    fetch_farm_report,\
+    fetch_farm_histograms,\
+    _request
+
+token = 'farm secret'
+
+@pytest.fixture
+def coordinator(back_end, tmp_path):
+    coordinator = farm_coordinator(back_end,
+                                   registry_path=str(tmp_path / 'LEAF_farm.json'),
+                                   token=token)
+    # any free port, on the loopback
+    coordinator.serve(port=0,
+                      address='127.0.0.1')
+    coordinator.url = f'http://127.0.0.1:{ coordinator._http_server.server_address[1] }'
+    yield coordinator
+    coordinator.stop_serving()
+
+@pytest.fixture
+def new_worker(coordinator, tmp_path):
+    # every worker keeps its own local storage, as on its own harvester
+    workers = []
+    def factory(worker_name):
+        worker = farm_worker_storage(json_storage_backend(output_folder=str(tmp_path / worker_name),
+                                                          summary_index_path=str(tmp_path / f'{ worker_name }_catalog.json')),
+                                     coordinator.url,
+                                     worker_name=worker_name,
+                                     token=token,
+                                     retry_sec=0.1)
+        workers.append(worker)
+        return worker
+    yield factory
+    for worker in workers:
+        worker.close()
+
+def plot_entry(plot_name, disk):
+    return {'name': plot_name,
+            'path': f'/mnt/{ disk }/{ plot_name }',
+            'disk': disk}
+
+def snapshot(proofs):
+    return {'plot_type': 'OG',
+            'path_history': [],
+            'challenges': {str(challenge_index): {'proofs': challenge_proofs, 'verified': True}
+                           for challenge_index, challenge_proofs in enumerate(proofs)}}
+
+def test_register_asks_for_the_missing_results(coordinator, new_worker):
+    worker = new_worker('harvester1')
+    # checked before the farm existed: only in the local storage
+    worker.storage.save_data('plot-k32-a.plot', snapshot([1, 0, 2]))
+    plots = [plot_entry('plot-k32-a.plot', 'disk1'), plot_entry('plot-k32-b.plot', 'disk1')]
+
+    assert worker.register_plots(plots) == 1
+    assert worker.flush()
+    assert len(coordinator.back_end.load_data('plot-k32-a.plot')['challenges']) == 3
+    # in sync now, and the never checked plot is never wanted
+    registration = {'worker': 'harvester1',
+                    'plots': [{**plot, 'challenges_tried': 3 if plot['name'] == 'plot-k32-a.plot' else 0,
+                               'proofs_found': 3 if plot['name'] == 'plot-k32-a.plot' else 0,
+                               'verified_challenges': 3 if plot['name'] == 'plot-k32-a.plot' else 0} for plot in plots]}
+    assert _request(coordinator.url, '/register', registration, token=token) == {'wanted': []}
+    registration['plots'][0]['challenges_tried'] = 4
+    assert _request(coordinator.url, '/register', registration, token=token) == {'wanted': ['plot-k32-a.plot']}
+
+def test_two_workers_are_merged_into_one_report(coordinator, new_worker):
+    first_worker, second_worker = new_worker('harvester1'), new_worker('harvester2')
+    first_worker.register_plots([plot_entry('plot-k32-a.plot', 'disk1'), plot_entry('plot-k32-c.plot', 'disk1')])
+    second_worker.register_plots([plot_entry('plot-k33-b.plot', 'disk1')])
+
+    # streamed challenge by challenge, then a snapshot at the end of the plot
+    for challenge_index, proofs in enumerate([1, 1, 0, 2]):
+        first_worker.append_challenge_result('plot-k32-a.plot', challenge_index, {'proofs': proofs, 'verified': True})
+    second_worker.save_data('plot-k33-b.plot', snapshot([0, 0]))
+    second_worker.append_challenge_result('plot-k33-b.plot', 2, {'proofs': 1, 'verified': False})
+    assert first_worker.flush() and second_worker.flush()
+
+    report = fetch_farm_report(coordinator.url, token=token)
+    assert [(row['name'], row['challenges_tried'], row['proofs_found']) for row in report['rows']] == [('plot-k33-b.plot', 3, 1),
+                                                                                                      ('plot-k32-a.plot', 4, 4),
+                                                                                                      ('plot-k32-c.plot', None, None)]
+    assert report['statistics']['plots'] == 3
+    assert report['statistics']['checked_plots'] == 2
+
+    histograms = fetch_farm_histograms(coordinator.url, views=['ratio_by_disk'], token=token)
+    assert sorted(histograms['ratio_by_disk']['series']) == ['harvester1:disk1', 'harvester2:disk1']
+
+def test_drop_removes_the_results(coordinator, new_worker):
+    worker = new_worker('harvester1')
+    worker.register_plots([plot_entry('plot-k32-a.plot', 'disk1')])
+    worker.save_data('plot-k32-a.plot', snapshot([1, 1]))
+    assert worker.flush()
+    assert coordinator.back_end.load_data('plot-k32-a.plot')
+
+    worker.drop_data('plot-k32-a.plot')
+    assert worker.flush()
+    assert coordinator.back_end.load_data('plot-k32-a.plot') is None
+    assert fetch_farm_report(coordinator.url, token=token)['rows'][0]['challenges_tried'] is None
+
+@pytest.mark.parametrize('request_token', [None, 'wrong secret'])
+def test_requests_without_the_token_are_refused(coordinator, request_token):
+    for route, payload in [['/report', None],
+                           ['/results', {'worker': 'intruder', 'plot_name': 'plot-k32-a.plot', 'results': [[0, {'proofs': 1}]]}]]:
+        with pytest.raises(HTTPError) as refused:
+            _request(coordinator.url, route, payload, token=request_token)
+        assert refused.value.code == 401
+    assert coordinator.back_end.load_data('plot-k32-a.plot') is None
+
+@pytest.mark.parametrize('plot_name', ['../x.plot', '/tmp/x.plot', 'sub/x.plot', '..\\x.plot', '..plot', 'x.json'])
+def test_path_like_plot_names_are_refused(coordinator, tmp_path, plot_name):
+    for route, payload in [['/results', {'worker': 'harvester1', 'plot_name': plot_name, 'results': [[0, {'proofs': 1}]]}],
+                           ['/snapshot', {'worker': 'harvester1', 'plot_name': plot_name, 'snapshot': snapshot([1])}],
+                           ['/drop', {'worker': 'harvester1', 'plot_name': plot_name}],
+                           ['/register', {'worker': 'harvester1', 'plots': [{**plot_entry(plot_name, 'disk1'),
+                                                                             'challenges_tried': 1,
+                                                                             'proofs_found': 1,
+                                                                             'verified_challenges': 1}]}]]:
+        with pytest.raises(HTTPError) as refused:
+            _request(coordinator.url, route, payload, token=token)
+        assert refused.value.code == 400
+    # nothing was written next to the output folder
+    assert sorted(entry.name for entry in tmp_path.iterdir() if 'x' in entry.name) == []
+    assert coordinator.registry == {}
+
+def test_no_listening_beyond_the_loopback_without_a_token(back_end, tmp_path):
+    coordinator = farm_coordinator(back_end,
+                                   registry_path=str(tmp_path / 'LEAF_farm.json'))
+    with pytest.raises(Exception, match='farm token'):
+        coordinator.serve(port=0,
+                          address='0.0.0.0')
+    assert coordinator._http_server is None
@@ -0,0 +1,45 @@
+from os import path
+
+def stored_results(back_end):
+    return {path.basename(plot_path): back_end.load_data(path.basename(plot_path))
+            for plot_path in back_end.all_plots_paths}
+
+def test_full_mode_verifies_every_challenge(synthetic_back_end, run_check):
+    assert run_check(10, check_mode='full')
+    for content in stored_results(synthetic_back_end).values():
+        assert content['check_mode'] == 'full'
+        assert all(result['verified'] for result in content['challenges'].values())
+
+def test_sampled_mode_verifies_a_sample(synthetic_back_end, run_check):
+    assert run_check(200, check_mode='sampled', verification_sample_rate=10)
+    for content in stored_results(synthetic_back_end).values():
+        assert content['check_mode'] == 'sampled'
+        assert 0 < sum(result['verified'] for result in content['challenges'].values()) < 100
+
+def test_first_hit_is_verified_once(synthetic_back_end, run_check):
+    assert run_check(10, check_mode='first_hit')
+    for content in stored_results(synthetic_back_end).values():
+        verified = [int(challenge_index) for challenge_index, result in content['challenges'].items() if result['verified']]
+        # every challenge up to the first one with proofs
+        assert verified == list(range(len(verified)))
+        assert content['challenges'][str(verified[-1])]['proofs'] > 0
+
+def test_resumed_first_hit_is_not_verified_again(synthetic_back_end, run_check):
+    assert run_check(10, check_mode='first_hit')
+    first_run = stored_results(synthetic_back_end)
+    assert run_check(20, check_mode='first_hit')
+    for plot_name, content in stored_results(synthetic_back_end).items():
+        assert len(content['challenges']) == 20
+        assert {challenge_index: result for challenge_index, result in content['challenges'].items()
+                if result['verified']} == {challenge_index: result for challenge_index, result in first_run[plot_name]['challenges'].items()
+                                           if result['verified']}
+        assert content['check_mode'] == 'first_hit'
+
+def test_resumed_in_another_mode_is_mixed(synthetic_back_end, run_check):
+    assert run_check(5, check_mode='full')
+    assert run_check(10, check_mode='full')
+    assert {content['check_mode'] for content in stored_results(synthetic_back_end).values()} == {'full'}
+    assert run_check(20, check_mode='sampled')
+    for content in stored_results(synthetic_back_end).values():
+        assert content['check_mode'] == 'mixed'
+        assert all(content['challenges'][str(challenge_index)]['verified'] for challenge_index in range(10))
@@ -0,0 +1,86 @@
+from os import path
+from hashlib import sha256
+from time import sleep
+
+import pytest
+
+from _00_benchmark import build_synthetic_plot_class,\
+    fake_verifier
+from _00_plot_keys import std_hash
+
+class jittery_verifier(fake_verifier):
+    """The verifications take 0-4 ms, so the pool finishes them out of order"""
+
+    def validate_proof(self,
+                       plot_id: bytes,
+                       size: int,
+                       challenge: bytes,
+                       proof: bytes) -> bytes:
+        sleep(sha256(plot_id + bytes(challenge)).digest()[0] % 5 / 1000)
+        return super().validate_proof(plot_id, size, challenge, proof)
+
+class failing_verifier(jittery_verifier):
+    """A wrong quality for the proofs of a single challenge of a single plot"""
+
+    failing_plot_id = None
+    failing_challenge = None
+
+    def validate_proof(self,
+                       plot_id: bytes,
+                       size: int,
+                       challenge: bytes,
+                       proof: bytes) -> bytes:
+        quality = super().validate_proof(plot_id, size, challenge, proof)
+        if plot_id == self.failing_plot_id and bytes(challenge) == self.failing_challenge:
+            return bytes(len(quality))
+        return quality
+
+def synthetic_plot_class(verifier):
+    class verified_plot(build_synthetic_plot_class({})):
+        verifier_factory = verifier
+    return verified_plot
+
+def stored_challenges(back_end, drop: bool = True):
+    # the per index results of every plot; dropped afterwards, so the next run checks the plots again
+    stored = {}
+    for plot_path in back_end.all_plots_paths:
+        plot_name = path.basename(plot_path)
+        stored[plot_name] = back_end.load_data(plot_name)['challenges']
+        if drop:
+            back_end.drop_data(plot_name)
+    return stored
+
+@pytest.mark.parametrize('check_mode', ['full', 'first_hit'])
+def test_pool_results_match_the_inline_results(synthetic_back_end, run_check, check_mode):
+    synthetic_back_end.plot_class = synthetic_plot_class(jittery_verifier)
+    assert run_check(40, check_mode=check_mode)
+    inline = stored_challenges(synthetic_back_end)
+
+    assert run_check(40, check_mode=check_mode, verification_workers=4)
+    assert stored_challenges(synthetic_back_end) == inline
+    assert all(len(challenges) == 40 for challenges in inline.values())
+
+def test_verification_errors_are_reported(synthetic_back_end, run_check, caplog):
+    synthetic_back_end.plot_class = synthetic_plot_class(jittery_verifier)
+    assert run_check(40)
+    reference = stored_challenges(synthetic_back_end)
+
+    failing_plot_path = synthetic_back_end.all_plots_paths[0]
+    failing_plot_name = path.basename(failing_plot_path)
+    failing_index = min(int(challenge_index) for challenge_index, result in reference[failing_plot_name].items()
+                        if int(challenge_index) >= 5 and result['proofs'])
+    failing_verifier.failing_plot_id = sha256(failing_plot_name.encode()).digest()
+    failing_verifier.failing_challenge = std_hash(failing_index.to_bytes(32, "big"))
+    synthetic_back_end.plot_class = synthetic_plot_class(failing_verifier)
+
+    assert not run_check(40, verification_workers=4)
+    stored = stored_challenges(synthetic_back_end, drop=False)
+    # the healthy plot is complete, the failing one up to its failing challenge at least, never with a wrong result
+    assert stored[path.basename(synthetic_back_end.all_plots_paths[1])] == reference[path.basename(synthetic_back_end.all_plots_paths[1])]
+    assert str(failing_index) not in stored[failing_plot_name]
+    assert all(str(challenge_index) in stored[failing_plot_name] for challenge_index in range(failing_index))
+    assert all(result == reference[failing_plot_name][challenge_index] for challenge_index, result in stored[failing_plot_name].items())
+
+    assert f'Proof verification mismatch for { failing_plot_path }, challenge { failing_verifier.failing_challenge.hex() }' in caplog.text
+    assert 'The proofs of 1 challenge(s) could not be verified.' in caplog.text
+    assert f'1 plot(s) could not be checked, see the errors above: { [failing_plot_path] }' in caplog.text
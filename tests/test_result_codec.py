@@ -0,0 +1,59 @@
+import pytest
+
+from _00_result_codec import encode_results,\
+    decode_results,\
+    decode_proofs,\
+    summarize_encoded_results,\
+    challenges_proofs,\
+    is_encoded_results,\
+    not_checked,\
+    _legacy_challenge_hex
+from _00_storage import summarize_challenges
+
+def sample_content():
+    return {'plot_id': 'ab' * 32,
+            'plot_type': 'NFT',
+            'path_history': ['/mnt/disk1/plot-k32.plot'],
+            'latency': {'qualities': {'counts': [1, 2], 'sum': 0.5}},
+            'challenges': {'0': {'proofs': 1, 'verified': True},
+                           '1': {'proofs': 0, 'verified': False},
+                           # stored before the fast scan mode: no verified flag
+                           '2': {'proofs': 2},
+                           # stored before the challenge sets: with the challenge hex
+                           '3': {'challenge': _legacy_challenge_hex(3), 'proofs': 1},
+                           # a gap at 4, then results the arrays cannot hold
+                           '5': {'proofs': 300, 'verified': True},
+                           '6': {'proofs': 1, 'verified': True, 'note': 'extra key'},
+                           '7': {'challenge': 'not the legacy hex', 'proofs': 0}}}
+
+def test_round_trip_is_lossless():
+    content = sample_content()
+    encoded = encode_results(content)
+    assert is_encoded_results(encoded)
+    assert decode_results(encoded) == content
+
+def test_round_trip_of_no_results():
+    content = {'plot_id': None, 'challenges': {}}
+    assert decode_results(encode_results(content)) == content
+
+def test_summary_matches_the_decoded_results():
+    content = sample_content()
+    metadata, summary = summarize_encoded_results(encode_results(content))
+    assert metadata == {key: value for key, value in content.items() if key != 'challenges'}
+    assert summary == summarize_challenges(content['challenges'])
+
+def test_proofs_match_the_json_layout():
+    content = sample_content()
+    metadata, proofs = decode_proofs(encode_results(content))
+    assert metadata['plot_type'] == 'NFT'
+    assert proofs == challenges_proofs(content['challenges'])
+    # the gap stays not checked, the oversized count is clamped below not_checked
+    assert proofs[4] == not_checked
+    assert proofs[5] == not_checked - 1
+
+def test_corrupted_data_is_rejected():
+    encoded = encode_results(sample_content())
+    with pytest.raises(ValueError):
+        decode_results(encoded[:-1])
+    with pytest.raises(ValueError):
+        decode_results(b'JSON' + encoded[4:])
@@ -0,0 +1,45 @@
+from os import path
+
+from _00_scheduler import plot_priority,\
+    prioritize_plots
+
+def summary(plot_name, challenges_tried=None, proofs_found=None, last_checked=None):
+    return {'name': plot_name,
+            'challenges_tried': challenges_tried,
+            'proofs_found': proofs_found,
+            'last_checked': last_checked}
+
+def test_priority_groups():
+    assert plot_priority(summary('a.plot'))[0] == 0
+    assert plot_priority(summary('a.plot', 0, 0))[0] == 0
+    # suspicious: a ratio of 0.5 over 200 challenges
+    assert plot_priority(summary('a.plot', 200, 100))[0] == 1
+    # healthy, but not sampled enough yet
+    assert plot_priority(summary('a.plot', 50, 50))[0] == 1
+    assert plot_priority(summary('a.plot', 500, 500, 10))[0] == 2
+    # no proofs at all stays comparable
+    assert plot_priority(summary('a.plot', 200, 0))[0] == 1
+
+def test_plots_are_ordered_by_priority():
+    relevant_data = [summary('healthy_recent.plot', 500, 510, last_checked=200),
+                     summary('undersampled.plot', 50, 50),
+                     summary('healthy_old.plot', 500, 490, last_checked=100),
+                     summary('never_1.plot'),
+                     summary('suspicious.plot', 200, 100),
+                     summary('very_suspicious.plot', 200, 20),
+                     summary('never_2.plot', 0, 0)]
+    plots_paths = [path.join('disk1', entry['name']) for entry in relevant_data]
+
+    assert [path.basename(_) for _ in prioritize_plots(plots_paths, relevant_data)] == ['never_1.plot',
+                                                                                        'never_2.plot',
+                                                                                        'very_suspicious.plot',
+                                                                                        'suspicious.plot',
+                                                                                        'undersampled.plot',
+                                                                                        'healthy_old.plot',
+                                                                                        'healthy_recent.plot']
+
+def test_ties_and_unknown_plots_keep_the_discovery_order():
+    relevant_data = [summary('b.plot', 500, 500, last_checked=100),
+                     summary('a.plot', 500, 500, last_checked=100)]
+    plots_paths = ['disk1/b.plot', 'disk2/unknown.plot', 'disk1/a.plot']
+    assert prioritize_plots(plots_paths, relevant_data) == ['disk2/unknown.plot', 'disk1/b.plot', 'disk1/a.plot']
@@ -0,0 +1,64 @@
+from itertools import product
+
+import pytest
+
+from _00_storage import sqlite_storage_backend
+from _00_report import build_report,\
+    report_filter
+
+# name: proofs per challenge; the ratios tie for several plots
+stored_plots = {'a.plot': [1, 1, 0, 2],
+                'b.plot': [1, 0],
+                'c.plot': [2, 0, 1, 1],
+                'd.plot': [0, 0, 0],
+                'e.plot': [1],
+                'f.plot': [],
+                'g.plot': [3, 1, 0, 1, 1, 0]}
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = sqlite_storage_backend(db_path=str(tmp_path / 'LEAF_results.sqlite3'))
+    for plot_index, (plot_name, proofs) in enumerate(stored_plots.items()):
+        storage.save_data(plot_name, {'plot_id': f'{ plot_index:064x}',
+                                      'plot_type': 'OG' if plot_index % 2 else 'NFT',
+                                      'challenges': {str(challenge_index): {'proofs': challenge_proofs, 'verified': True}
+                                                     for challenge_index, challenge_proofs in enumerate(proofs)}})
+    yield storage
+    storage.close()
+
+report_options = list(product(['proofs_found', 'challenges_tried', 'last_checked'],
+                              [False, True],
+                              [(None, 0), (3, 0), (3, 4), (2, 7), (None, 20)],
+                              [report_filter(), report_filter(min_ratio=0.5), report_filter(plot_types=['OG'])]))
+
+@pytest.mark.parametrize('list_of_plots', [# the whole table, with plots never checked/ never stored
+                                           ['g.plot', 'x.plot', 'e.plot', 'd.plot', 'c.plot', 'b.plot', 'f.plot', 'a.plot'],
+                                           ['c.plot', 'y.plot', 'a.plot', 'e.plot']])
+def test_the_query_matches_the_heap(storage, list_of_plots):
+    for sort_by, descending, (limit, offset), row_filter in report_options:
+        options = {'sort_by': sort_by,
+                   'descending': descending,
+                   'limit': limit,
+                   'offset': offset,
+                   'row_filter': row_filter}
+        expected = build_report(storage.iter_relevant_data(list_of_plots), **options)['rows']
+        assert [row['name'] for row in storage.sorted_report_rows(list_of_plots, **options)] == [row['name'] for row in expected], options
+
+def test_only_the_whole_table_reports_walk_the_index(storage):
+    statements = []
+    storage._connection.set_trace_callback(statements.append)
+    storage.sorted_report_rows(list(stored_plots), sort_by='proofs_found', limit=2)
+    assert any('INDEXED BY idx_plots_proofs_ratio' in statement for statement in statements)
+
+    statements.clear()
+    storage.sorted_report_rows(['a.plot', 'b.plot'], sort_by='proofs_found', limit=2)
+    assert not any('INDEXED BY' in statement for statement in statements)
+
+def test_the_sort_indexes_are_used(storage):
+    for sort_by, index_name in [['proofs_found', 'idx_plots_proofs_ratio'],
+                                ['challenges_tried', 'idx_plots_challenges_tried']]:
+        query_plan = ' '.join(row[3] for row in storage._connection.execute(
+            f'EXPLAIN QUERY PLAN SELECT plots.name FROM plots INDEXED BY { index_name }'
+            f' WHERE plots.challenges_tried > 0 ORDER BY { storage._sort_value_sql[sort_by] } DESC'))
+        # the rows come in the order of the index, nothing is sorted
+        assert 'TEMP B-TREE' not in query_plan
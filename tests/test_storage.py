@@ -0,0 +1,86 @@
+from os import path
+
+import pytest
+
+from _00_storage import json_storage_backend
+
+@pytest.fixture
+def new_backend(tmp_path):
+    # every call is a fresh process reading the same output folder, e.g. after a crash
+    def factory(**options):
+        return json_storage_backend(output_folder=str(tmp_path / 'output'),
+                                    summary_index_path=str(tmp_path / 'LEAF_catalog.json'),
+                                    **{'journal_flush_every_n': 2, **options})
+    return factory
+
+def snapshot(challenges):
+    return {'plot_id': 'ab' * 32,
+            'plot_type': 'OG',
+            'path_history': ['/mnt/disk1/a.plot'],
+            'challenges': challenges}
+
+def test_journal_is_replayed_over_the_snapshot(new_backend):
+    storage = new_backend()
+    storage.save_data('a.plot', snapshot({'0': {'proofs': 1, 'verified': True}}))
+    storage.append_challenge_result('a.plot', 1, {'proofs': 2, 'verified': True})
+    storage.append_challenge_result('a.plot', 2, {'proofs': 0, 'verified': False})
+
+    # no compaction: the crashed run left the journal behind
+    content = new_backend().load_data('a.plot')
+    assert content['plot_type'] == 'OG'
+    assert content['challenges'] == {'0': {'proofs': 1, 'verified': True},
+                                     '1': {'proofs': 2, 'verified': True},
+                                     '2': {'proofs': 0, 'verified': False}}
+
+def test_only_the_flushed_records_survive_a_crash(new_backend):
+    storage = new_backend()
+    for challenge_index in range(3):
+        storage.append_challenge_result('a.plot', challenge_index, {'proofs': 1, 'verified': True})
+
+    # the third record was still buffered; without a snapshot, the journal alone is replayed
+    content = new_backend().load_data('a.plot')
+    assert sorted(content['challenges']) == ['0', '1']
+    assert content['path_history'] == []
+
+def test_torn_journal_line_is_skipped(new_backend):
+    storage = new_backend()
+    storage.append_challenge_result('a.plot', 0, {'proofs': 1, 'verified': True})
+    storage.append_challenge_result('a.plot', 1, {'proofs': 1, 'verified': True})
+    with open(storage._journal_path('a.plot'), 'a') as output_handle:
+        output_handle.write('[2,{"proofs":')
+    # the next records start on a new line, after the torn one
+    storage.append_challenge_result('a.plot', 3, {'proofs': 2, 'verified': True})
+    storage.append_challenge_result('a.plot', 4, {'proofs': 0, 'verified': True})
+
+    content = new_backend().load_data('a.plot')
+    assert sorted(content['challenges'], key=int) == ['0', '1', '3', '4']
+
+def test_later_records_win(new_backend):
+    storage = new_backend(journal_flush_every_n=1)
+    storage.save_data('a.plot', snapshot({'0': {'proofs': 1, 'verified': False}}))
+    storage.append_challenge_result('a.plot', 0, {'proofs': 1, 'verified': True})
+    assert new_backend().load_data('a.plot')['challenges']['0'] == {'proofs': 1, 'verified': True}
+
+def test_compaction_folds_the_journal_into_the_snapshot(new_backend):
+    storage = new_backend()
+    storage.save_data('a.plot', snapshot({}))
+    for challenge_index in range(4):
+        storage.append_challenge_result('a.plot', challenge_index, {'proofs': 1, 'verified': True})
+    content = storage.load_data('a.plot')
+    storage.compact_data('a.plot', content)
+
+    assert not path.isfile(storage._journal_path('a.plot'))
+    reloaded = new_backend()
+    assert len(reloaded.load_data('a.plot')['challenges']) == 4
+    summary = next(reloaded.iter_relevant_data(['a.plot']))
+    assert (summary['challenges_tried'], summary['proofs_found'], summary['verified_challenges']) == (4, 4, 4)
+
+def test_summary_follows_the_journal(new_backend):
+    storage = new_backend()
+    storage.save_data('a.plot', snapshot({'0': {'proofs': 1, 'verified': True}}))
+    assert next(storage.iter_relevant_data(['a.plot']))['challenges_tried'] == 1
+    storage.append_challenge_result('a.plot', 1, {'proofs': 2, 'verified': True})
+    storage.append_challenge_result('a.plot', 2, {'proofs': 0, 'verified': False})
+
+    summary = next(new_backend().iter_relevant_data(['a.plot']))
+    assert (summary['challenges_tried'], summary['proofs_found'], summary['verified_challenges']) == (3, 3, 2)
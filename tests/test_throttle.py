@@ -0,0 +1,50 @@
+import pytest
+
+import _00_throttle
+from _00_throttle import disk_latency_controller,\
+    adaptive_throttle
+
+def test_backs_off_multiplicatively_up_to_the_max_delay():
+    controller = disk_latency_controller(target_p95_ms=100,
+                                         max_delay=1)
+    delays = [controller.record([0.2]) for _ in range(7)]
+    assert delays == pytest.approx([0.05, 0.1, 0.2, 0.4, 0.8, 1, 1])
+
+def test_speeds_up_additively_then_faster_when_idle():
+    controller = disk_latency_controller(target_p95_ms=100,
+                                         window=1)
+    controller.delay = 1
+    # between half the target and the target: additive decrease
+    assert controller.record([0.08]) == pytest.approx(0.98)
+    # well under the target: halved, then the additive step
+    assert controller.record([0.01]) == pytest.approx(0.47)
+    for _ in range(10):
+        controller.record([0.01])
+    assert controller.delay == 0
+
+def test_every_lookup_is_a_sample_the_delay_moves_once_per_challenge():
+    controller = disk_latency_controller(target_p95_ms=100)
+    # the qualities and two full proofs of a single challenge
+    assert controller.record([0.01, 0.3, 0.3]) == pytest.approx(0.05)
+    assert list(controller.latencies_ms) == pytest.approx([10, 300, 300])
+
+def test_p95_over_the_window():
+    controller = disk_latency_controller(target_p95_ms=100,
+                                         window=20)
+    controller.record([1] + [0.01] * 19)
+    assert controller.p95_ms() == pytest.approx(1000)
+    # the slow lookup leaves the window
+    controller.record([0.01])
+    assert controller.p95_ms() == pytest.approx(10)
+
+def test_disks_are_throttled_independently(monkeypatch):
+    slept = []
+    monkeypatch.setattr(_00_throttle, 'sleep', slept.append)
+    throttle = adaptive_throttle(target_p95_ms=100)
+
+    throttle.record('slow_disk', [0.5])
+    throttle.record('fast_disk', [0.01])
+    throttle.wait('fast_disk')
+    assert slept == []
+    throttle.wait('slow_disk')
+    assert slept == pytest.approx([0.05])
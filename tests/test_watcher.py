@@ -0,0 +1,139 @@
+from os import path,\
+    stat,\
+    utime,\
+    rename,\
+    remove
+from shutil import rmtree
+
+import pytest
+
+import _00_watcher
+from _00_back_end import LEAF_back_end
+from _00_watcher import plot_watcher
+
+class fake_clock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = fake_clock()
+    monkeypatch.setattr(_00_watcher, 'time', clock)
+    return clock
+
+@pytest.fixture
+def disk(tmp_path):
+    (tmp_path / 'disk1' / 'old').mkdir(parents=True)
+    for relative_path in ['disk1/a.plot', 'disk1/old/b.plot', 'disk1/old/c.plot']:
+        (tmp_path / relative_path).write_bytes(b'plot')
+    return tmp_path / 'disk1'
+
+def folder_changed(folder):
+    # the coarse timestamps of the file systems may not move between two quick changes
+    folder_mtime = stat(folder).st_mtime_ns
+    utime(folder, ns=(folder_mtime, folder_mtime + 1_000_000_000))
+
+def new_watcher(disk, settle_sec=60, recursive=True):
+    return plot_watcher([str(disk)],
+                        recursive=recursive,
+                        settle_sec=settle_sec,
+                        watch_mode='polling')
+
+def test_a_new_plot_waits_for_settle_sec(disk, clock):
+    watcher = new_watcher(disk)
+    assert sorted(watcher.plots_paths) == sorted(str(disk / _) for _ in ['a.plot', 'old/b.plot', 'old/c.plot'])
+    assert watcher.poll() == ([], [], [])
+
+    (disk / 'old' / 'd.plot').write_bytes(b'plot')
+    folder_changed(disk / 'old')
+    assert watcher.poll() == ([], [], [])
+    clock.now += 59
+    assert watcher.poll() == ([], [], [])
+    clock.now += 1
+    assert watcher.poll() == ([str(disk / 'old' / 'd.plot')], [], [])
+    assert str(disk / 'old' / 'd.plot') in watcher.plots_paths
+    assert watcher.poll() == ([], [], [])
+
+def test_a_growing_plot_is_held_back(disk, clock):
+    watcher = new_watcher(disk)
+    (disk / 'e.plot').write_bytes(b'p')
+    folder_changed(disk)
+    watcher.poll()
+    for _ in range(3):
+        clock.now += 50
+        # still being copied, its folder mtime does not move
+        with open(disk / 'e.plot', 'ab') as output_handle:
+            output_handle.write(b'lot')
+        assert watcher.poll() == ([], [], [])
+    clock.now += 60
+    assert watcher.poll() == ([str(disk / 'e.plot')], [], [])
+
+def test_a_rewritten_plot_is_changed(disk, clock):
+    watcher = new_watcher(disk)
+    (disk / 'a.plot').write_bytes(b'another plot')
+    folder_changed(disk)
+    watcher.poll()
+    clock.now += 60
+    assert watcher.poll() == ([], [str(disk / 'a.plot')], [])
+    # a new mtime only
+    a_plot_mtime = stat(disk / 'a.plot').st_mtime_ns
+    utime(disk / 'a.plot', ns=(a_plot_mtime, a_plot_mtime + 1_000_000_000))
+    folder_changed(disk)
+    watcher.poll()
+    clock.now += 60
+    assert watcher.poll() == ([], [str(disk / 'a.plot')], [])
+
+def test_removed_plots_and_folders(disk, clock):
+    watcher = new_watcher(disk)
+    remove(disk / 'a.plot')
+    folder_changed(disk)
+    assert watcher.poll() == ([], [], [str(disk / 'a.plot')])
+
+    rmtree(disk / 'old')
+    folder_changed(disk)
+    assert watcher.poll() == ([], [], [str(disk / 'old' / 'b.plot'), str(disk / 'old' / 'c.plot')])
+    assert watcher.plots_paths == []
+    assert str(disk / 'old') not in watcher.folders_mtimes
+
+def test_an_unmounted_disk_is_forgotten_until_it_is_back(disk, clock):
+    watcher = new_watcher(disk, recursive=False)
+    rename(disk, disk.parent / 'unmounted')
+    assert watcher.poll() == ([], [], [str(disk / 'a.plot')])
+    assert watcher.poll() == ([], [], [])
+
+    rename(disk.parent / 'unmounted', disk)
+    watcher.poll()
+    clock.now += 60
+    assert watcher.poll() == ([str(disk / 'a.plot')], [], [])
+
+def test_watch_drops_the_results_of_a_changed_plot(back_end, disk, monkeypatch):
+    a_plot = str(disk / 'a.plot')
+    back_end.save_data('a.plot', {'challenges': {'0': {'proofs': 1, 'verified': True}}})
+    checked = []
+    stop = []
+
+    def check_plots(back_end, plots_paths, **check_options):
+        checked.append(sorted(plots_paths))
+        if len(checked) == 1:
+            # the plot is replaced after its first check
+            (disk / 'a.plot').write_bytes(b'another plot')
+            folder_changed(disk)
+        else:
+            assert back_end.load_data('a.plot') is None
+            stop.append(True)
+        return True
+    monkeypatch.setattr(LEAF_back_end, 'check_plots', check_plots)
+
+    assert back_end.watch_plots([str(disk)],
+                                nr_challenges=10,
+                                progress_callback=lambda **kwargs: None,
+                                stop_flag_check=lambda: bool(stop),
+                                recursive=True,
+                                poll_interval_sec=0,
+                                settle_sec=0,
+                                watch_mode='polling')
+    assert checked == [sorted([a_plot, str(disk / 'old' / 'b.plot'), str(disk / 'old' / 'c.plot')]),
+                       [a_plot]]